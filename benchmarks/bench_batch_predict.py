@@ -0,0 +1,52 @@
+"""
+Benchmark the batched inference engine against the per-call prediction path.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch_predict --model LSTM --slots 96
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import predict
+from predict import load_neighbors, load_model_for_site, cached_predict, BatchInferenceEngine
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="LSTM", help="Model type to benchmark.")
+    parser.add_argument("--slots", type=int, default=96, help="Number of 15-minute timestamps per site.")
+    parser.add_argument("--date", default="2006-10-02", help="Day to predict (YYYY-MM-DD).")
+    args = parser.parse_args()
+
+    model_type = args.model.upper()
+    neighbors = load_neighbors()
+    sites = sorted(set(neighbors.keys()) | set(site for sublist in neighbors.values() for site in sublist))
+    start = datetime.strptime(args.date, "%Y-%m-%d")
+    date_times = [start + timedelta(minutes=15 * i) for i in range(args.slots)]
+
+    # Load every model up front so both paths only measure inference
+    sites = [site for site in sites if load_model_for_site(site, model_type) is not None]
+    requests = [(site, date_time, model_type) for site in sites for date_time in date_times]
+    print(f"{len(sites)} sites x {len(date_times)} timestamps = {len(requests)} predictions ({model_type})")
+
+    t0 = time.perf_counter()
+    per_call = [cached_predict.__wrapped__(site, date_time, model_type) + (site,) for site, date_time, _ in requests]
+    per_call_time = time.perf_counter() - t0
+
+    engine = BatchInferenceEngine(max_cached=len(requests))
+    t0 = time.perf_counter()
+    batched = engine.predict(requests)
+    batched_time = time.perf_counter() - t0
+
+    mismatches = sum(1 for a, b in zip(per_call, batched) if a[0] != b[0])
+    print(f"per-call: {per_call_time:8.3f}s  {len(requests)} predict calls  "
+          f"{1000 * per_call_time / len(requests):.3f} ms/prediction")
+    print(f"batched:  {batched_time:8.3f}s  {engine.predict_calls} predict calls  "
+          f"{1000 * batched_time / len(requests):.3f} ms/prediction")
+    print(f"speedup:  {per_call_time / batched_time:.1f}x, mismatched predictions: {mismatches}")
+    print(f"model registry: {predict.model_registry.stats()}")
+
+
+if __name__ == "__main__":
+    main()
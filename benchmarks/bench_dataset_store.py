@@ -0,0 +1,60 @@
+"""
+Load time and peak RSS of the binary dataset store against pd.read_csv.
+
+Convert the splits first, then run from the repository root:
+    python -m data.store
+    python -m benchmarks.bench_dataset_store
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from data.store import CSV_DIR, STORE_DIR
+
+# Each loader runs in a fresh interpreter so peak RSS reflects only its own work
+LOADER_SNIPPET = """
+import os, sys, json, time, resource
+import numpy as np
+from data.store import load_split
+paths = json.loads(sys.argv[1])
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+total = 0.0
+for path in paths:
+    times, flows = load_split(path)
+    total += float(np.sum(flows))  # touch every flow so memory-mapped pages are read
+elapsed = time.perf_counter() - t0
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'rss_delta_kb': rss_after - rss_before, 'rss_peak_kb': rss_after}))
+"""
+
+
+def run_loader(paths):
+    out = subprocess.run([sys.executable, '-c', LOADER_SNIPPET, json.dumps(paths)],
+                         check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv-dir", default=CSV_DIR, help="Directory of CSV splits.")
+    parser.add_argument("--store-dir", default=STORE_DIR, help="Directory of the binary store.")
+    args = parser.parse_args()
+
+    names = sorted(f[:-len('.csv')] for f in os.listdir(args.csv_dir) if f.endswith('.csv'))
+    csv_paths = [os.path.join(args.csv_dir, name + '.csv') for name in names]
+    store_paths = [os.path.join(args.store_dir, name) for name in names]
+
+    csv_bytes = sum(os.path.getsize(path) for path in csv_paths)
+    store_bytes = sum(os.path.getsize(os.path.join(args.store_dir, f)) for f in os.listdir(args.store_dir))
+
+    print(f"{len(names)} splits, CSV {csv_bytes / 1024 ** 2:.1f} MB, store {store_bytes / 1024 ** 2:.1f} MB")
+    for label, paths in [('pd.read_csv', csv_paths), ('store (mmap)', store_paths)]:
+        result = run_loader(paths)
+        print(f"{label:13s} {result['seconds']:7.3f}s  "
+              f"RSS +{result['rss_delta_kb'] / 1024:6.1f} MB (peak {result['rss_peak_kb'] / 1024:6.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
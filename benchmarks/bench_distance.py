@@ -0,0 +1,56 @@
+"""
+Accuracy and speed of the vectorized site distances against per-pair geopy.geodesic.
+
+Compares every ordered pair of SCATS sites (and every road edge) using haversine
+and Vincenty from geodesy.py, against geopy's geodesic distance.
+
+Run from the repository root:
+    python -m benchmarks.bench_distance
+"""
+import argparse
+import time
+import numpy as np
+from geopy.distance import geodesic
+
+from geodesy import METHODS, distance_matrix
+from graph import RoadGraph, TRAFFIC_NETWORK
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=TRAFFIC_NETWORK, help="Intersections CSV to measure.")
+    args = parser.parse_args()
+
+    graph = RoadGraph.from_csv(args.csv)
+    known = np.flatnonzero(~np.isnan(graph.latitudes) & ~np.isnan(graph.longitudes))
+    lat, lon = graph.latitudes[known], graph.longitudes[known]
+    n = len(known)
+
+    t0 = time.perf_counter()
+    reference = np.array([[geodesic((lat[i], lon[i]), (lat[j], lon[j])).km for j in range(n)] for i in range(n)])
+    geopy_time = time.perf_counter() - t0
+    print(f"{n} sites, {n * n} pairs, {graph.num_edges} edges")
+    print(f"geopy geodesic  {1000 * geopy_time:9.2f} ms (one call per pair)")
+
+    sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.indptr))
+    position = np.full(graph.num_nodes, -1)
+    position[known] = np.arange(n)
+    edge_rows, edge_cols = position[sources], position[graph.indices]
+    on_edges = (edge_rows >= 0) & (edge_cols >= 0)
+
+    for method in METHODS:
+        t0 = time.perf_counter()
+        matrix = distance_matrix(lat, lon, method)
+        elapsed = time.perf_counter() - t0
+
+        off_diagonal = ~np.eye(n, dtype=bool)
+        error = np.abs(matrix - reference)
+        relative = error[off_diagonal] / reference[off_diagonal]
+        edge_error = error[edge_rows[on_edges], edge_cols[on_edges]]
+        print(f"{method:15s} {1000 * elapsed:9.2f} ms  speedup {geopy_time / elapsed:7.1f}x  "
+              f"max error {1000 * error.max():9.4f} m  mean {1000 * error.mean():8.4f} m  "
+              f"max relative {100 * relative.max():.4f}%  max edge error {1000 * edge_error.max():8.4f} m")
+
+
+if __name__ == "__main__":
+    main()
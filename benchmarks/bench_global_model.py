@@ -0,0 +1,108 @@
+"""
+Accuracy and serving latency of the global multi-site model against the per-site models.
+
+Latency: load every site's model, then predict every site for one slot
+(and for a day of slots) through BatchInferenceEngine, which issues one
+predict per per-site model but a single one for all sites of a global model.
+Accuracy: main.evaluate in both modes, mean of each metric over the sites.
+
+Train and (for the NumPy backend) export the global model first, then run
+from the repository root:
+    python train.py --global --model lstm
+    python -m model.export --src model/global_models --dst model/global_models
+    python -m benchmarks.bench_global_model --model lstm
+
+--random-weights measures latency without a trained global model, using
+the per-site architecture widened by the one-hot site input (NumPy backend only).
+"""
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+
+import main
+import predict
+from data.store import get_scats_sites
+from global_model import GlobalModel
+from model_registry import ModelRegistry, MODEL_BACKEND
+from model.numpy_runtime import NumpyModel
+from scaler_store import get_scaler_range
+
+
+def random_global_model(site_model, sites, model_type, rng):
+    """A global NumpyModel shaped like ``site_model`` plus the one-hot input, with random first-layer site weights."""
+    weights = [list(layer_weights) for layer_weights in site_model.weights]
+    first = next(i for i, layer_weights in enumerate(weights) if layer_weights)
+    kernel = weights[first][0]
+    site_rows = rng.normal(0, kernel.std(), (len(sites), kernel.shape[1])).astype(np.float32)
+    weights[first][0] = np.concatenate((kernel, site_rows))
+    input_shape = tuple(site_model.input_shape[:-1]) + (site_model.input_shape[-1] + len(sites),)
+    scalers = {site: list(get_scaler_range(site, model_type)) for site in sites}
+    return GlobalModel(NumpyModel(site_model.layers, weights, input_shape), {'sites': sites, 'scalers': scalers})
+
+
+def time_serving(registry, sites, date_times, model_type, repeats):
+    """(load seconds, resident MB, median seconds to predict every site at ``date_times``, predict calls)."""
+    predict.model_registry = registry
+    t0 = time.perf_counter()
+    for site in sites:
+        registry.get(site, model_type)
+    load = time.perf_counter() - t0
+
+    engine = predict.BatchInferenceEngine()
+    requests = [(site, date_time, model_type) for site in sites for date_time in date_times]
+    times = []
+    for _ in range(repeats):
+        engine.results.clear()
+        engine.predict_calls = 0
+        t0 = time.perf_counter()
+        engine.predict(requests)
+        times.append(time.perf_counter() - t0)
+    return load, registry.stats()['resident_bytes'] / 1024 ** 2, float(np.median(times)), engine.predict_calls
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="lstm", help="Model type to compare.")
+    parser.add_argument("--data-dir", default="data/splitted_data", help="Directory of per-site splits.")
+    parser.add_argument("--date", default="2006-10-02", help="Day of the predicted slots.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Time a randomly initialised global model; skips the accuracy comparison.")
+    args = parser.parse_args()
+
+    model_type = args.model.upper()
+    sites = sorted(get_scats_sites(args.data_dir))
+    day = datetime.strptime(args.date, "%Y-%m-%d")
+    slot, slots = [day + timedelta(hours=8)], [day + timedelta(minutes=15 * i) for i in range(96)]
+
+    site_registry = ModelRegistry(max_models=len(sites), mode='site')
+    global_registry = ModelRegistry(max_models=len(sites), mode='global')
+    if args.random_weights:
+        if MODEL_BACKEND != 'numpy':
+            parser.error("--random-weights needs TFPS_MODEL_BACKEND=numpy")
+        site_model = next(model for model in (site_registry.get(site, model_type) for site in sites) if model)
+        global_registry.global_models[model_type.lower()] = random_global_model(
+            site_model, sites, model_type, np.random.RandomState(0))
+
+    print(f"{model_type}, {len(sites)} sites, {MODEL_BACKEND} backend")
+    print(f"{'mode':7s} {'load s':>8s} {'resident MB':>12s} {'1 slot ms':>10s} {'calls':>6s} {'96 slots ms':>12s} {'calls':>6s}")
+    for label, registry in (('site', site_registry), ('global', global_registry)):
+        load, resident, one, one_calls = time_serving(registry, sites, slot, model_type, args.repeats)
+        _, _, day_time, day_calls = time_serving(registry, sites, slots, model_type, args.repeats)
+        print(f"{label:7s} {load:8.3f} {resident:12.1f} {1000 * one:10.2f} {one_calls:6d} "
+              f"{1000 * day_time:12.2f} {day_calls:6d}")
+
+    if args.random_weights:
+        return
+    summaries = {}
+    for mode in ('site', 'global'):
+        results_table, _ = main.evaluate(sites, [model_type.lower()], args.data_dir, 12, mode=mode)
+        summaries[mode] = results_table.groupby('metric')['value'].mean()
+    print(f"{'metric':20s} {'site':>10s} {'global':>10s}")
+    for metric in main.METRICS + ['predict_seconds']:
+        print(f"{metric:20s} {summaries['site'][metric]:10.4f} {summaries['global'][metric]:10.4f}")
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,65 @@
+"""
+Benchmark Yen's k-shortest loopless paths against the multi-label A* route search.
+
+Runs every origin/destination pair in neighbouring_intersections.csv through both
+searches and reports explored nodes, latency and how the returned route lists compare.
+
+Run from the repository root:
+    python -m benchmarks.bench_k_shortest --model LSTM --time "2006-10-02 08:00"
+"""
+import argparse
+import time
+from datetime import datetime
+
+import pathfinder
+from pathfinder import k_shortest_paths, route_stats
+from benchmarks.label_search import find_multiple_paths, search_stats
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="LSTM", help="Model type providing the flow forecasts.")
+    parser.add_argument("--time", default="2006-10-02 08:00", help="Departure time (YYYY-MM-DD HH:MM).")
+    parser.add_argument("--paths", type=int, default=5, help="Routes per origin/destination pair.")
+    args = parser.parse_args()
+
+    pathfinder.global_model_type = args.model.upper()
+    start_time = datetime.strptime(args.time, "%Y-%m-%d %H:%M")
+    pairs = [(a, b) for a in pathfinder.site_ids for b in pathfinder.site_ids if a != b]
+
+    # Warm the forecast table and distance caches so both searches measure only the search
+    for start, end in pairs:
+        find_multiple_paths(start, end, start_time, args.paths)
+        k_shortest_paths(start, end, start_time, args.paths)
+
+    results = {}
+    for label, search, stats in [('labels', find_multiple_paths, search_stats),
+                                 ('yen', k_shortest_paths, route_stats)]:
+        latencies, expansions, routes = [], [], []
+        for start, end in pairs:
+            t0 = time.perf_counter()
+            routes.append(search(start, end, start_time, args.paths))
+            latencies.append(time.perf_counter() - t0)
+            expansions.append(stats['expanded'])
+        results[label] = routes
+        print(f"{label:6s} {len(pairs)} pairs  total {sum(latencies):7.3f}s  "
+              f"p50 {1000 * percentile(latencies, 50):7.2f} ms  p99 {1000 * percentile(latencies, 99):7.2f} ms  "
+              f"explored mean {sum(expansions) / len(expansions):8.1f}  max {max(expansions)}")
+
+    same_best = same_lists = yen_faster = 0
+    for labels, yen in zip(results['labels'], results['yen']):
+        same_best += bool(labels and yen) and labels[0][2] == yen[0][2]
+        same_lists += [p[2] for p in labels] == [p[2] for p in yen]
+        # Yen's list is exact, so each of its routes is at least as fast as the label search's
+        yen_faster += any(y[0] < l[0] - 1e-9 for l, y in zip(labels, yen)) or len(yen) > len(labels)
+    print(f"same fastest route: {same_best}/{len(pairs)}  identical route lists: {same_lists}/{len(pairs)}  "
+          f"yen found faster alternatives: {yen_faster}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Map output size and render latency: full folium rebuild against the routes sidecar.
+
+The folium side rebuilds the whole page per query the way the GUI used to
+(map, route GeoJSON, markers and one Circle per SCATS site). The sidecar side
+writes the base page once and then only map/routes.js per query.
+Routes are random walks over the road graph, so no model is needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_map_render
+"""
+import os
+import json
+import random
+import argparse
+import tempfile
+import time
+import folium
+
+from graph import get_road_graph
+from site_index import get_site_index
+from map_renderer import MapRenderer, MAP_CENTER, MAP_OFFSET, routes_geojson
+
+
+def random_routes(graph, count, length, rng):
+    neighbors = graph.to_neighbors()
+    sites = [site for site in graph.ids if neighbors.get(site)]
+    routes = []
+    while len(routes) < count:
+        path = [rng.choice(sites)]
+        while len(path) < length and neighbors.get(path[-1]):
+            path.append(rng.choice(neighbors[path[-1]]))
+        if len(path) > 1:
+            routes.append((0.0, 0.0, path, 0.0))
+    return routes
+
+
+def folium_render(site_index, routes, path):
+    # The pre-sidecar GUI: a fresh folium map with every node as its own Circle
+    map_obj = folium.Map(location=list(MAP_CENTER), zoom_start=13, tiles="cartodbpositron")
+    folium.LatLngPopup().add_to(map_obj)
+    folium.GeoJson(json.dumps(routes_geojson(routes, site_index)), style_function=lambda x: {
+        'color': x['properties']['stroke'],
+        'weight': x['properties']['stroke-width']
+    }).add_to(map_obj)
+    for label, site, color in (('Start', routes[0][2][0], 'red'), ('Finish', routes[0][2][-1], 'green')):
+        lat, lon, description = site_index.get(site)
+        folium.Marker([lat + MAP_OFFSET, lon + MAP_OFFSET],
+                      popup=f"<strong>{label}</strong><br><strong>SCATS:</strong> {site}<br><strong>SITE:</strong> {description}",
+                      icon=folium.Icon(color=color)).add_to(map_obj)
+    for site, (lat, lon, description) in sorted(site_index.records.items()):
+        folium.Circle(radius=5, location=[lat + MAP_OFFSET, lon + MAP_OFFSET],
+                      tooltip=f"SCATS: {site}, SITE: {description}",
+                      color="#5A5A5A", fill=True, fill_opacity=0.7).add_to(map_obj)
+    map_obj.save(path)
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return 1000 * times[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 50], help="Routes per query.")
+    parser.add_argument("--length", type=int, default=12, help="Sites per random route.")
+    parser.add_argument("--repeats", type=int, default=20, help="Renders per measurement (median reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    site_index = get_site_index()
+    graph = get_road_graph()
+
+    with tempfile.TemporaryDirectory() as directory:
+        renderer = MapRenderer(site_index, directory)
+        t0 = time.perf_counter()
+        renderer.ensure_base()
+        base_ms = 1000 * (time.perf_counter() - t0)
+        base_bytes = os.path.getsize(renderer.base_path)
+        print(f"{len(site_index)} sites; base page {base_bytes} bytes written once in {base_ms:.2f} ms")
+        print(f"{'routes':>6} {'folium bytes':>13} {'folium ms':>10} {'sidecar bytes':>14} {'sidecar ms':>11} {'speedup':>8}")
+
+        folium_path = os.path.join(directory, 'folium.html')
+        for count in args.counts:
+            routes = random_routes(graph, count, args.length, rng)
+            folium_ms = timed(lambda: folium_render(site_index, routes, folium_path), args.repeats)
+            sidecar_ms = timed(lambda: renderer.render_routes(routes), args.repeats)
+            print(f"{count:>6} {os.path.getsize(folium_path):>13} {folium_ms:>10.2f} "
+                  f"{os.path.getsize(renderer.routes_path):>14} {sidecar_ms:>11.3f} {folium_ms / sidecar_ms:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
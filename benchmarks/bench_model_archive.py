@@ -0,0 +1,76 @@
+"""
+Load time of every site's model from the packed archive against the loose per-site files.
+
+For each model type: list which sites have a model (directory listing
+against the archive index), then load every site through a fresh
+ModelRegistry, once with the archive hidden and once with it in place.
+Also reports how many files each layout keeps on disk.
+
+Build the archives (and, for the NumPy backend, the loose .npz files) first,
+then run from the repository root:
+    python -m model.archive build
+    TFPS_MODEL_BACKEND=numpy python -m benchmarks.bench_model_archive
+"""
+import os
+import time
+import argparse
+from contextlib import redirect_stdout
+import numpy as np
+
+from model_registry import ModelRegistry, MODEL_BACKEND, get_model_path
+from model.archive import ModelArchive, get_archive_paths
+
+
+class NoArchive(ModelRegistry):
+    """A registry that only sees the loose per-site files."""
+
+    def get_archive(self, model_type):
+        return None
+
+
+def time_loads(registry_cls, model_type, repeats):
+    """(median seconds to list the sites, median seconds to load them all, sites, predictions of the first site)."""
+    list_times, load_times = [], []
+    for _ in range(repeats):
+        registry = registry_cls(max_models=10000)
+        t0 = time.perf_counter()
+        sites = registry.available_sites(model_type)
+        list_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            models = [registry.get(site, model_type) for site in sites]
+        load_times.append(time.perf_counter() - t0)
+        x = np.linspace(0, 1, int(np.prod(models[0].input_shape[1:]))).reshape((1,) + tuple(models[0].input_shape[1:]))
+        first = models[0].predict(x.astype(np.float32))
+        registry.clear()
+    return float(np.median(list_times)), float(np.median(load_times)), sites, first
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default="LSTM,GRU,SAES,RNN", help="Comma-separated model types.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{MODEL_BACKEND} backend")
+    print(f"{'model':6s} {'layout':8s} {'files':>6s} {'sites':>6s} {'list ms':>9s} {'load all ms':>12s} {'per site ms':>12s}")
+    for model_type in args.models.split(','):
+        if ModelArchive.open(model_type) is None:
+            print(f"{model_type:6s} no archive, run python -m model.archive build")
+            continue
+        loose_dir = os.path.dirname(get_model_path('', model_type))
+        loose_files = sum(1 for name in os.listdir(loose_dir) if name.startswith(f'{model_type.lower()}_'))
+        results = {}
+        for layout, registry_cls, files in (('loose', NoArchive, loose_files), ('archive', ModelRegistry, 2)):
+            listed, loaded, sites, first = time_loads(registry_cls, model_type, args.repeats)
+            results[layout] = (sites, first)
+            print(f"{model_type:6s} {layout:8s} {files:6d} {len(sites):6d} {1000 * listed:9.2f} {1000 * loaded:12.2f} "
+                  f"{1000 * loaded / max(len(sites), 1):12.3f}")
+        same_sites = results['loose'][0] == results['archive'][0]
+        same_output = np.allclose(results['loose'][1], results['archive'][1], atol=1e-6)
+        print(f"{model_type:6s} same sites: {same_sites}, same predictions: {same_output}, "
+              f"archive {os.path.getsize(get_archive_paths(model_type)[1]) / 1024 ** 2:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
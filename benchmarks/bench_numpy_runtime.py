@@ -0,0 +1,92 @@
+"""
+Parity check and latency benchmark of the NumPy runtime against Keras.
+
+Export the weights first, then run from the repository root:
+    python -m model.export
+    python -m benchmarks.bench_numpy_runtime --models lstm gru rnn saes
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import subprocess
+import numpy as np
+from keras.models import load_model
+from model.export import SITES_MODELS_DIR, SITES_NUMPY_DIR
+from model.numpy_runtime import NumpyModel, StackedNumpyModel
+
+TOLERANCE = 1e-5
+
+STARTUP_SNIPPETS = {
+    'keras': "from keras.models import load_model; import numpy as np; "
+             "m = load_model({path!r}); m.predict(np.zeros((1,) + m.input_shape[1:]))",
+    'numpy': "from model.numpy_runtime import NumpyModel; import numpy as np; "
+             "m = NumpyModel.load({path!r}); m.predict(np.zeros((1,) + m.input_shape[1:]))",
+}
+
+
+def time_startup(backend, path, repeats=3):
+    """Wall time of a fresh interpreter that loads one model and predicts once."""
+    code = STARTUP_SNIPPETS[backend].format(path=path)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def bench_model_type(model_type, batch, rng):
+    h5_paths = sorted(glob.glob(os.path.join(SITES_MODELS_DIR, f'{model_type}_*.h5')))
+    sites = [os.path.basename(path)[len(model_type) + 1:-3] for path in h5_paths]
+    npz_paths = [os.path.join(SITES_NUMPY_DIR, f'{model_type}_{site}.npz') for site in sites]
+
+    t0 = time.perf_counter()
+    keras_models = [load_model(path) for path in h5_paths]
+    keras_load = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    numpy_models = [NumpyModel.load(path) for path in npz_paths]
+    numpy_load = time.perf_counter() - t0
+
+    x = rng.random_sample((len(sites), batch) + numpy_models[0].input_shape[1:]).astype(np.float32)
+
+    t0 = time.perf_counter()
+    keras_out = np.stack([model.predict(x[i], batch_size=batch) for i, model in enumerate(keras_models)])
+    keras_predict = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    numpy_out = np.stack([model.predict(x[i]) for i, model in enumerate(numpy_models)])
+    numpy_predict = time.perf_counter() - t0
+
+    stacked = StackedNumpyModel(numpy_models)
+    t0 = time.perf_counter()
+    stacked_out = stacked.predict(x)
+    stacked_predict = time.perf_counter() - t0
+
+    max_diff = max(np.abs(keras_out - numpy_out).max(), np.abs(keras_out - stacked_out).max())
+    status = "OK" if max_diff <= TOLERANCE else "FAIL"
+    print(f"{model_type:5s} {len(sites):3d} sites  parity max|diff|={max_diff:.2e} [{status}]")
+    print(f"      load:    keras {keras_load:7.3f}s  numpy {numpy_load:7.3f}s")
+    print(f"      predict: keras {keras_predict:7.3f}s  numpy {numpy_predict:7.3f}s  "
+          f"numpy stacked {stacked_predict:7.3f}s  ({len(sites)} x {batch} samples)")
+    print(f"      startup: keras {time_startup('keras', h5_paths[0]):7.3f}s  "
+          f"numpy {time_startup('numpy', npz_paths[0]):7.3f}s")
+    return max_diff <= TOLERANCE
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="*", default=['lstm', 'gru', 'rnn', 'saes'], help="Model types to check.")
+    parser.add_argument("--batch", type=int, default=96, help="Samples per site.")
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    results = [bench_model_type(model_type.lower(), args.batch, rng) for model_type in args.models]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
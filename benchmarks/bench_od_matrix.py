@@ -0,0 +1,65 @@
+"""
+Runtime scaling of the batch OD-matrix mode across worker counts.
+
+Computes the full all-sites matrix for a set of departure times with each worker
+count, checks every run gives the same matrix and that it agrees with the fastest
+route returned by pathfinder.k_shortest_paths.
+
+Run from the repository root:
+    python -m benchmarks.bench_od_matrix --model LSTM --jobs 1 2 4 --times 24
+"""
+import argparse
+import multiprocessing
+import time
+import numpy as np
+from datetime import datetime, timedelta
+
+import pathfinder
+from od_matrix import compute_od_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="LSTM", help="Model type providing the flow forecasts.")
+    parser.add_argument("--date", default="2006-10-02", help="Day of the departures (YYYY-MM-DD).")
+    parser.add_argument("--times", type=int, default=24, help="Departure times, spread evenly over the day.")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare.")
+    args = parser.parse_args()
+
+    model_type = args.model.upper()
+    start = datetime.strptime(args.date, "%Y-%m-%d")
+    departure_times = [start + timedelta(minutes=24 * 60 * i // args.times) for i in range(args.times)]
+    sites = pathfinder.site_ids
+
+    # Predict the forecast tables once so the timings measure routing only
+    compute_od_matrix(sites[:1], sites, departure_times[:1], model_type)
+
+    print(f"{len(sites)} x {len(sites)} sites, {len(departure_times)} departure times, "
+          f"{multiprocessing.cpu_count()} CPUs")
+    reference, baseline = None, None
+    for jobs in args.jobs:
+        t0 = time.perf_counter()
+        matrix = compute_od_matrix(sites, sites, departure_times, model_type, jobs)
+        elapsed = time.perf_counter() - t0
+        baseline = baseline or elapsed
+        reference = matrix if reference is None else reference
+        same = np.array_equal(matrix, reference)
+        print(f"jobs {jobs:2d}  {elapsed:7.3f}s  speedup {baseline / elapsed:5.2f}x  "
+              f"{1e6 * elapsed / matrix.size:7.2f} us/pair  identical: {same}")
+
+    # Spot-check against the route planner's fastest route
+    pathfinder.global_model_type = model_type
+    worst = 0.0
+    for origin in sites[::7]:
+        for destination in sites[::5]:
+            if origin == destination:
+                continue
+            paths = pathfinder.k_shortest_paths(origin, destination, departure_times[0], 1)
+            best = paths[0][0] if paths else np.inf
+            od = reference[0, sites.index(origin), sites.index(destination)]
+            worst = max(worst, 0.0 if best == od == np.inf else abs(best - od))
+    print(f"max difference from k_shortest_paths fastest route: {worst:.6f} minutes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Equivalence check and timing of the vectorized process_data against the original row loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_process_data --sites 2000 3001
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from data.data import process_data
+
+DATA_DIR = 'data/splitted_data'
+LAGS = 12
+SEED = 42
+
+
+def process_data_loop(train, test, lags):
+    """The original per-row implementation of ``process_data``, kept as the reference."""
+    attr = 'Lane 1 Flow (Veh/5 Minutes)'
+    df1 = pd.read_csv(train, encoding='utf-8', parse_dates=['5 Minutes']).fillna(0)
+    df2 = pd.read_csv(test, encoding='utf-8', parse_dates=['5 Minutes']).fillna(0)
+
+    for df in [df1, df2]:
+        df['hour'] = df['5 Minutes'].dt.hour
+        df['day_of_week'] = df['5 Minutes'].dt.dayofweek
+        df['month'] = df['5 Minutes'].dt.month
+        df['is_weekend'] = df['5 Minutes'].dt.dayofweek.isin([5, 6]).astype(int)
+        df['hour_sin'] = np.sin(2 * np.pi * df['hour']/24)
+        df['hour_cos'] = np.cos(2 * np.pi * df['hour']/24)
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    flow1 = scaler.fit_transform(df1[attr].values.reshape(-1, 1)).reshape(1, -1)[0]
+    flow2 = scaler.transform(df2[attr].values.reshape(-1, 1)).reshape(1, -1)[0]
+
+    columns = ['hour', 'day_of_week', 'month', 'is_weekend', 'hour_sin', 'hour_cos']
+    train, train_time, test, test_time = [], [], [], []
+    for i in range(lags, len(flow1)):
+        train.append(flow1[i - lags: i + 1])
+        train_time.append([df1[column].iloc[i] for column in columns])
+    for i in range(lags, len(flow2)):
+        test.append(flow2[i - lags: i + 1])
+        test_time.append([df2[column].iloc[i] for column in columns])
+
+    train = np.array(train)
+    train_time = np.array(train_time)
+    test = np.array(test)
+    test_time = np.array(test_time)
+
+    shuffle_index = np.random.permutation(len(train))
+    train = train[shuffle_index]
+    train_time = train_time[shuffle_index]
+
+    X_train, y_train = train[:, :-1], train[:, -1]
+    X_test, y_test = test[:, :-1], test[:, -1]
+
+    return X_train, train_time, y_train, X_test, test_time, y_test, scaler
+
+
+def timed(func, train_file, test_file):
+    np.random.seed(SEED)
+    t0 = time.perf_counter()
+    result = func(train_file, test_file, LAGS)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", nargs="*", default=None, help="SCATS sites to check (default: all).")
+    args = parser.parse_args()
+
+    sites = args.sites or sorted(f.split('_')[0] for f in os.listdir(DATA_DIR) if 'train' in f)
+    names = ['X_train', 'X_train_time', 'y_train', 'X_test', 'X_test_time', 'y_test']
+    loop_total = vectorized_total = 0.0
+    mismatched = []
+
+    for site in sites:
+        train_file = os.path.join(DATA_DIR, f'{site}_train.csv')
+        test_file = os.path.join(DATA_DIR, f'{site}_test.csv')
+        expected, loop_time = timed(process_data_loop, train_file, test_file)
+        actual, vectorized_time = timed(process_data, train_file, test_file)
+        loop_total += loop_time
+        vectorized_total += vectorized_time
+
+        for name, a, b in zip(names, expected, actual):
+            if a.shape != b.shape or not np.array_equal(a, b):
+                mismatched.append(f"{site}:{name}")
+        print(f"{site:>5s}  loop {loop_time:6.3f}s  vectorized {vectorized_time:6.3f}s")
+
+    print(f"total  loop {loop_total:6.3f}s  vectorized {vectorized_total:6.3f}s  "
+          f"speedup {loop_total / vectorized_total:.1f}x over {len(sites)} sites")
+    if mismatched:
+        print("Mismatched outputs: " + ", ".join(mismatched))
+        sys.exit(1)
+    print("All outputs identical.")
+
+
+if __name__ == "__main__":
+    main()
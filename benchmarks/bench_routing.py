@@ -0,0 +1,107 @@
+"""
+Benchmark the time-dependent A* route search against the previous uniform-cost search.
+
+Runs every origin/destination pair in neighbouring_intersections.csv through both
+searches, checks they return the same routes and reports node expansions and latency.
+
+Run from the repository root:
+    python -m benchmarks.bench_routing --model LSTM --time "2006-10-02 08:00"
+"""
+import heapq
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import pathfinder
+from pathfinder import get_distance, get_flow_prediction, calculate_speed
+from benchmarks.label_search import find_multiple_paths, search_stats
+
+
+def legacy_find_multiple_paths(start, end, start_time, num_paths=5):
+    """The search pathfinder used before A*: list-copied paths, no heuristic. Returns (paths, expanded)."""
+    heap = [(0, 0, [start], start_time, 0)]
+    paths = []
+    visited = {}
+    expanded = 0
+
+    while heap and len(paths) < num_paths:
+        (estimated_time, current_distance, path, current_time, total_flow) = heapq.heappop(heap)
+        current = path[-1]
+
+        if current == end:
+            paths.append((estimated_time, current_distance, path, total_flow / len(path)))
+            continue
+
+        visit_key = (current, current_time.strftime("%Y-%m-%d %H:%M"))
+        if visit_key in visited and visited[visit_key] <= estimated_time:
+            continue
+        visited[visit_key] = estimated_time
+        expanded += 1
+
+        flow_prediction = get_flow_prediction(current, current_time)
+        if flow_prediction is None:
+            flow_prediction = 20
+
+        is_peak_hour = 7 <= current_time.hour <= 9 or 16 <= current_time.hour <= 18
+
+        for neighbor in pathfinder.neighbors.get(current, []):
+            if neighbor in path:
+                continue
+            segment_distance = get_distance(current, neighbor)
+            speed = calculate_speed(flow_prediction, is_peak_hour)
+            segment_time = (segment_distance / speed) * 60
+            heapq.heappush(heap, (estimated_time + segment_time, current_distance + segment_distance,
+                                  path + [neighbor], current_time + timedelta(minutes=segment_time),
+                                  total_flow + flow_prediction))
+
+    return sorted(paths, key=lambda x: x[0])[:num_paths], expanded
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="LSTM", help="Model type providing the flow forecasts.")
+    parser.add_argument("--time", default="2006-10-02 08:00", help="Departure time (YYYY-MM-DD HH:MM).")
+    parser.add_argument("--paths", type=int, default=5, help="Routes per origin/destination pair.")
+    args = parser.parse_args()
+
+    pathfinder.global_model_type = args.model.upper()
+    start_time = datetime.strptime(args.time, "%Y-%m-%d %H:%M")
+    pairs = [(a, b) for a in pathfinder.site_ids for b in pathfinder.site_ids if a != b]
+
+    # Warm the forecast table and distance caches so both searches measure only the search
+    for start, end in pairs:
+        legacy_find_multiple_paths(start, end, start_time, args.paths)
+
+    results = {}
+    for label, search in [('legacy', legacy_find_multiple_paths), ('A*', find_multiple_paths)]:
+        latencies, expansions, routes = [], [], []
+        for start, end in pairs:
+            t0 = time.perf_counter()
+            paths = search(start, end, start_time, args.paths)
+            latencies.append(time.perf_counter() - t0)
+            if label == 'legacy':
+                paths, expanded = paths
+            else:
+                expanded = search_stats['expanded']
+            expansions.append(expanded)
+            routes.append(paths)
+        results[label] = routes
+        print(f"{label:6s} {len(pairs)} pairs  total {sum(latencies):7.3f}s  "
+              f"p50 {1000 * percentile(latencies, 50):7.2f} ms  p99 {1000 * percentile(latencies, 99):7.2f} ms  "
+              f"expanded mean {sum(expansions) / len(expansions):8.1f}  max {max(expansions)}")
+
+    mismatched = 0
+    for legacy, astar in zip(results['legacy'], results['A*']):
+        same_paths = [p[2] for p in legacy] == [p[2] for p in astar]
+        same_times = all(abs(a[0] - b[0]) < 1e-6 for a, b in zip(legacy, astar))
+        mismatched += not (same_paths and same_times)
+    print(f"pairs with different routes: {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
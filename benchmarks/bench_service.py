@@ -0,0 +1,160 @@
+"""
+Load test for the local HTTP service: latency percentiles and throughput.
+
+Starts ``service.py`` on a free localhost port (or targets ``--port`` of an
+already running one with ``--external``) and keeps ``--concurrency`` keep-alive
+connections busy. Each request predicts a few random sites at a departure
+time drawn from a small pool, so concurrent requests overlap and exercise the
+coalescing; ``--route-share`` of the requests are route queries instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_service --requests 2000 --concurrency 32
+"""
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlencode
+
+import numpy as np
+
+import pathfinder
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_ready(host, port, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Service did not start on {host}:{port}")
+
+
+async def request(reader, writer, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+def make_targets(count, args, rng):
+    sites = pathfinder.site_ids
+    times = [f"{args.date} {hour:02d}:{minute:02d}" for hour in range(7, 10) for minute in (0, 15, 30, 45)]
+    targets = []
+    for _ in range(count):
+        if rng.random() < args.route_share:
+            origin, destination = rng.sample(sites, 2)
+            query = {'origin': origin, 'destination': destination, 'departure': rng.choice(times), 'model': args.model}
+            targets.append('/route?' + urlencode(query))
+        else:
+            query = {'sites': ','.join(rng.sample(sites, args.sites)), 'times': rng.choice(times), 'model': args.model}
+            targets.append('/predict?' + urlencode(query))
+    return targets
+
+
+async def client(host, port, targets, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while targets:
+            target = targets.pop()
+            t0 = time.perf_counter()
+            status, _ = await request(reader, writer, target)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args, port):
+    host = '127.0.0.1'
+    await wait_until_ready(host, port)
+    rng = random.Random(args.seed)
+
+    # Warm-up: loads models and forecast tables before timing
+    await asyncio.gather(*[client(host, port, make_targets(args.warmup, args, rng), [], [])])
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, before = await request(reader, writer, '/stats')
+
+    targets = make_targets(args.requests, args, rng)
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client(host, port, targets, latencies, errors) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - t0
+
+    _, after = await request(reader, writer, '/stats')
+    writer.close()
+
+    latencies = 1000 * np.array(latencies)
+    print(f"{len(latencies)} requests, concurrency {args.concurrency}, {args.sites} sites per prediction, "
+          f"{100 * args.route_share:.0f}% routes, model {args.model}")
+    print(f"throughput {len(latencies) / elapsed:8.1f} req/s")
+    print(f"latency p50 {np.percentile(latencies, 50):8.2f} ms   p99 {np.percentile(latencies, 99):8.2f} ms   "
+          f"max {latencies.max():8.2f} ms")
+    if errors:
+        print(f"{len(errors)} failed requests (status {sorted(set(errors))})")
+
+    predict_before, predict_after = before['predict'], after['predict']
+    requested = predict_after['requested'] - predict_before['requested']
+    merged = predict_after['merged'] - predict_before['merged']
+    batches = predict_after['batches'] - predict_before['batches']
+    calls = predict_after['predict_calls'] - predict_before['predict_calls']
+    print(f"predictions: {requested} requested, {merged} merged into in-flight keys, "
+          f"{batches} batches, {calls} model.predict calls")
+    print(f"routes: {after['route']['requested'] - before['route']['requested']} requested, "
+          f"{after['route']['merged'] - before['route']['merged']} merged, cache {after['route']['cache']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000, help="Timed requests.")
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed requests sent first.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Parallel keep-alive connections.")
+    parser.add_argument("--sites", type=int, default=4, help="Sites per /predict request.")
+    parser.add_argument("--route-share", type=float, default=0.1, help="Fraction of requests that are /route.")
+    parser.add_argument("--model", default="LSTM", help="Model type to query.")
+    parser.add_argument("--date", default="2006-10-02", help="Day of the queried departure times.")
+    parser.add_argument("--window", type=float, default=5.0, help="Coalescing window of the started service (ms).")
+    parser.add_argument("--port", type=int, default=None, help="Port of the service.")
+    parser.add_argument("--external", action="store_true", help="Use an already running service on --port.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    port = args.port or free_port()
+    server = None
+    if not args.external:
+        server = subprocess.Popen([sys.executable, 'service.py', '--port', str(port), '--window', str(args.window)])
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(run(args, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
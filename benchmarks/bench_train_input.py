@@ -0,0 +1,95 @@
+"""
+Peak RSS and samples/sec of the training input: in-memory process_data against WindowStream.
+
+Writes a long synthetic split to a temporary binary store, then runs one
+epoch of batches for each pipeline in a fresh interpreter, so peak RSS
+reflects only that pipeline. The eager path is what train_site does without
+--stream: process_data, build the model input and slice batches like
+model.fit. The stream path is WindowStream with prefetch.
+
+Run from the repository root:
+    python -m benchmarks.bench_train_input --rows 2000000
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from data.store import write_split, TIME_COLUMN, FLOW_COLUMN
+
+PIPELINE_SNIPPET = """
+import sys, json, time, resource
+import numpy as np
+mode, train, test, model_type, batch, shuffle_buffer, chunk_rows = sys.argv[1:8]
+batch, shuffle_buffer, chunk_rows = int(batch), int(shuffle_buffer), int(chunk_rows)
+from data.data import process_data, model_inputs, SAES_MODELS
+from data.stream import WindowStream, prefetch
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+samples = 0
+checksum = 0.0
+if mode == 'eager':
+    X_train, X_train_time, y_train, _, _, _, _ = process_data(train, test, 12)
+    X_train = model_inputs(model_type, X_train, X_train_time)
+    for start in range(0, len(X_train), batch):
+        X = X_train[start:start + batch].astype(np.float32)
+        checksum += float(X[:, 0].sum())
+        samples += len(X)
+else:
+    stream = WindowStream(train, 12, batch, time_features=model_type in SAES_MODELS,
+                          shuffle_buffer=shuffle_buffer, chunk_rows=chunk_rows)
+    shape = lambda X, X_time: model_inputs(model_type, X, X_time).astype(np.float32)
+    for X, y in prefetch(stream.batches(shape, epochs=1)):
+        checksum += float(X[:, 0].sum())
+        samples += len(X)
+elapsed = time.perf_counter() - t0
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'samples': samples, 'checksum': checksum,
+                  'rss_delta_kb': rss_after - rss_before, 'rss_peak_kb': rss_after}))
+"""
+
+
+def synthetic_split(rows, seed):
+    """15-minute flows with a daily profile and noise."""
+    rng = np.random.RandomState(seed)
+    times = pd.date_range('2006-10-01', periods=rows, freq='15min')
+    hours = times.hour.values + times.minute.values / 60
+    profile = 120 + 100 * np.sin(np.pi * (hours - 6) / 12).clip(0)
+    flows = np.maximum(profile + rng.normal(0, 20, rows), 0).round()
+    return pd.DataFrame({TIME_COLUMN: times, FLOW_COLUMN: flows})
+
+
+def run_pipeline(mode, train, test, args, model_type):
+    out = subprocess.run([sys.executable, '-c', PIPELINE_SNIPPET, mode, train, test, model_type, str(args.batch),
+                          str(args.shuffle_buffer), str(args.chunk_rows)],
+                         check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000000, help="15-minute rows in the synthetic training split.")
+    parser.add_argument("--models", default="lstm,saes", help="Comma-separated model input layouts to test.")
+    parser.add_argument("--batch", type=int, default=128)
+    parser.add_argument("--shuffle-buffer", type=int, default=32768)
+    parser.add_argument("--chunk-rows", type=int, default=16384)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        train, test = os.path.join(directory, 'bench_train'), os.path.join(directory, 'bench_test')
+        write_split(synthetic_split(args.rows, 0), train)
+        write_split(synthetic_split(1000, 1), test)
+        print(f"{args.rows} training rows ({args.rows / 96 / 30.4:.0f} months of 15-minute flows), batch {args.batch}")
+
+        for model_type in args.models.split(','):
+            for mode in ('eager', 'stream'):
+                result = run_pipeline(mode, train, test, args, model_type)
+                print(f"{model_type:6s} {mode:6s} {result['samples'] / result['seconds']:12,.0f} samples/s  "
+                      f"RSS +{result['rss_delta_kb'] / 1024:7.1f} MB (peak {result['rss_peak_kb'] / 1024:7.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
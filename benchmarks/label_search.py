@@ -0,0 +1,98 @@
+"""
+The multi-label A* route search that pathfinder used before Yen's k-shortest paths.
+
+Kept only as a baseline for bench_routing and bench_k_shortest. Its
+(node, minute) pruning drops valid alternatives, so it can miss routes that
+pathfinder.k_shortest_paths returns; serving code must not use it.
+"""
+import heapq
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Tuple
+
+from pathfinder import (road_graph, site_ids, site_index, neighbor_index, edge_length_index, get_flow_prediction,
+                        calculate_speed, MAX_SPEED, DEFAULT_FLOW)
+
+# Counters of the most recent find_multiple_paths search
+search_stats = {'expanded': 0, 'generated': 0, 'pruned': 0}
+
+
+@lru_cache(maxsize=None)
+def heuristic_table(end: str) -> List[float]:
+    # Lower bound on the minutes from every node to end: straight-line distance at the top speed.
+    # Edges are straight-line segments, so by the triangle inequality this is also consistent.
+    return (road_graph.distances_to(site_index[end]) / MAX_SPEED * 60).tolist()
+
+
+def trace_path(label: int, label_node: List[int], label_parent: List[int]) -> List[str]:
+    path = []
+    while label != -1:
+        path.append(site_ids[label_node[label]])
+        label = label_parent[label]
+    return path[::-1]
+
+
+def find_multiple_paths(start: str, end: str, start_time: datetime, num_paths: int = 5) -> List[Tuple[float, float, List[str], float]]:
+    # Time-dependent A* over loop-free partial paths ("labels"). Goal labels are popped in order of
+    # travel time, so the first num_paths reaching end are the fastest routes.
+    search_stats.update(expanded=0, generated=0, pruned=0)
+    if start not in site_index or end not in site_index:
+        return []
+    h = heuristic_table(end)
+    goal = site_index[end]
+
+    # Labels live in parallel arrays; a path is recovered by following parent pointers
+    origin = site_index[start]
+    label_node = [origin]
+    label_parent = [-1]
+    label_flow = [0]
+    label_visited = [1 << origin]  # bitmask of nodes on the path, for the loop check
+
+    heap = [(h[origin], 0.0, 0.0, 0)]  # (travel_time + heuristic, travel_time, distance, label)
+    paths = []
+    visited = {}
+
+    while heap and len(paths) < num_paths:
+        (_, estimated_time, current_distance, label) = heapq.heappop(heap)
+        current = label_node[label]
+
+        if current == goal:
+            path = trace_path(label, label_node, label_parent)
+            paths.append((estimated_time, current_distance, path, label_flow[label] / len(path)))
+            continue
+
+        current_time = start_time + timedelta(minutes=estimated_time)
+        visit_key = (current, current_time.replace(second=0, microsecond=0))
+        if visit_key in visited and visited[visit_key] <= estimated_time:
+            search_stats['pruned'] += 1
+            continue
+        visited[visit_key] = estimated_time
+        search_stats['expanded'] += 1
+
+        current_site = site_ids[current]
+        flow_prediction = get_flow_prediction(current_site, current_time)
+        if flow_prediction is None:
+            flow_prediction = DEFAULT_FLOW
+
+        is_peak_hour = 7 <= current_time.hour <= 9 or 16 <= current_time.hour <= 18
+        speed = calculate_speed(flow_prediction, is_peak_hour)
+        path_mask = label_visited[label]
+        total_flow = label_flow[label] + flow_prediction
+
+        for neighbor in neighbor_index[current]:
+            if path_mask >> neighbor & 1:
+                continue
+
+            segment_distance = edge_length_index[current][neighbor]
+            new_estimated_time = estimated_time + (segment_distance / speed) * 60  # time in minutes
+
+            label_node.append(neighbor)
+            label_parent.append(label)
+            label_flow.append(total_flow)
+            label_visited.append(path_mask | 1 << neighbor)
+            search_stats['generated'] += 1
+
+            heapq.heappush(heap, (new_estimated_time + h[neighbor], new_estimated_time,
+                                  current_distance + segment_distance, len(label_node) - 1))
+
+    return paths
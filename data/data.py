@@ -3,15 +3,75 @@ Processing the data
 """
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import as_strided
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from data.store import load_split
+
+SAES_MODELS = ['saes', 'saes_fixed']  # Fed flows plus time features instead of a (lags, 1) sequence
+
+
+def sliding_windows(values, width):
+    """Sliding windows
+    Strided view of every run of ``width`` consecutive values.
+
+    # Arguments
+        values: ndarray, 1-D series.
+        width: integer, window length.
+    # Returns
+        windows: ndarray, read-only view of shape (len(values) - width + 1, width).
+    """
+    values = np.ascontiguousarray(values)
+    n_windows = max(len(values) - width + 1, 0)
+    stride = values.strides[0]
+    return as_strided(values, shape=(n_windows, width), strides=(stride, stride), writeable=False)
+
+
+def time_features(timestamps):
+    """Time features
+    Calendar features for each timestamp, in the column order the models were trained on.
+
+    # Arguments
+        timestamps: Series, datetime64 values.
+    # Returns
+        features: ndarray, (hour, day_of_week, month, is_weekend, hour_sin, hour_cos) per row.
+    """
+    hour = timestamps.dt.hour.values
+    day_of_week = timestamps.dt.dayofweek.values
+    month = timestamps.dt.month.values
+    is_weekend = (day_of_week >= 5).astype(int)
+    return np.column_stack([
+        hour,
+        day_of_week,
+        month,
+        is_weekend,
+        np.sin(2 * np.pi * hour / 24),
+        np.cos(2 * np.pi * hour / 24)
+    ])
+
+
+def model_inputs(model_type, X, X_time):
+    """Model inputs
+    Lay out lag windows the way ``model_type`` was trained on (see train.build_model).
+
+    # Arguments
+        model_type: String, lowercase model name.
+        X: ndarray, (samples, lags) scaled flows.
+        X_time: ndarray, (samples, 6) time features; only used by the SAEs.
+    # Returns
+        inputs: ndarray, (samples, lags + 6) for SAEs, (samples, lags, 1) otherwise.
+    """
+    if model_type in SAES_MODELS:
+        return np.concatenate((X, X_time), axis=1)
+    return np.reshape(X, (X.shape[0], X.shape[1], 1))
+
 
 def process_data(train, test, lags):
     """Process data
     Reshape and split train\test data.
 
     # Arguments
-        train: String, name of .csv train file.
-        test: String, name of .csv test file.
+        train: String, name of .csv train file, or its prefix in the binary store.
+        test: String, name of .csv test file, or its prefix in the binary store.
         lags: integer, time lag.
     # Returns
         X_train: ndarray (flow data).
@@ -22,49 +82,18 @@ def process_data(train, test, lags):
         y_test: ndarray.
         scaler: MinMaxScaler.
     """
-    attr = 'Lane 1 Flow (Veh/5 Minutes)'
-    df1 = pd.read_csv(train, encoding='utf-8', parse_dates=['5 Minutes']).fillna(0)
-    df2 = pd.read_csv(test, encoding='utf-8', parse_dates=['5 Minutes']).fillna(0)
-
-    # Add time-based features
-    for df in [df1, df2]:
-        df['hour'] = df['5 Minutes'].dt.hour
-        df['day_of_week'] = df['5 Minutes'].dt.dayofweek
-        df['month'] = df['5 Minutes'].dt.month
-        df['is_weekend'] = df['5 Minutes'].dt.dayofweek.isin([5, 6]).astype(int)
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour']/24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour']/24)
+    times1, values1 = load_split(train)
+    times2, values2 = load_split(test)
 
     scaler = MinMaxScaler(feature_range=(0, 1))
-    flow1 = scaler.fit_transform(df1[attr].values.reshape(-1, 1)).reshape(1, -1)[0]
-    flow2 = scaler.transform(df2[attr].values.reshape(-1, 1)).reshape(1, -1)[0]
-
-    train, train_time, test, test_time = [], [], [], []
-    for i in range(lags, len(flow1)):
-        train.append(flow1[i - lags: i + 1])
-        train_time.append([
-            df1['hour'].iloc[i],
-            df1['day_of_week'].iloc[i],
-            df1['month'].iloc[i],
-            df1['is_weekend'].iloc[i],
-            df1['hour_sin'].iloc[i],
-            df1['hour_cos'].iloc[i]
-        ])
-    for i in range(lags, len(flow2)):
-        test.append(flow2[i - lags: i + 1])
-        test_time.append([
-            df2['hour'].iloc[i],
-            df2['day_of_week'].iloc[i],
-            df2['month'].iloc[i],
-            df2['is_weekend'].iloc[i],
-            df2['hour_sin'].iloc[i],
-            df2['hour_cos'].iloc[i]
-        ])
-
-    train = np.array(train)
-    train_time = np.array(train_time)
-    test = np.array(test)
-    test_time = np.array(test_time)
+    flow1 = scaler.fit_transform(values1.reshape(-1, 1)).reshape(1, -1)[0]
+    flow2 = scaler.transform(values2.reshape(-1, 1)).reshape(1, -1)[0]
+
+    # Each row is a read-only view of lags + 1 consecutive flows, no data is copied
+    train = sliding_windows(flow1, lags + 1)
+    train_time = time_features(times1)[lags:]
+    test = sliding_windows(flow2, lags + 1)
+    test_time = time_features(times2)[lags:]
 
     # Shuffle the training data
     shuffle_index = np.random.permutation(len(train))
@@ -74,4 +103,4 @@ def process_data(train, test, lags):
     X_train, y_train = train[:, :-1], train[:, -1]
     X_test, y_test = test[:, :-1], test[:, -1]
 
-    return X_train, train_time, y_train, X_test, test_time, y_test, scaler
\ No newline at end of file
+    return X_train, train_time, y_train, X_test, test_time, y_test, scaler
@@ -1,81 +1,104 @@
+"""
+Reshape the wide SCATS volume table (one row per site and day, V00..V95 flow
+columns) into the long per-site train/test splits in splitted_data/.
+
+Run from the data directory:
+    python reshape.py [--csv ml_train_october.csv] [--output-dir splitted_data] [--chunksize 5000]
+"""
+import os
+import math
+import argparse
+import numpy as np
 import pandas as pd
 from time_map import time_mapping
 
-csv_path = 'ml_train_october.csv'
-ml_train_october = pd.read_csv(csv_path)
-
-# initialize the new dataframe
-final_df_scats_october = pd.DataFrame()
-
-# iterating through the entire ml_train_october DF
-for i in range(len(ml_train_october)):
-    # extract the relevant columns
-    date = ml_train_october.iloc[i]['Date']
-    cd_melways = ml_train_october.iloc[i]['CD_MELWAYS']
-    flow_data = ml_train_october.iloc[i, 4:]  # extracting V00 - V95 columns
-    scat_number = ml_train_october.iloc[i]['SCATS Number']
-    # create a temporary dataframe for this row's data
-    temp_df = pd.DataFrame({
-        'Date': date,
-        'CD_MELWAYS': cd_melways,
-        'Scat_Number': scat_number,
-        '15_Minute_Intervals': flow_data.index,
-        'Flow Vehicles': flow_data.values,
-    })
-
-    # append the temporary dataframe to the final dataframe
-    final_df_scats_october = pd.concat([final_df_scats_october, temp_df], ignore_index=True)
-
-print(final_df_scats_october.head())
-
-
-# Apply the mapping to the '15_Minute_Intervals' column
-final_df_scats_october['15_Minute_Intervals'] = final_df_scats_october['15_Minute_Intervals'].map(time_mapping)
-
-# For example, '1/10/06' means 1st of October, 2006
-final_df_scats_october['DateTime'] = pd.to_datetime(
-    final_df_scats_october['Date'] + ' ' + final_df_scats_october['15_Minute_Intervals'],
-    format='%d/%m/%y %H:%M',  # Adjust the format to match your 'Date' column
-    errors='coerce'
-)
-
-# Format 'DateTime' to remove seconds and keep only hours and minutes
-final_df_scats_october['DateTime'] = final_df_scats_october['DateTime'].dt.strftime('%d/%m/%Y %H:%M')
-
-# Move 'DateTime' to the first column
-new_column_order = ['DateTime'] + [col for col in final_df_scats_october.columns if col != 'DateTime']
-
-# Reorder the DataFrame columns
-final_df_scats_october = final_df_scats_october[new_column_order]
-
-# Move 'SCATS_Number' to the last position
-new_column_order = [col for col in final_df_scats_october.columns if col != 'Scat_Number'] + ['Scat_Number']
-
-# Reorder the DataFrame
-final_df_scats_october = final_df_scats_october[new_column_order]
-
-# Insert a new column '# Lane Points' in the third position (index 2) and fill it with 1
-final_df_scats_october.insert(2, '# Lane Points', 1)
-final_df_scats_october.insert(3, '% Observed', 100)
-
-#Dropping CD_MELWAYS column
-
-final_df_scats_october.drop(columns=['CD_MELWAYS', 'Date', '15_Minute_Intervals'], inplace=True)
-
-# Step 1: Remove the 'Flow_Vehicles' column and store its data
-flow_vehicles_column = final_df_scats_october.pop('Flow Vehicles')
-
-# Step 2: Reinsert 'Flow_Vehicles' at index 1 (second position)
-final_df_scats_october.insert(1, 'Flow Vehicles', flow_vehicles_column)
-
-final_df_scats_october.rename(columns={
-    'DateTime': '5 Minutes',
-    'Flow Vehicles': 'Lane 1 Flow (Veh/5 Minutes)',
-    'Scat_Number': 'SCATS'
-}, inplace=True)
-
-# final_df_scats_october.to_csv('final_df_scats_october.csv', index=False)
-
-print(final_df_scats_october.head())
-
-
+SITE_COLUMN = 'SCATS Number'
+FLOW_COLUMNS = list(time_mapping.keys())  # V00 - V95
+OUTPUT_COLUMNS = ['5 Minutes', 'Lane 1 Flow (Veh/5 Minutes)', '# Lane Points', '% Observed', 'SCATS']
+
+
+def read_chunks(csv_path, chunksize=None, usecols=None):
+    """Yield the input table whole, or in ``chunksize``-row pieces for months larger than memory."""
+    if chunksize is None:
+        yield pd.read_csv(csv_path, usecols=usecols)
+    else:
+        for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize):
+            yield chunk
+
+
+def wide_to_long(wide):
+    """Convert one block of wide rows into long rows, keeping row-major (site/day, interval) order."""
+    n_rows, n_intervals = len(wide), len(FLOW_COLUMNS)
+
+    # Parse each day once and attach the interval times as strings
+    days = pd.to_datetime(wide['Date'], format='%d/%m/%y', errors='coerce').dt.strftime('%d/%m/%Y')
+    times = np.array([time_mapping[column] for column in FLOW_COLUMNS], dtype=object)
+    date_times = pd.Series(np.repeat(days.values, n_intervals)) + ' ' + np.tile(times, n_rows)
+
+    return pd.DataFrame({
+        OUTPUT_COLUMNS[0]: date_times.values,
+        OUTPUT_COLUMNS[1]: wide[FLOW_COLUMNS].values.ravel(),
+        OUTPUT_COLUMNS[2]: 1,
+        OUTPUT_COLUMNS[3]: 100,
+        OUTPUT_COLUMNS[4]: np.repeat(wide[SITE_COLUMN].values, n_intervals),
+    }, columns=OUTPUT_COLUMNS)
+
+
+def split_sizes(csv_path, chunksize=None, test_size=0.2):
+    """Number of long training rows per site, matching train_test_split(test_size, shuffle=False)."""
+    counts = None
+    for chunk in read_chunks(csv_path, chunksize, usecols=[SITE_COLUMN]):
+        chunk_counts = chunk[SITE_COLUMN].value_counts()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+
+    sizes = {}
+    for site, n_rows in counts.items():
+        n_samples = int(n_rows) * len(FLOW_COLUMNS)
+        sizes[site] = n_samples - int(math.ceil(test_size * n_samples))
+    return sizes
+
+
+def reshape_to_splits(csv_path, output_dir, chunksize=None, test_size=0.2, long_csv=None):
+    """Write the per-site train/test CSVs that split.py produces, in one streaming pass over the input."""
+    os.makedirs(output_dir, exist_ok=True)
+    train_sizes = split_sizes(csv_path, chunksize, test_size)
+    written = {site: 0 for site in train_sizes}
+    started = set()
+
+    def append(df, path):
+        df.to_csv(path, mode='a' if path in started else 'w', header=path not in started, index=False)
+        started.add(path)
+
+    for wide in read_chunks(csv_path, chunksize):
+        long_df = wide_to_long(wide)
+        if long_csv is not None:
+            append(long_df, long_csv)
+
+        for site, group_df in long_df.groupby(OUTPUT_COLUMNS[4], sort=False):
+            # Rows before the site's cut-off go to training, the rest to testing
+            n_train = max(0, min(len(group_df), train_sizes[site] - written[site]))
+            if n_train:
+                append(group_df.iloc[:n_train], os.path.join(output_dir, f'{site}_train.csv'))
+            if n_train < len(group_df):
+                append(group_df.iloc[n_train:], os.path.join(output_dir, f'{site}_test.csv'))
+            written[site] += len(group_df)
+
+    print(f"Data has been split and saved to the directory: {output_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default='ml_train_october.csv', help="Wide SCATS volume table.")
+    parser.add_argument("--output-dir", default='splitted_data', help="Directory for the per-site splits.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the input this many rows at a time instead of loading it whole.")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Fraction of each site held out for testing.")
+    parser.add_argument("--long-csv", default=None,
+                        help="Also write the combined long table (e.g. final_df_scats_october.csv).")
+    args = parser.parse_args()
+
+    reshape_to_splits(args.csv, args.output_dir, args.chunksize, args.test_size, args.long_csv)
+
+
+if __name__ == '__main__':
+    main()
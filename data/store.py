@@ -0,0 +1,97 @@
+"""
+Binary per-site dataset store for the train/test splits
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+TIME_COLUMN = '5 Minutes'
+FLOW_COLUMN = 'Lane 1 Flow (Veh/5 Minutes)'
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(base_dir, 'splitted_data')
+STORE_DIR = os.path.join(base_dir, 'splitted_store')
+
+
+def is_store_path(path):
+    """Store splits are addressed by their prefix, e.g. data/splitted_store/2000_train."""
+    return not path.endswith('.csv')
+
+
+def store_files(prefix):
+    return prefix + '_time.npy', prefix + '_flow.npy'
+
+
+def get_scats_sites(data_dir):
+    """Get SCATS sites based on file names from the directory"""
+    # Get all the train file names from the folder
+    files = os.listdir(data_dir)
+    train_files = [f for f in files if 'train' in f]
+
+    # Extract SCATS IDs (e.g., '2000', '2200', etc.); a binary store holds several files per split
+    scats_sites = list(dict.fromkeys(f.split('_')[0] for f in train_files))
+
+    return scats_sites
+
+
+def get_split_files(data_dir, site):
+    """Train/test CSV paths, or store prefixes when ``data_dir`` is a binary store."""
+    prefixes = os.path.join(data_dir, f'{site}_train'), os.path.join(data_dir, f'{site}_test')
+    if all(os.path.exists(path) for prefix in prefixes for path in store_files(prefix)):
+        return prefixes
+    return tuple(prefix + '.csv' for prefix in prefixes)
+
+
+def write_split(df, prefix):
+    """Save one split as int64 nanosecond timestamps and int16 (or float32) flows."""
+    flows = df[FLOW_COLUMN].values
+    if np.all(np.mod(flows, 1) == 0) and flows.min() >= np.iinfo(np.int16).min and flows.max() <= np.iinfo(np.int16).max:
+        flows = flows.astype(np.int16)
+    else:
+        flows = flows.astype(np.float32)
+
+    time_path, flow_path = store_files(prefix)
+    np.save(time_path, df[TIME_COLUMN].values.astype('datetime64[ns]').view(np.int64))
+    np.save(flow_path, flows)
+
+
+def load_split(path):
+    """Load a split from a CSV file or a store prefix.
+
+    # Returns
+        timestamps: Series, datetime64 values.
+        flows: ndarray, flow per row; memory-mapped read-only for store splits.
+    """
+    if not is_store_path(path):
+        df = pd.read_csv(path, encoding='utf-8', parse_dates=[TIME_COLUMN]).fillna(0)
+        return df[TIME_COLUMN], df[FLOW_COLUMN].values
+
+    time_path, flow_path = store_files(path)
+    times = np.load(time_path, mmap_mode='r')
+    flows = np.load(flow_path, mmap_mode='r')
+    return pd.Series(times.view('datetime64[ns]')), flows
+
+
+def convert_csv_dir(src=CSV_DIR, dst=STORE_DIR):
+    """One-off conversion of every {site}_{train,test}.csv in ``src`` into the store layout."""
+    os.makedirs(dst, exist_ok=True)
+    csv_files = sorted(f for f in os.listdir(src) if f.endswith('.csv'))
+    for f in csv_files:
+        # Parse exactly as process_data does, so both sources give identical windows
+        df = pd.read_csv(os.path.join(src, f), encoding='utf-8', parse_dates=[TIME_COLUMN]).fillna(0)
+        write_split(df, os.path.join(dst, f[:-len('.csv')]))
+    print(f"Converted {len(csv_files)} splits from {src} to {dst}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default=CSV_DIR, help="Directory of {site}_{train,test}.csv files.")
+    parser.add_argument("--dst", default=STORE_DIR, help="Directory to write the binary store to.")
+    args = parser.parse_args(argv[1:])
+    convert_csv_dir(args.src, args.dst)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
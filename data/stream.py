@@ -0,0 +1,187 @@
+"""
+Streaming training input: lag windows built chunk by chunk from a split
+"""
+import queue
+import threading
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from data.data import sliding_windows, time_features
+from data.store import load_split
+
+CHUNK_ROWS = 16384  # Flow rows read and windowed at a time
+SHUFFLE_BUFFER = 32768  # Windows held back for shuffling
+PREFETCH_BATCHES = 8
+
+
+def fit_scaler(flows, chunk_rows=CHUNK_ROWS):
+    """Fit scaler
+    Fit the MinMaxScaler of ``process_data`` without loading the whole series.
+
+    # Arguments
+        flows: ndarray, flow per row (usually memory-mapped).
+        chunk_rows: integer, rows per partial fit.
+    # Returns
+        scaler: MinMaxScaler, identical to fitting on every flow at once.
+    """
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    for start in range(0, len(flows), chunk_rows):
+        scaler.partial_fit(np.asarray(flows[start:start + chunk_rows], dtype=np.float64).reshape(-1, 1))
+    return scaler
+
+
+class WindowStream:
+    """Batches of (lag window, next flow) pairs read from one split in chunks.
+
+    Only ``chunk_rows`` flows are scaled and windowed at a time, and windows
+    are shuffled through a bounded buffer (as tf.data's ``shuffle`` does), so
+    memory stays flat however long the split is. Every epoch yields each
+    window in ``[first, last)`` exactly once, in ``steps`` batches.
+
+    # Arguments
+        path: String, .csv split or binary store prefix (see data/store.py).
+        lags: integer, time lag.
+        batch_size: integer, windows per batch.
+        scaler: MinMaxScaler, fitted on the training flows; fitted here if None.
+        time_features: bool, also yield the calendar features (for SAEs).
+        shuffle_buffer: integer, windows held for shuffling; 0 keeps time order.
+        first, last: integer, window range to use (default: all windows).
+    """
+
+    def __init__(self, path, lags, batch_size, scaler=None, time_features=False, shuffle_buffer=SHUFFLE_BUFFER,
+                 chunk_rows=CHUNK_ROWS, first=0, last=None, seed=None):
+        self.timestamps, self.flows = load_split(path)
+        self.lags = lags
+        self.batch_size = batch_size
+        self.scaler = scaler if scaler is not None else fit_scaler(self.flows, chunk_rows)
+        self.time_features = time_features
+        self.shuffle_buffer = shuffle_buffer
+        self.chunk_rows = max(chunk_rows, 1)
+        n_windows = max(len(self.flows) - lags, 0)
+        self.first = first
+        self.last = n_windows if last is None else min(last, n_windows)
+        self.rng = np.random.RandomState(seed)
+
+    def __len__(self):
+        return max(self.last - self.first, 0)
+
+    @property
+    def steps(self):
+        """Batches per epoch."""
+        return -(-len(self) // self.batch_size)
+
+    def split(self, validation_split):
+        """Training and validation streams over the earlier and the last ``validation_split`` of the windows."""
+        boundary = self.last - int(round(len(self) * validation_split))
+        train = WindowStream.__new__(WindowStream)
+        train.__dict__.update(self.__dict__, last=boundary)
+        validation = WindowStream.__new__(WindowStream)
+        validation.__dict__.update(self.__dict__, first=boundary, shuffle_buffer=0)
+        return train, validation
+
+    def chunks(self):
+        """Scaled windows, targets and time features, ``chunk_rows`` windows at a time and in time order."""
+        for start in range(self.first, self.last, self.chunk_rows):
+            stop = min(start + self.chunk_rows, self.last)
+            flows = np.asarray(self.flows[start:stop + self.lags], dtype=np.float64)
+            scaled = self.scaler.transform(flows.reshape(-1, 1)).ravel()
+            windows = sliding_windows(scaled, self.lags + 1)
+            times = time_features(self.timestamps.iloc[start + self.lags:stop + self.lags]) \
+                if self.time_features else None
+            yield windows[:, :-1], windows[:, -1], times
+
+    def shuffled(self):
+        """Chunks passed through the shuffle buffer: a chunk joins the buffer, which is permuted and
+        emits all but ``shuffle_buffer`` windows; the rest is emitted at the end of the epoch."""
+        buffered = None
+        for chunk in self.chunks():
+            if self.shuffle_buffer <= 0:
+                yield chunk
+                continue
+            buffered = chunk if buffered is None else tuple(
+                None if held is None else np.concatenate((held, new)) for held, new in zip(buffered, chunk))
+            order = self.rng.permutation(len(buffered[0]))
+            emit, keep = order[:-self.shuffle_buffer], order[-self.shuffle_buffer:]
+            if len(emit):
+                yield tuple(None if part is None else part[emit] for part in buffered)
+            buffered = tuple(None if part is None else part[keep] for part in buffered)
+        if buffered is not None and len(buffered[0]):
+            order = self.rng.permutation(len(buffered[0]))
+            yield tuple(None if part is None else part[order] for part in buffered)
+
+    def epoch(self):
+        """One pass as ``(X, y, X_time)`` batches of ``batch_size`` (the last one may be smaller)."""
+        pending = []
+        pending_rows = 0
+        for chunk in self.shuffled():
+            pending.append(chunk)
+            pending_rows += len(chunk[0])
+            if pending_rows < self.batch_size:
+                continue
+            merged = self.merge(pending)
+            full = pending_rows - pending_rows % self.batch_size
+            for start in range(0, full, self.batch_size):
+                yield tuple(None if part is None else part[start:start + self.batch_size] for part in merged)
+            pending = [tuple(None if part is None else part[full:] for part in merged)]
+            pending_rows -= full
+        if pending_rows:
+            yield self.merge(pending)
+
+    @staticmethod
+    def merge(parts):
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(None if column[0] is None else np.concatenate(column) for column in zip(*parts))
+
+    def batches(self, shape=None, epochs=None):
+        """Batches for ``fit_generator``: repeats the epoch forever (or ``epochs`` times).
+
+        ``shape(X, X_time)`` turns a batch into the model's input layout.
+        """
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            for X, y, X_time in self.epoch():
+                yield (shape(X, X_time) if shape is not None else X), y
+            epoch += 1
+
+
+def prefetch(iterator, size=PREFETCH_BATCHES):
+    """Prefetch
+    Run ``iterator`` on a background thread, keeping up to ``size`` items ready.
+
+    # Arguments
+        iterator: Iterable, e.g. ``WindowStream.batches()``.
+        size: integer, items produced ahead of the consumer.
+    # Returns
+        generator: yields the items of ``iterator``; errors are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=size)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        items.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put((done, None))
+        except Exception as e:
+            items.put((done, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
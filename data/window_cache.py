@@ -0,0 +1,186 @@
+"""
+Content-addressed cache of process_data outputs as memory-mapped .npy files
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from data.data import process_data
+from data.store import is_store_path, store_files
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+WINDOW_CACHE_DIR = os.path.join(base_dir, 'window_cache')
+
+# Bump whenever process_data, sliding_windows or time_features change what they produce
+FEATURE_VERSION = 1
+
+ARRAYS = ['X_train', 'X_train_time', 'y_train', 'X_test', 'X_test_time', 'y_test']
+META_FILE = 'meta.json'
+
+
+def source_files(path):
+    return list(store_files(path)) if is_store_path(path) else [path]
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(train, test, lags):
+    """Hash of the train/test file contents, the lag and the feature version."""
+    digest = hashlib.sha1(f"v{FEATURE_VERSION}|lags={lags}".encode('utf-8'))
+    for path in source_files(train) + ['|'] + source_files(test):
+        digest.update(path.encode('utf-8') if path == '|' else file_digest(path).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def scaler_from_range(data_min, data_max, feature_range=(0, 1)):
+    """A MinMaxScaler with the given fitted range, equal to one fitted on the original flows."""
+    scaler = MinMaxScaler(feature_range=tuple(feature_range))
+    return scaler.fit(np.array([[data_min], [data_max]], dtype=np.float64))
+
+
+def write_entry(entry_dir, outputs, train, test, lags):
+    """Write one entry into a temporary directory and move it into place, so readers never see half of it."""
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    *arrays, scaler = outputs
+    for name, array in zip(ARRAYS, arrays):
+        np.save(os.path.join(tmp_dir, name + '.npy'), np.ascontiguousarray(array))
+    meta = {
+        'train': train,
+        'test': test,
+        'lags': lags,
+        'feature_version': FEATURE_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'data_min': float(scaler.data_min_[0]),
+        'data_max': float(scaler.data_max_[0]),
+        'feature_range': list(scaler.feature_range),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another worker finished the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_entry(entry_dir):
+    arrays = [np.load(os.path.join(entry_dir, name + '.npy'), mmap_mode='r') for name in ARRAYS]
+    meta_path = os.path.join(entry_dir, META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    os.utime(meta_path)  # Last use, for LRU cleanup
+    return tuple(arrays) + (scaler_from_range(meta['data_min'], meta['data_max'], meta['feature_range']),)
+
+
+def cached_process_data(train, test, lags, cache_dir=WINDOW_CACHE_DIR):
+    """Cached process data
+    ``process_data`` backed by the window cache.
+
+    The first call for a (train contents, test contents, lags) key runs
+    process_data and saves its arrays; later calls, from any model type,
+    run or worker, memory-map them read-only instead. The training windows
+    keep the shuffle order of the run that created the entry.
+
+    # Arguments
+        train: String, name of .csv train file, or its prefix in the binary store.
+        test: String, name of .csv test file, or its prefix in the binary store.
+        lags: integer, time lag.
+    # Returns
+        The same tuple as process_data; arrays are read-only memory maps.
+    """
+    entry_dir = os.path.join(cache_dir, cache_key(train, test, lags))
+    if not os.path.exists(os.path.join(entry_dir, META_FILE)):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_entry(entry_dir, process_data(train, test, lags), train, test, lags)
+    return read_entry(entry_dir)
+
+
+def entry_size(entry_dir):
+    return sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+
+
+def list_entries(cache_dir=WINDOW_CACHE_DIR):
+    """(key, meta, bytes, last used) of every complete entry, least recently used first."""
+    entries = []
+    if not os.path.isdir(cache_dir):
+        return entries
+    for key in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, key, META_FILE)
+        if '.tmp-' in key or not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        entries.append((key, meta, entry_size(os.path.join(cache_dir, key)), os.path.getmtime(meta_path)))
+    return sorted(entries, key=lambda entry: entry[3])
+
+
+def clean_cache(cache_dir=WINDOW_CACHE_DIR, max_age_days=None, max_bytes=None, remove_all=False):
+    """Remove entries unused for ``max_age_days``, from another feature version, or whose sources are gone,
+    then least recently used entries until the cache fits ``max_bytes``. Returns (entries removed, bytes freed)."""
+    if not os.path.isdir(cache_dir):
+        return 0, 0
+    removed, freed = 0, 0
+
+    # Leftovers of interrupted writes
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and ('.tmp-' in name or not os.path.exists(os.path.join(path, META_FILE))):
+            freed += entry_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+
+    entries = list_entries(cache_dir)
+    total = sum(size for _, _, size, _ in entries)
+    now = time.time()
+    for key, meta, size, last_used in entries:
+        expired = max_age_days is not None and now - last_used > max_age_days * 86400
+        outdated = meta.get('feature_version') != FEATURE_VERSION
+        orphaned = not all(os.path.exists(path) for split in (meta['train'], meta['test'])
+                           for path in source_files(split))
+        over_budget = max_bytes is not None and total > max_bytes
+        if remove_all or expired or outdated or orphaned or over_budget:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            removed += 1
+            freed += size
+            total -= size
+    return removed, freed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=WINDOW_CACHE_DIR, help="Window cache directory.")
+    parser.add_argument("--list", action="store_true", help="List the cached entries.")
+    parser.add_argument("--clean", action="store_true",
+                        help="Remove outdated, orphaned and interrupted entries (plus --max-age/--max-mb).")
+    parser.add_argument("--max-age", type=float, default=None, help="Also remove entries unused for this many days.")
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="Also remove least recently used entries until the cache fits in this many MB.")
+    parser.add_argument("--all", action="store_true", help="Remove every entry.")
+    args = parser.parse_args(argv[1:])
+
+    if args.clean or args.all:
+        max_bytes = args.max_mb * 1024 ** 2 if args.max_mb is not None else None
+        removed, freed = clean_cache(args.dir, args.max_age, max_bytes, args.all)
+        print(f"Removed {removed} entries, freed {freed / 1024 ** 2:.1f} MB")
+
+    entries = list_entries(args.dir)
+    if args.list:
+        for key, meta, size, last_used in entries:
+            print(f"{key[:12]}  {os.path.basename(meta['train'])} lags={meta['lags']} v{meta['feature_version']}  "
+                  f"{size / 1024 ** 2:7.1f} MB  last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}")
+    print(f"{len(entries)} entries, {sum(size for _, _, size, _ in entries) / 1024 ** 2:.1f} MB in {args.dir}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,4 +1,5 @@
 import os
+from model.archive import ModelArchive, get_archive_paths
 
 
 def check_model_structure():
@@ -25,25 +26,45 @@ def check_model_structure():
         print("'sites_models' directory not found!")
         return
 
-    # List all files in the model directory
-    print("\nExisting model files:")
-    model_files = os.listdir(abs_model_dir)
-    if model_files:
-        for file in model_files:
-            file_path = os.path.join(abs_model_dir, file)
-            file_size = os.path.getsize(file_path) / (1024 * 1024)  # Convert to MB
-            print(f"- {file} ({file_size:.2f} MB)")
-    else:
-        print("No model files found in the directory!")
-
-    # Check if specific models exist
-    print("\nChecking for specific models:")
     model_types = ['lstm', 'gru', 'saes']
     test_sites = ['970', '3001']  # Add more sites as needed
 
+    # Archived model types answer from their index instead of the directory listing
+    archives = {model_type: ModelArchive.open(model_type) for model_type in model_types}
+    print("\nModel archives:")
+    for model_type, archive in archives.items():
+        if archive is None:
+            print(f"- {model_type}: no archive, using loose .h5 files")
+            continue
+        size = os.path.getsize(get_archive_paths(model_type)[1]) / (1024 * 1024)  # Convert to MB
+        print(f"- {model_type}: {len(archive)} sites, {len(archive.manifest['architectures'])} architecture(s) "
+              f"({size:.2f} MB)")
+
+    if not all(archives.values()):
+        # List all files in the model directory
+        print("\nExisting model files:")
+        model_files = os.listdir(abs_model_dir)
+        if model_files:
+            for file in model_files:
+                file_path = os.path.join(abs_model_dir, file)
+                file_size = os.path.getsize(file_path) / (1024 * 1024)  # Convert to MB
+                print(f"- {file} ({file_size:.2f} MB)")
+        else:
+            print("No model files found in the directory!")
+
+    # Check if specific models exist
+    print("\nChecking for specific models:")
     for site in test_sites:
         for model_type in model_types:
             model_name = f"{model_type}_{site}.h5"
+            archive = archives[model_type]
+            if archive is not None:
+                if site in archive:
+                    entry = archive.manifest['sites'][site]
+                    print(f"✓ Found {model_name} in archive ({entry['nbytes'] / (1024 * 1024):.2f} MB)")
+                else:
+                    print(f"✗ Missing {model_name} in archive")
+                continue
             model_path = os.path.join(abs_model_dir, model_name)
             if os.path.exists(model_path):
                 file_size = os.path.getsize(model_path) / (1024 * 1024)  # Convert to MB
@@ -51,6 +72,5 @@ def check_model_structure():
             else:
                 print(f"✗ Missing {model_name}")
 
-
 if __name__ == "__main__":
     check_model_structure()
\ No newline at end of file
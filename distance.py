@@ -1,25 +1,20 @@
-import pandas as pd
-from geopy.distance import geodesic
 from predict import load_neighbors, find_path
+from graph import get_road_graph, DISTANCE_METHOD
+from geodesy import pairwise
+from site_index import get_site_index
 
 
 # Function to load the intersection data from the CSV file
 def load_intersection_data(file_path):
-    df = pd.read_csv(file_path)
-    intersection_data = {}
-    for _, row in df.iterrows():
-        scats = str(row['Scats_number'])
-        intersection_data[scats] = (float(row['Latitude']), float(row['Longitude']))
-    return intersection_data
+    return get_site_index(file_path).coordinates()
 
 
 # Function to calculate distance between two intersections
-def calculate_intersection_distance(intersection1, intersection2, intersection_data):
+def calculate_intersection_distance(intersection1, intersection2, intersection_data, method=DISTANCE_METHOD):
     if intersection1 not in intersection_data or intersection2 not in intersection_data:
         return 0.0
-    coord1 = intersection_data[intersection1]
-    coord2 = intersection_data[intersection2]
-    return geodesic(coord1, coord2).km
+    (lat1, lon1), (lat2, lon2) = intersection_data[intersection1], intersection_data[intersection2]
+    return float(pairwise(lat1, lon1, lat2, lon2, method))
 
 
 # Function to calculate the path distance from Starting point to End point
@@ -29,13 +24,16 @@ def distance_path(path):
         print("No valid path found between the intersections.")
         return 0.0
 
-    file_path = "neighbouring_intersections.csv"
-    intersection_data = load_intersection_data(file_path)
+    graph = get_road_graph()
     distance = 0.0
 
-    # Calculate the distance for consecutive pairs of intersections in the path
+    # Sum the precomputed edge lengths; pairs that are not road segments use the straight-line distance
     for i in range(len(path) - 1):
-        distance += calculate_intersection_distance(path[i], path[i + 1], intersection_data)
+        a, b = graph.index.get(path[i]), graph.index.get(path[i + 1])
+        if a is None or b is None:
+            continue
+        length = graph.edge_length(a, b)
+        distance += length if length is not None else graph.distance(a, b)
 
     return distance
 
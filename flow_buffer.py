@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from predict import SLOT_MINUTES, set_flow_history
+
+SCATS_DATA = 'SCATS_datasets/Scats Data October 2006.csv'
+FLOW_COLUMNS = [f'V{i:02d}' for i in range(96)]  # 15-minute volumes V00 - V95
+SCATS_SLOT_MINUTES = 15
+
+
+def to_slot(date_time, slot_minutes=SLOT_MINUTES):
+    """Absolute slot number of ``date_time`` (slots since 1970-01-01)."""
+    delta = date_time - datetime(1970, 1, 1)
+    return (delta.days * 24 * 60 + delta.seconds // 60) // slot_minutes
+
+
+class FlowRingBuffer:
+    """Fixed-size recent flow history for every site, one column per time slot.
+
+    All sites share one slot clock. Each slot is written twice, at positions
+    ``p`` and ``p + capacity``, so any window of up to ``capacity`` slots is
+    one contiguous slice and can be handed out as a view without copying.
+    Slots that were never observed hold NaN.
+    """
+
+    def __init__(self, sites, capacity=96, slot_minutes=SLOT_MINUTES):
+        self.sites = list(sites)
+        self.site_index = {site: i for i, site in enumerate(self.sites)}
+        self.capacity = capacity
+        self.slot_minutes = slot_minutes
+        self.buffer = np.full((len(self.sites), 2 * capacity), np.nan, dtype=np.float32)
+        self.newest_slot = None
+        self.version = 0  # Bumped on every write, so prediction caches can tell the inputs changed
+        self.source = None  # Name of the replayed snapshot, see from_scats_csv
+        self.source_version = None
+
+    @property
+    def tag(self):
+        """Label of the held flows while they are still the replayed snapshot, else None."""
+        return self.source if self.source is not None and self.version == self.source_version else None
+
+    def _advance(self, slot):
+        """Move the clock forward to ``slot``, clearing the columns that fall out of the window."""
+        if self.newest_slot is None:
+            self.newest_slot = slot
+            return
+        n_new = slot - self.newest_slot
+        if n_new <= 0:
+            return
+        positions = (self.newest_slot + 1 + np.arange(min(n_new, self.capacity))) % self.capacity
+        self.buffer[:, positions] = np.nan
+        self.buffer[:, positions + self.capacity] = np.nan
+        self.newest_slot = slot
+
+    def push(self, site, date_time, flow):
+        """Streaming ingest of one observation; late values are accepted while still in the window."""
+        slot = to_slot(date_time, self.slot_minutes)
+        self._advance(slot)
+        if slot <= self.newest_slot - self.capacity or site not in self.site_index:
+            return
+        position = slot % self.capacity
+        i = self.site_index[site]
+        self.buffer[i, position] = flow
+        self.buffer[i, position + self.capacity] = flow
+        self.version += 1
+
+    def extend(self, start_time, flows):
+        """Bulk write of consecutive slots for all sites; ``flows`` has shape (sites, slots).
+
+        Like ``push``, slots already older than the window are dropped and the clock never moves backwards.
+        """
+        flows = np.asarray(flows, dtype=np.float32)
+        if not flows.shape[1]:
+            return
+        first = to_slot(start_time, self.slot_minutes)
+        self._advance(first + flows.shape[1] - 1)
+        # Columns before the window would wrap onto live slots through ``% capacity``
+        skip = max(0, self.newest_slot - self.capacity + 1 - first)
+        flows = flows[:, skip:]
+        if not flows.shape[1]:
+            return
+        first += skip
+        positions = (first + np.arange(flows.shape[1])) % self.capacity
+        self.buffer[:, positions] = flows
+        self.buffer[:, positions + self.capacity] = flows
+        self.version += 1
+
+    def _start_column(self, end_slot, lags):
+        """Physical column where the ``lags``-slot window ending at ``end_slot`` begins, or None."""
+        if self.newest_slot is None or end_slot > self.newest_slot or end_slot - lags < self.newest_slot - self.capacity:
+            return None
+        return end_slot % self.capacity + self.capacity - lags + 1
+
+    def window(self, site, end_time, lags):
+        """View of the ``lags`` flows of ``site`` up to and including the slot of ``end_time``."""
+        start = self._start_column(to_slot(end_time, self.slot_minutes), lags)
+        i = self.site_index.get(site)
+        if start is None or i is None:
+            return None
+        return self.buffer[i, start:start + lags]
+
+    def gather(self, sites, end_times, lags):
+        """Windows for many (site, end_time) pairs in one fancy-indexed gather.
+
+        # Returns
+            windows: ndarray (len(sites), lags), NaN rows where no history is held.
+        """
+        end_slots = np.array([to_slot(end_time, self.slot_minutes) for end_time in end_times])
+        rows = np.array([self.site_index.get(site, -1) for site in sites])
+        if self.newest_slot is None:
+            return np.full((len(rows), lags), np.nan, dtype=np.float32)
+
+        valid = (rows >= 0) & (end_slots <= self.newest_slot) & (end_slots - lags >= self.newest_slot - self.capacity)
+        starts = end_slots % self.capacity + self.capacity - lags + 1
+        columns = np.where(valid, starts, 0)[:, None] + np.arange(lags)
+        windows = self.buffer[np.where(valid, rows, 0)[:, None], columns]
+        windows[~valid] = np.nan
+        return windows
+
+    @classmethod
+    def from_scats_csv(cls, until, path=SCATS_DATA, sites=None, capacity=96):
+        """Replay the raw SCATS volume file into a buffer holding the slots before ``until``.
+
+        Sites with several detector approaches are averaged per slot, which
+        keeps flows on the per-approach scale the models were trained on.
+        """
+        df = pd.read_csv(path, header=1)
+        df['site'] = df['SCATS Number'].astype(int).astype(str)
+        df['day'] = pd.to_datetime(df['Date'], format='%d/%m/%y')
+        daily = df.groupby(['site', 'day'])[FLOW_COLUMNS].mean()
+
+        sites = sorted(daily.index.get_level_values('site').unique()) if sites is None else list(sites)
+        days = pd.date_range(daily.index.get_level_values('day').min(), daily.index.get_level_values('day').max())
+        full_index = pd.MultiIndex.from_product([sites, days], names=['site', 'day'])
+        flows = daily.reindex(full_index).values.reshape(len(sites), len(days) * len(FLOW_COLUMNS))
+
+        # Keep the slots strictly before ``until``
+        start_time = days[0].to_pydatetime()
+        n_slots = int((until - start_time).total_seconds() // (SCATS_SLOT_MINUTES * 60))
+        flows = flows[:, :max(0, min(n_slots, flows.shape[1]))]
+
+        buffer = cls(sites, capacity, slot_minutes=SCATS_SLOT_MINUTES)
+        if flows.shape[1]:
+            buffer.extend(start_time, flows)
+        buffer.source, buffer.source_version = f"replay{until:%Y%m%dT%H%M}", buffer.version
+        return buffer
+
+
+def replay_flow_history(until, path=SCATS_DATA):
+    """Feed model inputs from the SCATS flows observed before ``until``; returns the installed buffer."""
+    buffer = FlowRingBuffer.from_scats_csv(until, path)
+    set_flow_history(buffer)
+    print(f"Replaying SCATS flows for {len(buffer.sites)} sites up to {until:%Y-%m-%d %H:%M}")
+    return buffer
@@ -0,0 +1,182 @@
+import os
+import numpy as np
+from datetime import datetime, timedelta
+import predict
+from predict import BatchInferenceEngine, SLOT_MINUTES, history_tag
+from model_registry import get_model_path, MODEL_BACKEND, MODEL_MODE
+from global_model import get_global_model_path, get_global_meta_path
+from model.archive import get_archive_paths
+from scaler_store import get_scaler_path
+
+MISSING_FLOW = -1  # Stored for sites without a model
+UNFILLED_FLOW = -2  # Rows of lazily built tables that have not been predicted yet
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+FORECAST_DIR = os.path.join(base_dir, 'model', 'forecast_tables')
+
+# In-memory tables keyed by (day, model_type, slot_minutes, serving mode, flow history)
+forecast_tables = {}
+
+
+class ForecastTable:
+    """Dense (site x time slot) flow forecasts for one day and model type.
+
+    Every query inside the same slot maps to the same cell, so routing can
+    read a flow with one array index instead of running the network. Rows
+    of a lazily built table are predicted the first time a site is looked
+    up, so a route query only loads the models of the sites it expands.
+    """
+
+    def __init__(self, sites, day, model_type, slot_minutes, flows=None):
+        self.sites = list(sites)
+        self.site_index = {site: i for i, site in enumerate(self.sites)}
+        self.day = day
+        self.model_type = model_type
+        self.slot_minutes = slot_minutes
+        if flows is None:
+            flows = np.full((len(self.sites), self.slots_per_day), UNFILLED_FLOW, dtype=np.int16)
+        self.flows = flows
+        self.dirty = False
+
+    @property
+    def slots_per_day(self):
+        return 24 * 60 // self.slot_minutes
+
+    def slot_times(self):
+        start = datetime.combine(self.day, datetime.min.time())
+        return [start + timedelta(minutes=self.slot_minutes * i) for i in range(self.slots_per_day)]
+
+    def slot(self, date_time):
+        if date_time.date() != self.day:
+            return None
+        return (date_time.hour * 60 + date_time.minute) // self.slot_minutes
+
+    def lookup(self, site, date_time):
+        """Return the forecast flow for ``site`` at ``date_time``, or None if unavailable."""
+        i = self.site_index.get(site)
+        slot = self.slot(date_time)
+        if i is None or slot is None:
+            return None
+        if self.flows[i, 0] == UNFILLED_FLOW:
+            self.fill_rows([i])
+        flow = self.flows[i, slot]
+        return None if flow == MISSING_FLOW else int(flow)
+
+    def fill_rows(self, rows):
+        """Predict every slot of the given site rows with one batched predict per site model."""
+        date_times = self.slot_times()
+        engine = BatchInferenceEngine(max_cached=0)
+        predictions = engine.predict([(self.sites[i], date_time, self.model_type) for i in rows for date_time in date_times])
+
+        flows = np.array([MISSING_FLOW if prediction is None else prediction for prediction, _, _ in predictions],
+                         dtype=np.int16)
+        self.flows[rows] = flows.reshape(len(rows), len(date_times))
+        self.dirty = True
+
+    def fill_unfilled(self):
+        """Predict every row of a lazily built table that has not been looked up yet."""
+        rows = np.flatnonzero(self.flows[:, 0] == UNFILLED_FLOW).tolist()
+        if rows:
+            self.fill_rows(rows)
+
+    @classmethod
+    def build(cls, sites, day, model_type, slot_minutes=SLOT_MINUTES, lazy=False):
+        """Create the table for ``day``, filling every site now unless ``lazy`` is set."""
+        table = cls(sites, day, model_type, slot_minutes)
+        if not lazy:
+            table.fill_rows(list(range(len(table.sites))))
+        return table
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The artifacts the flows were predicted from, so is_stale can tell when one is removed
+        artifacts = [os.path.relpath(artifact, base_dir) for artifact in table_artifacts(self.sites, self.model_type)
+                     if os.path.exists(artifact)]
+        np.savez(path, flows=self.flows, sites=np.array(self.sites), day=self.day.isoformat(),
+                 model_type=self.model_type, slot_minutes=self.slot_minutes, artifacts=np.array(artifacts, dtype=str))
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            day = datetime.strptime(str(data['day']), "%Y-%m-%d").date()
+            return cls([str(site) for site in data['sites']], day, str(data['model_type']),
+                       int(data['slot_minutes']), data['flows'])
+
+
+def table_key(day, model_type, slot_minutes=SLOT_MINUTES):
+    return day, model_type, slot_minutes, MODEL_MODE, history_tag()
+
+
+def forecast_table_path(day, model_type, slot_minutes=SLOT_MINUTES):
+    """Where the table is stored; None while live flows are being pushed, as those tables are never reused."""
+    # Site and global mode, and each replayed history, predict different flows, so each keeps its own tables
+    if predict.flow_history is not None and predict.flow_history.tag is None:
+        return None
+    history = f"_{history_tag()}" if history_tag() else ''
+    return os.path.join(FORECAST_DIR,
+                        f"{model_type.lower()}_{MODEL_MODE}{history}_{day.isoformat()}_{slot_minutes}min.npz")
+
+
+def table_artifacts(sites, model_type):
+    """Model, scaler and archive files whose contents the table's flows depend on."""
+    paths = [get_archive_paths(model_type)[0]]
+    if MODEL_MODE == 'global':
+        paths += [get_global_model_path(model_type, MODEL_BACKEND), get_global_meta_path(model_type)]
+    for site in sites:
+        paths += [get_model_path(site, model_type), get_scaler_path(site, model_type)]
+    return paths
+
+
+def is_stale(path, sites, model_type):
+    """A stored table is stale once any of its site models, their scalers, the model archive or,
+    in global mode, the global model has changed, or one the table was predicted from was removed."""
+    table_mtime = os.path.getmtime(path)
+    with np.load(path) as data:
+        if 'artifacts' not in data.files:
+            return True  # Saved before tables recorded their artifacts
+        recorded = set(str(artifact) for artifact in data['artifacts'])
+    for artifact in table_artifacts(sites, model_type):
+        if os.path.exists(artifact):
+            if os.path.getmtime(artifact) > table_mtime:
+                return True
+        elif os.path.relpath(artifact, base_dir) in recorded:
+            print(f"{artifact} was removed since {os.path.basename(path)} was built")
+            return True
+    return False
+
+
+def get_forecast_table(sites, day, model_type, slot_minutes=SLOT_MINUTES, rebuild=False, lazy=False):
+    """Load the forecast table for ``day`` from memory or disk, building it if missing, stale or ``rebuild`` is set."""
+    key = table_key(day, model_type, slot_minutes)
+    table = forecast_tables.get(key)
+    if table is not None and not rebuild and set(sites) <= set(table.sites):
+        return table
+
+    # Tables predicted from another flow history are never looked up again
+    for old_key in [k for k in forecast_tables if k[-1] != key[-1]]:
+        del forecast_tables[old_key]
+
+    path = forecast_table_path(day, model_type, slot_minutes)
+    table = None
+    if not rebuild and path is not None and os.path.exists(path) and not is_stale(path, sites, model_type):
+        table = ForecastTable.load(path)
+        if not set(sites) <= set(table.sites):
+            table = None
+
+    if table is None:
+        print(f"Building {model_type} forecast table for {day.isoformat()} ({slot_minutes}-minute slots)")
+        table = ForecastTable.build(sorted(sites), day, model_type, slot_minutes, lazy)
+        if path is not None:
+            table.save(path)
+
+    forecast_tables[key] = table
+    return table
+
+
+def save_forecast_tables():
+    """Persist in-memory tables that gained rows since they were last written."""
+    for table in forecast_tables.values():
+        path = forecast_table_path(table.day, table.model_type, table.slot_minutes)
+        if table.dirty and path is not None:
+            table.save(path)
@@ -0,0 +1,88 @@
+"""
+Vectorized great-circle and ellipsoidal distances between latitude/longitude arrays
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # Mean Earth radius (IUGG)
+
+# WGS-84 ellipsoid, the same one geopy.distance.geodesic uses
+WGS84_A = 6378.137  # km
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+METHODS = ('haversine', 'vincenty')
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Haversine
+    Great-circle distance on a sphere of the mean Earth radius.
+
+    # Arguments
+        lat1, lon1, lat2, lon2: ndarray or float, degrees; broadcast together.
+    # Returns
+        distance: ndarray, km.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def vincenty(lat1, lon1, lat2, lon2, tolerance=1e-12, max_iterations=200):
+    """Vincenty
+    Ellipsoidal distance on WGS-84 (Vincenty's inverse formula), iterated for all pairs at once.
+    Pairs that do not converge (nearly antipodal points) fall back to haversine.
+
+    # Arguments
+        lat1, lon1, lat2, lon2: ndarray or float, degrees; broadcast together.
+        tolerance: float, convergence threshold on lambda in radians.
+        max_iterations: integer.
+    # Returns
+        distance: ndarray, km.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)))
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    big_l = np.radians(lon2 - lon1)
+
+    lam = big_l.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            new_lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(new_lam - lam) < tolerance
+            lam = new_lam
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = WGS84_B * big_a * (sigma - delta_sigma)
+
+    return np.where(converged & ~np.isnan(distance), distance, haversine(lat1, lon1, lat2, lon2))
+
+
+def pairwise(lat1, lon1, lat2, lon2, method='haversine'):
+    """Distance in km between matching points, with ``method`` one of METHODS."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown distance method {method!r}, expected one of {METHODS}")
+    return haversine(lat1, lon1, lat2, lon2) if method == 'haversine' else vincenty(lat1, lon1, lat2, lon2)
+
+
+def distance_matrix(latitudes, longitudes, method='haversine'):
+    """All-pairs distances in km, shape (n, n), from one broadcast pass."""
+    latitudes, longitudes = np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)
+    return pairwise(latitudes[:, None], longitudes[:, None], latitudes[None, :], longitudes[None, :], method)
@@ -0,0 +1,112 @@
+"""
+One network per model type for every SCATS site.
+
+The site is an extra one-hot input (appended to every timestep for the
+recurrent models, to the feature vector for the SAEs), so the networks
+stay plain Sequential stacks that the existing builders, the Keras loader
+and the NumPy runtime all handle. Each site's flows are scaled with its own
+MinMaxScaler, saved with the model, so predictions denormalize per site.
+"""
+import os
+import json
+import time
+import numpy as np
+from scaler_store import set_scaler_params
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+GLOBAL_MODELS_DIR = os.path.join(base_dir, 'model', 'global_models')
+
+
+def get_global_model_path(model_type, backend='keras'):
+    extension = 'npz' if backend == 'numpy' else 'h5'
+    return os.path.join(GLOBAL_MODELS_DIR, f'{model_type.lower()}_global.{extension}')
+
+
+def get_global_meta_path(model_type):
+    return os.path.join(GLOBAL_MODELS_DIR, f'{model_type.lower()}_global.json')
+
+
+def add_site_inputs(inputs, site_ids, n_sites):
+    """Append the one-hot site input to per-site model inputs.
+
+    ``inputs`` is (samples, lags, 1) for the recurrent models, which get the
+    one-hot vector at every timestep, or (samples, features) for the SAEs.
+    """
+    inputs = np.asarray(inputs, dtype=np.float32)
+    one_hot = np.zeros((len(inputs), n_sites), dtype=np.float32)
+    one_hot[np.arange(len(inputs)), np.asarray(site_ids)] = 1.0
+    if inputs.ndim == 3:
+        one_hot = np.repeat(one_hot[:, None, :], inputs.shape[1], axis=1)
+    return np.concatenate((inputs, one_hot), axis=-1)
+
+
+def save_global_meta(model_type, sites, scalers, lags, extra=None):
+    """Record the site order of the one-hot input and each site's scaler range."""
+    meta = {
+        'model': model_type.lower(),
+        'sites': list(sites),
+        'lags': lags,
+        'scalers': {site: [float(scaler.data_min_[0]), float(scaler.data_max_[0])] for site, scaler in scalers.items()},
+        'trained': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    meta.update(extra or {})
+    with open(get_global_meta_path(model_type), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+class GlobalModel:
+    """A multi-site network plus the site order and scalers it was trained with."""
+
+    def __init__(self, model, meta):
+        self.model = model
+        self.meta = meta
+        self.sites = list(meta['sites'])
+        self.site_index = {site: i for i, site in enumerate(self.sites)}
+        shape = tuple(model.input_shape)
+        # Input layout of the equivalent per-site model, without the one-hot columns
+        self.input_shape = shape[:-1] + (shape[-1] - len(self.sites),)
+        self.nbytes = model.nbytes
+
+    @classmethod
+    def load(cls, model_type, backend='keras'):
+        """Load the global network of ``model_type`` and register its per-site scaler ranges; None if missing."""
+        model_path, meta_path = get_global_model_path(model_type, backend), get_global_meta_path(model_type)
+        if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+            print(f"No global {model_type} model found")
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if backend == 'numpy':
+            from model.numpy_runtime import NumpyModel
+            model = NumpyModel.load(model_path)
+        else:
+            from model_registry import SessionModel
+            model = SessionModel(model_path)
+        for site, (data_min, data_max) in meta['scalers'].items():
+            set_scaler_params(site, model_type, data_min, data_max)
+        print(f"Loaded global {model_type} model for {len(meta['sites'])} sites")
+        return cls(model, meta)
+
+    def predict_sites(self, x, site_ids, batch_size=None):
+        """Predict rows of per-site inputs ``x``, row i for site index ``site_ids[i]``, in one forward pass."""
+        return self.model.predict(add_site_inputs(x, site_ids, len(self.sites)), batch_size=batch_size or len(x))
+
+    def close(self):
+        self.model.close()
+
+
+class SiteModel:
+    """One site's view of a GlobalModel, with the ``input_shape``/``predict`` interface of a per-site model."""
+
+    def __init__(self, shared, site):
+        self.shared = shared
+        self.site = site
+        self.site_id = shared.site_index[site]
+        self.input_shape = shared.input_shape
+        self.nbytes = 0  # The weights belong to the shared model
+
+    def predict(self, x, batch_size=32):
+        return self.shared.predict_sites(x, np.full(len(x), self.site_id), batch_size)
+
+    def close(self):
+        pass
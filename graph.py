@@ -0,0 +1,183 @@
+import os
+import numpy as np
+import pandas as pd
+from geodesy import pairwise, distance_matrix
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+TRAFFIC_NETWORK = os.path.join(base_dir, 'neighbouring_intersections.csv')
+GRAPH_PATH = os.path.join(base_dir, 'data', 'road_graph.npz')
+
+# 'haversine' (spherical) or 'vincenty' (WGS-84 ellipsoid, geodesic-accurate)
+DISTANCE_METHOD = os.environ.get('TFPS_DISTANCE_METHOD', 'haversine').lower()
+# The all-pairs site distance matrix is stored with graphs up to this size (n^2 float64)
+MAX_MATRIX_NODES = 4096
+
+# Loaded graphs per source CSV, shared by the router, the GUI and the distance code
+road_graphs = {}
+
+
+class RoadGraph:
+    """The SCATS road network with dense integer node ids and CSR adjacency.
+
+    Node ``i`` is SCATS site ``ids[i]``; ids are sorted so indices are stable
+    between builds. The out-neighbours of ``i`` are
+    ``indices[indptr[i]:indptr[i + 1]]`` (in the order listed in the source CSV)
+    and ``lengths`` holds the matching edge lengths in km. Sites that only
+    appear as neighbours have NaN coordinates. ``site_distances`` is the
+    all-pairs straight-line distance matrix, or None for very large networks.
+    """
+
+    def __init__(self, ids, indptr, indices, lengths, latitudes, longitudes, descriptions,
+                 site_distances=None, distance_method=DISTANCE_METHOD):
+        self.ids = np.asarray(ids)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.descriptions = np.asarray(descriptions)
+        self.site_distances = site_distances
+        self.distance_method = distance_method
+        self.index = {site: i for i, site in enumerate(self.ids.tolist())}
+
+    @property
+    def num_nodes(self):
+        return len(self.ids)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def neighbors(self, node):
+        """Out-neighbour node ids of ``node`` (a view into the CSR arrays)."""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def edge_lengths(self, node):
+        """Lengths in km of the out-edges of ``node``, aligned with ``neighbors(node)``."""
+        return self.lengths[self.indptr[node]:self.indptr[node + 1]]
+
+    def edge_length(self, node, neighbor):
+        """Length of the edge ``node -> neighbor``, or None if there is no such edge."""
+        matches = np.flatnonzero(self.neighbors(node) == neighbor)
+        return float(self.edge_lengths(node)[matches[0]]) if len(matches) else None
+
+    def distance(self, node1, node2):
+        """Straight-line km between two nodes; 0 when either has no coordinates."""
+        if self.site_distances is not None:
+            return float(self.site_distances[node1, node2])
+        return float(np.nan_to_num(pairwise(self.latitudes[node1], self.longitudes[node1],
+                                            self.latitudes[node2], self.longitudes[node2], self.distance_method)))
+
+    def distances_to(self, node):
+        """Straight-line km from every node to ``node``; 0 where coordinates are missing."""
+        if self.site_distances is not None:
+            return self.site_distances[:, node]
+        return np.nan_to_num(pairwise(self.latitudes, self.longitudes,
+                                      self.latitudes[node], self.longitudes[node], self.distance_method))
+
+    def has_coordinates(self, node):
+        return not (np.isnan(self.latitudes[node]) or np.isnan(self.longitudes[node]))
+
+    def adjacency_lists(self):
+        """Out-neighbours of every node as lists of ints, for tight pure-Python search loops."""
+        return [row.tolist() for row in np.split(self.indices, self.indptr[1:-1])]
+
+    def reverse(self):
+        """The graph with every edge flipped (CSC form of the adjacency)."""
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=self.num_nodes))))
+        site_distances = None if self.site_distances is None else self.site_distances.T
+        return RoadGraph(self.ids, indptr, sources[order], self.lengths[order], self.latitudes, self.longitudes,
+                         self.descriptions, site_distances, self.distance_method)
+
+    def to_neighbors(self):
+        """The ``{site: [neighbour sites]}`` dict that ``load_neighbors`` used to build."""
+        ids = self.ids.tolist()
+        return {ids[i]: [ids[n] for n in self.neighbors(i)]
+                for i in range(self.num_nodes) if self.indptr[i + 1] > self.indptr[i]}
+
+    def to_intersection_data(self):
+        """The ``{site: (latitude, longitude)}`` dict of sites with known coordinates."""
+        return {site: (float(self.latitudes[i]), float(self.longitudes[i]))
+                for i, site in enumerate(self.ids.tolist()) if self.has_coordinates(i)}
+
+    @classmethod
+    def from_csv(cls, path=TRAFFIC_NETWORK, method=DISTANCE_METHOD):
+        """Build the graph from the intersections CSV, computing every edge length once."""
+        df = pd.read_csv(path, dtype={'Scats_number': str, 'Neighbours': str})
+        sources = df['Scats_number'].str.strip().values
+        neighbour_lists = df['Neighbours'].fillna('').str.split(';').values
+        neighbour_lists = [[n.strip() for n in row if n.strip()] for row in neighbour_lists]
+
+        ids = np.array(sorted(set(sources) | set(n for row in neighbour_lists for n in row)))
+        index = {site: i for i, site in enumerate(ids.tolist())}
+
+        latitudes = np.full(len(ids), np.nan)
+        longitudes = np.full(len(ids), np.nan)
+        descriptions = np.full(len(ids), '', dtype=object)
+        rows = np.array([index[site] for site in sources], dtype=np.int64)
+        latitudes[rows] = df['Latitude'].astype(float).values
+        longitudes[rows] = df['Longitude'].astype(float).values
+        descriptions[rows] = df['Site description'].fillna('').values
+
+        row_neighbours = [[] for _ in ids]
+        for site, row in zip(sources, neighbour_lists):
+            row_neighbours[index[site]].extend(index[n] for n in row)
+        indptr = np.concatenate(([0], np.cumsum([len(row) for row in row_neighbours]))).astype(np.int64)
+        indices = np.array([n for row in row_neighbours for n in row], dtype=np.int32)
+
+        site_distances = None
+        if len(ids) <= MAX_MATRIX_NODES:
+            site_distances = np.nan_to_num(distance_matrix(latitudes, longitudes, method))
+        graph = cls(ids, indptr, indices, np.zeros(len(indices)), latitudes, longitudes,
+                    descriptions.astype(str), site_distances, method)
+        graph.lengths = graph.compute_edge_lengths()
+        return graph
+
+    def compute_edge_lengths(self):
+        """Straight-line length of every edge in one vectorized pass; 0 where an endpoint has no coordinates."""
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        if self.site_distances is not None:
+            return self.site_distances[sources, self.indices]
+        return np.nan_to_num(pairwise(self.latitudes[sources], self.longitudes[sources],
+                                      self.latitudes[self.indices], self.longitudes[self.indices],
+                                      self.distance_method))
+
+    def save(self, path=GRAPH_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = dict(ids=self.ids.astype(str), indptr=self.indptr, indices=self.indices, lengths=self.lengths,
+                      latitudes=self.latitudes, longitudes=self.longitudes, descriptions=self.descriptions.astype(str),
+                      distance_method=np.array(self.distance_method))
+        if self.site_distances is not None:
+            arrays['site_distances'] = self.site_distances
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        with np.load(path) as data:
+            site_distances = data['site_distances'] if 'site_distances' in data.files else None
+            method = str(data['distance_method']) if 'distance_method' in data.files else 'geodesic'
+            return cls(data['ids'], data['indptr'], data['indices'], data['lengths'],
+                       data['latitudes'], data['longitudes'], data['descriptions'], site_distances, method)
+
+
+def get_road_graph(csv_path=TRAFFIC_NETWORK, graph_path=GRAPH_PATH, rebuild=False, method=DISTANCE_METHOD):
+    """The shared RoadGraph for ``csv_path``, loaded from its binary file when that is up to date."""
+    key = (os.path.abspath(csv_path), method)
+    if key in road_graphs and not rebuild:
+        return road_graphs[key]
+
+    # The binary file caches the default network; other CSVs are built directly
+    cached = graph_path if key[0] == TRAFFIC_NETWORK else None
+    graph = None
+    if cached and not rebuild and os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(key[0]):
+        graph = RoadGraph.load(cached)
+        if graph.distance_method != method:
+            graph = None
+    if graph is None:
+        graph = RoadGraph.from_csv(key[0], method)
+        if cached:
+            graph.save(cached)
+    road_graphs[key] = graph
+    return graph
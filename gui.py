@@ -3,18 +3,84 @@ from tkinter import ttk
 from tkinter.scrolledtext import ScrolledText
 from datetime import datetime
 from tkinter import messagebox
-from pathfinder import pathfinder
-from predict import load_neighbors
+from pathfinder import pathfinder, route_stats, RouteCancelled
+from predict import load_neighbors, model_registry
+from site_index import get_site_index
+from map_renderer import MapRenderer, MAP_OFFSET
 from PIL import Image, ImageTk, ImageEnhance
 import os
-import webbrowser
-import folium
-import csv
-import json
+import time
+import queue
+import threading
 
 # Loading neighbors 
 neighbors = load_neighbors()
-TRAFFIC_NETWORK = 'neighbouring_intersections.csv'
+site_index = get_site_index()
+
+ROUTE_POLL_MS = 100  # How often the Tk loop checks for route results
+PROGRESS_INTERVAL = 0.25  # Seconds between progress reports from a running search
+
+
+class RouteWorker(threading.Thread):
+    """Runs route searches off the Tk thread, one at a time.
+
+    Every submitted request gets a new generation number; submitting or
+    cancelling bumps it, and a running search stops at its next progress
+    check once it is no longer the current generation. Progress, results
+    and errors are posted to ``results`` as ``(kind, generation, payload)``.
+    """
+
+    def __init__(self, results):
+        super().__init__(daemon=True)
+        self.requests = queue.Queue()
+        self.results = results
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def submit(self, src, dest, date_time, model):
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        self.requests.put((generation, (src, dest, date_time, model)))
+        return generation
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def run(self):
+        while True:
+            generation, args = self.requests.get()
+            if self.is_current(generation):
+                self.search(generation, args)
+
+    def search(self, generation, args):
+        started = time.perf_counter()
+        loads_before = model_registry.loads
+        last_report = started
+
+        def progress():
+            nonlocal last_report
+            if not self.is_current(generation):
+                raise RouteCancelled()
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                self.results.put(('progress', generation,
+                                  (now - started, model_registry.loads - loads_before, route_stats['expanded'])))
+
+        try:
+            paths = pathfinder(*args, progress=progress)
+        except RouteCancelled:
+            return
+        except Exception as e:
+            print("Exception in route search:", e)
+            self.results.put(('error', generation, e))
+            return
+        self.results.put(('done', generation, (paths, time.perf_counter() - started)))
 
 
 class TrafficFlowGUI(tk.Tk):
@@ -108,7 +174,11 @@ class TrafficFlowGUI(tk.Tk):
 
         # "View Route" Button placed below the text box
         self.view_route_button = tk.Button(self, text="View Route", command=self.view_route, font=("Helvetica", 10), bg="#4CAF50", fg="white", bd=0)
-        self.canvas.create_window(350, 430, window=self.view_route_button)
+        self.canvas.create_window(305, 430, window=self.view_route_button)
+
+        # "View Map" Button reopens the map tab, e.g. after it was closed
+        self.view_map_button = tk.Button(self, text="View Map", command=lambda: self.view_route(reopen=True), font=("Helvetica", 10), bg="#4CAF50", fg="white", bd=0)
+        self.canvas.create_window(395, 430, window=self.view_map_button)
 
         # Creating frame for the status bar and placing it at the bottom of the main_frame
         self.status_frame = tk.Frame(self.main_frame)
@@ -121,6 +191,17 @@ class TrafficFlowGUI(tk.Tk):
         # Store generated paths
         self.generated_paths = []
 
+        # Map page is written once; each View Route only rewrites its routes sidecar
+        self.map_renderer = MapRenderer(site_index)
+
+        # Route searches run on a background worker; results come back through a polled queue
+        self.route_results = queue.Queue()
+        self.route_worker = RouteWorker(self.route_results)
+        self.route_worker.start()
+        self.route_request = None  # (generation, src, dest, model, date_time) of the search in flight
+        self.bind("<Escape>", self.cancel_route)
+        self.after(ROUTE_POLL_MS, self.poll_route_results)
+
     def clear_placeholder(self, event):
         if self.datetime_entry.get() == "YYYY-MM-DD HH:MM":
             self.datetime_entry.delete(0, tk.END)
@@ -151,6 +232,8 @@ class TrafficFlowGUI(tk.Tk):
             messagebox.showerror("Input Error", "Please fill in the Origin and Destination Nodes.")
             self.status_bar.config(text="Error: Missing input fields.")
             return
+        # Either node may be given as "latitude, longitude" (e.g. copied from a map click)
+        src, dest = self.resolve_site(src), self.resolve_site(dest)
         # Validate SCATS coordinates
         src_coords = self.getCoords(src)
         dest_coords = self.getCoords(dest)
@@ -164,24 +247,53 @@ class TrafficFlowGUI(tk.Tk):
             self.status_bar.config(text="Error: Invalid date/time format.")
             return
 
-        try:
-            self.generated_paths = pathfinder(src, dest, date_time, model)
-            if not self.generated_paths:
-                result = "No routes found."
-            else:
-                result = f"Routes from {src} to {dest} using {model} model on {date_time.strftime('%Y-%m-%d %H:%M')}:\n\n"
-                for i, (estimated_time, total_distance, path, avg_traffic) in enumerate(self.generated_paths, 1):
-                    result += f"Route {i}\n"
-                    result += f"   Estimated time: {estimated_time:.2f} minutes\n"
-                    result += f"   Total distance: {total_distance:.2f} km\n"
-                    result += f"   Avg traffic: {avg_traffic:.2f} vehicles/5min\n"
-                    result += f"   Path: {' -> '.join(path)}\n\n"
-            self.status_bar.config(text="Route generation complete.")
-        except Exception as e:
-            result = f"Error generating route: {str(e)}"
-            self.status_bar.config(text="Error generating route.")
-            print("Exception in generate_route:", e)
+        superseded = self.route_request is not None
+        generation = self.route_worker.submit(src, dest, date_time, model)
+        self.route_request = (generation, src, dest, model, date_time)
+        self.status_bar.config(text="Generating route (previous request cancelled)..." if superseded
+                               else "Generating route... (Esc to cancel)")
 
+    def cancel_route(self, event=None):
+        if self.route_request is not None:
+            self.route_worker.cancel()
+            self.route_request = None
+            self.status_bar.config(text="Route generation cancelled.")
+
+    def poll_route_results(self):
+        try:
+            while True:
+                kind, generation, payload = self.route_results.get_nowait()
+                if self.route_request is None or generation != self.route_request[0]:
+                    continue  # A superseded or cancelled request
+                if kind == 'progress':
+                    elapsed, models_loaded, expanded = payload
+                    self.status_bar.config(text=f"Generating route... {elapsed:.1f}s, {models_loaded} models loaded, "
+                                                f"{expanded} nodes expanded (Esc to cancel)")
+                elif kind == 'done':
+                    self.show_routes(*payload)
+                else:
+                    self.route_request = None
+                    self.status_bar.config(text="Error generating route.")
+                    self.display_result(f"Error generating route: {str(payload)}")
+        except queue.Empty:
+            pass
+        self.after(ROUTE_POLL_MS, self.poll_route_results)
+
+    def show_routes(self, paths, elapsed):
+        _, src, dest, model, date_time = self.route_request
+        self.route_request = None
+        self.generated_paths = paths
+        if not self.generated_paths:
+            result = "No routes found."
+        else:
+            result = f"Routes from {src} to {dest} using {model} model on {date_time.strftime('%Y-%m-%d %H:%M')}:\n\n"
+            for i, (estimated_time, total_distance, path, avg_traffic) in enumerate(self.generated_paths, 1):
+                result += f"Route {i}\n"
+                result += f"   Estimated time: {estimated_time:.2f} minutes\n"
+                result += f"   Total distance: {total_distance:.2f} km\n"
+                result += f"   Avg traffic: {avg_traffic:.2f} vehicles/5min\n"
+                result += f"   Path: {' -> '.join(path)}\n\n"
+        self.status_bar.config(text=f"Route generation complete in {elapsed:.1f}s.")
         self.display_result(result)
 
     def display_result(self, text):
@@ -192,165 +304,60 @@ class TrafficFlowGUI(tk.Tk):
 
 #  Map functionalities for the View Route option 
 
-    def view_route(self):
+    def view_route(self, reopen=False):
+        # reopen is set by "View Map", which opens the map tab again even if it was opened before
         if not self.generated_paths:
             # If no routes are generated, show SCATS locations
             self.status_bar.config(text="No route available, showing SCATS locations...")
-            self.render_map_with_scat_sites() # the view route button leads to the map with the marked 40 scats of Boroondara region
+            self.render_map_with_scat_sites(reopen) # the view route button leads to the map with the marked 40 scats of Boroondara region
         else:
             self.status_bar.config(text="Displaying generated route...")
-            self.render_map_with_routes(self.generated_paths)
+            self.render_map_with_routes(self.generated_paths, reopen)
+
+    def resolve_site(self, text):
+        """Return the SCATS number for an entry, mapping a "latitude, longitude" pair to the nearest site."""
+        parts = text.split(',')
+        if len(parts) != 2:
+            return text
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+        except ValueError:
+            return text
+        nearest = site_index.nearest(lat, lon)
+        if nearest is None:
+            return text
+        site, distance_km = nearest
+        print(f"Nearest SCATS to ({lat}, {lon}) is {site}, {distance_km:.2f} km away")
+        return site
 
     def getCoords(self, scat):
         """    Fetch the coordinates and description of the SCATS location.    """
         scat = str(scat).strip()
-        with open(TRAFFIC_NETWORK, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['Scats_number'].strip() == scat:
-                    try:
-                        # Get latitude, longitude, and description
-                        lat = float(row['Latitude']) + 0.00123
-                        lon = float(row['Longitude']) + 0.00123
-                        description = row.get('Site description', 'No description available')
-                        print(f"Coordinates for SCATS {scat}: ({lon}, {lat}) with description: {description}")
-                        return lon, lat, description  # Return longitude, latitude, and description
-                    except ValueError:
-                        # Handle case where latitude or longitude are not valid floats
-                        print(f"Invalid latitude or longitude for SCATS {scat}")
-                        return None
-
-        print(f"Unable to find SCATS location for {scat}")
-        return None
-
-    def generate_geojson(self, routes):
-        """    Generating GeoJSON data for routes.    """
-        print("Generating GeoJSON for routes:", routes)
-        data = {
-            "type": "FeatureCollection",
-            "features": []
-        }
-
-        for index, route in reversed(list(enumerate(routes))):
-            weight = 5
-            color = "#3484F0" if index == 0 else "#757575"  #
-            coords = []
-
-            # Route is a tuple with format (estimated_time, total_distance, path, avg_traffic)
-            path = route[2]  # Extracting the path list
-
-            for scat in path:
-                # Add coordinates only if the SCATS number is valid
-                if isinstance(scat, str) and scat.isdigit():
-                    coord_data = self.getCoords(scat)
-                    if coord_data:
-                        lon, lat, _ = coord_data  
-                        if lon != 0 and lat != 0:  # Check if coordinates are valid
-                            coords.append([lon, lat])
-                    else:
-                        print(f"Skipping invalid SCATS: {scat}")
-
-            if coords:  # Add feature only if coordinates are found
-                feature = {
-                    "type": "Feature",
-                    "properties": {
-                        "stroke": color,
-                        "stroke-width": weight
-                    },
-                    "geometry": {
-                        "type": "LineString",
-                        "coordinates": coords
-                    }
-                }
-                data["features"].append(feature)
-
-        return json.dumps(data)
-
-    def draw_markers(self, map_obj, src, dest):
-        """    Drawing markers for the source and destination.    """
-        src_coords = self.getCoords(src)
-        dest_coords = self.getCoords(dest)
-        if src_coords and isinstance(src, str) and src.isdigit():
-            src_lon, src_lat, src_description = src_coords
-            folium.Marker([src_lat, src_lon], popup=f"<strong>Start</strong>  <br><strong>SCATS:</strong> {src}<br><strong>SITE:</strong> {src_description}",
-                          icon=folium.Icon(color='red', icon='circle', prefix='fa')).add_to(map_obj)
-        else:
-            print(f"Unable to plot marker for the start SCATS: {src}")
-
-        if dest_coords and isinstance(dest, str) and dest.isdigit():
-            dest_lon, dest_lat, dest_description = dest_coords
-            folium.Marker([dest_lat, dest_lon], popup=f"<strong>Finish</strong> <br><strong>SCATS:</strong> {dest}<br><strong>SITE:</strong> {src_description}",
-                          icon=folium.Icon(color='green', icon='flag', prefix='fa')).add_to(map_obj)
-        else:
-            print(f"Unable to plot marker for the finish SCATS: {dest}")
+        record = site_index.get(scat)
+        if record is None:
+            print(f"Unable to find SCATS location for {scat}")
+            return None
 
+        # Get latitude, longitude, and description
+        lat, lon, description = record
+        lat, lon = lat + MAP_OFFSET, lon + MAP_OFFSET
+        description = description or 'No description available'
+        print(f"Coordinates for SCATS {scat}: ({lon}, {lat}) with description: {description}")
+        return lon, lat, description  # Return longitude, latitude, and description
 
-    def render_map_with_routes(self, routes):
+    def render_map_with_routes(self, routes, reopen=False):
         """Render the map with the generated routes."""
-        # Extracting the path from the first route 
-        src = routes[0][2][0]  # First SCATS in the path
-        dest = routes[0][2][-1]  # Last SCATS in the path
-
-        geojson_data = self.generate_geojson(routes)
-
-        # Creating the map centered around a specific location
-        map_obj = folium.Map(location=[-37.831219, 145.056965], zoom_start=13, tiles="cartodbpositron")
-
-        # Plotting the routes
-        folium.GeoJson(geojson_data, style_function=lambda x: {
-            'color': x['properties']['stroke'],
-            'weight': x['properties']['stroke-width']
-        }).add_to(map_obj)
-
-        # Adding markers and nodes
-        self.draw_markers(map_obj, src, dest)
-        self.draw_nodes(map_obj)
-
-        # Saving map to an HTML file and open it in a web browser
-        map_obj.save("index.html")
-        webbrowser.open("index.html")
+        # Only the routes sidecar is rewritten; an already open map picks it up on its next poll
+        self.map_renderer.render_routes(routes)
+        self.map_renderer.show(reopen)
 
 
 # Scenario where in user inputs a starting and destination path for which no paths were generate or the user didn't pessed the Generate route button but the user choose to click the View Route button then the user is lead to a map with a marked 40 nodes 
 
-    def draw_nodes(self, map_obj):
-        """    Drawing all SCATS nodes on the map with SCATS number and site description tooltips.    """
-        with open(TRAFFIC_NETWORK, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                try:
-                    lon, lat = float(row['Longitude']) + 0.00123, float(row['Latitude']) + 0.00123
-                    scat_number = row['Scats_number']
-                    site_description = row.get('Site description', 'No description available')                    
-                    folium.Circle(
-                        radius=5,
-                        location=[lat, lon],                        
-                        tooltip=f"SCATS: {scat_number}, SITE: {site_description}",
-                        color="#5A5A5A",
-                        fill=True,
-                        fill_opacity=0.7
-                    ).add_to(map_obj)
-                except ValueError:
-                    print(f"Invalid latitude or longitude for SCATS {row['Scats_number']}")
-    
-
-    def render_map_with_scat_sites(self):
+    def render_map_with_scat_sites(self, reopen=False):
         """Rendering the map with only the SCATS locations."""
-        # Creating the map centered around a specific location
-        map_obj = folium.Map(location=[-37.831219, 145.056965], zoom_start=13, tiles="cartodbpositron")
-
-        self.draw_nodes(map_obj)
-
-        # Adding a message about no route found
-        folium.Marker(
-            location=[-37.831219, 145.056965],
-            popup="<strong>No route found</strong>",
-            icon=folium.Icon(color='red')
-        ).add_to(map_obj)
-
-        # Saved to an HTML file and open it in a web browser
-        map_obj.save("index.html")
-        webbrowser.open("index.html")
+        self.map_renderer.render_sites()
+        self.map_renderer.show(reopen)
 
 # Run the application
 if __name__ == "__main__":
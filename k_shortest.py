@@ -0,0 +1,166 @@
+import heapq
+from itertools import count
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+INF = float('inf')
+
+# A route is its node ids and the elapsed time (minutes) at which each node is reached
+Route = Tuple[List[int], List[float]]
+
+
+def lower_bound_tree(target: int, reverse_neighbor_index: Sequence[Sequence[int]],
+                     free_flow_time: Callable[[int, int], float]) -> List[float]:
+    # Backward Dijkstra from target on free-flow edge times. Congestion only slows edges down,
+    # so these are admissible A* bounds for every departure time; unreachable nodes get INF.
+    bounds = [INF] * len(reverse_neighbor_index)
+    bounds[target] = 0.0
+    heap = [(0.0, target)]
+    while heap:
+        bound, node = heapq.heappop(heap)
+        if bound > bounds[node]:
+            continue
+        for previous in reverse_neighbor_index[node]:
+            new_bound = bound + free_flow_time(previous, node)
+            if new_bound < bounds[previous]:
+                bounds[previous] = new_bound
+                heapq.heappush(heap, (new_bound, previous))
+    return bounds
+
+
+def shortest_path_tree(source: int, depart: float, neighbor_index: Sequence[Sequence[int]],
+                       edge_time: Callable[[int, int, float], float],
+                       stats: Optional[Dict[str, int]] = None) -> Tuple[List[float], List[int]]:
+    # Time-dependent Dijkstra from source to every node, leaving at elapsed time depart.
+    # Returns the arrival time and tree parent of each node (INF and -1 where unreachable).
+    arrival = [INF] * len(neighbor_index)
+    parent = [-1] * len(neighbor_index)
+    closed = [False] * len(neighbor_index)
+    arrival[source] = depart
+    heap = [(depart, source)]
+
+    while heap:
+        elapsed, node = heapq.heappop(heap)
+        if closed[node]:
+            continue
+        closed[node] = True
+        if stats is not None:
+            stats['expanded'] += 1
+
+        for neighbor in neighbor_index[node]:
+            if closed[neighbor]:
+                continue
+            new_elapsed = elapsed + edge_time(node, neighbor, elapsed)
+            if new_elapsed < arrival[neighbor]:
+                arrival[neighbor] = new_elapsed
+                parent[neighbor] = node
+                heapq.heappush(heap, (new_elapsed, neighbor))
+    return arrival, parent
+
+
+def shortest_route(source: int, target: int, depart: float, neighbor_index: Sequence[Sequence[int]],
+                   edge_time: Callable[[int, int, float], float], bounds: Sequence[float],
+                   blocked_nodes=frozenset(), blocked_edges=frozenset(),
+                   stats: Optional[Dict[str, int]] = None) -> Optional[Route]:
+    # Time-dependent A* leaving source at elapsed time depart; exact when edge times are FIFO.
+    arrival = [INF] * len(neighbor_index)
+    parent = [-1] * len(neighbor_index)
+    closed = [False] * len(neighbor_index)
+    arrival[source] = depart
+    heap = [(depart + bounds[source], depart, source)]
+
+    while heap:
+        _, elapsed, node = heapq.heappop(heap)
+        if closed[node]:
+            continue
+        closed[node] = True
+        if stats is not None:
+            stats['expanded'] += 1
+
+        if node == target:
+            nodes = []
+            while node != -1:
+                nodes.append(node)
+                node = parent[node]
+            nodes.reverse()
+            return nodes, [arrival[n] for n in nodes]
+
+        for neighbor in neighbor_index[node]:
+            if closed[neighbor] or neighbor in blocked_nodes or (node, neighbor) in blocked_edges:
+                continue
+            if bounds[neighbor] == INF:
+                continue
+            new_elapsed = elapsed + edge_time(node, neighbor, elapsed)
+            if new_elapsed < arrival[neighbor]:
+                arrival[neighbor] = new_elapsed
+                parent[neighbor] = node
+                heapq.heappush(heap, (new_elapsed + bounds[neighbor], new_elapsed, neighbor))
+    return None
+
+
+def route_avoids(route: Optional[Route], blocked_nodes, blocked_edges) -> bool:
+    if route is None:
+        return True
+    nodes = route[0]
+    return (not any(node in blocked_nodes for node in nodes)
+            and not any(edge in blocked_edges for edge in zip(nodes, nodes[1:])))
+
+
+def k_shortest_routes(source: int, target: int, k: int, neighbor_index: Sequence[Sequence[int]],
+                      edge_time: Callable[[int, int, float], float], bounds: Sequence[float],
+                      stats: Optional[Dict[str, int]] = None) -> List[Route]:
+    # Yen's algorithm: the k fastest loopless routes, in order of arrival time.
+    #
+    # Every spur search reuses the same lower-bound tree as its heuristic. Spur results are also
+    # kept per (spur node, departure time): a route that was fastest under some set of removed
+    # nodes/edges is still fastest once more are removed, as long as it avoids them, so it is
+    # reused instead of searching again.
+    if stats is not None:
+        stats.update(expanded=0, spur_searches=0, reused=0)
+    if source == target or bounds[source] == INF:
+        return []
+
+    first = shortest_route(source, target, 0.0, neighbor_index, edge_time, bounds, stats=stats)
+    if first is None:
+        return []
+    routes = [first]
+    candidates = []
+    seen = {tuple(first[0])}
+    tie_break = count()
+    spur_cache = {}  # (spur node, depart) -> [(blocked_nodes, blocked_edges, route)]
+
+    while len(routes) < k:
+        last_nodes, last_times = routes[-1]
+        for i in range(len(last_nodes) - 1):
+            spur, root = last_nodes[i], last_nodes[:i + 1]
+            blocked_nodes = frozenset(root[:-1])
+            blocked_edges = frozenset((spur, nodes[i + 1]) for nodes, _ in routes
+                                      if len(nodes) > i + 1 and nodes[:i + 1] == root)
+
+            spur_route = None
+            searched = True
+            entries = spur_cache.setdefault((spur, last_times[i]), [])
+            for cached_nodes, cached_edges, cached_route in entries:
+                if cached_nodes <= blocked_nodes and cached_edges <= blocked_edges \
+                        and route_avoids(cached_route, blocked_nodes, blocked_edges):
+                    spur_route, searched = cached_route, False
+                    break
+            if searched:
+                spur_route = shortest_route(spur, target, last_times[i], neighbor_index, edge_time, bounds,
+                                            blocked_nodes, blocked_edges, stats)
+                entries.append((blocked_nodes, blocked_edges, spur_route))
+            if stats is not None:
+                stats['spur_searches' if searched else 'reused'] += 1
+
+            if spur_route is None:
+                continue
+            nodes = root[:-1] + spur_route[0]
+            if tuple(nodes) in seen:
+                continue
+            seen.add(tuple(nodes))
+            times = last_times[:i] + spur_route[1]
+            heapq.heappush(candidates, (times[-1], next(tie_break), (nodes, times)))
+
+        if not candidates:
+            break
+        routes.append(heapq.heappop(candidates)[2])
+    return routes
@@ -1,18 +1,62 @@
 """
 Traffic Flow Prediction with Neural Networks(SAEs、LSTM、GRU).
+
+Scores every model type on every SCATS site split and prints one results
+table. Run from the repository root:
+    python main.py --jobs 4 --output model/evaluation.csv
 """
-import math
+import os
+import sys
+import time
+import argparse
 import warnings
+import multiprocessing
 import numpy as np
 import pandas as pd
-from data.data import process_data
-from keras.models import load_model
-from keras.utils import plot_model
-import sklearn.metrics as metrics
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+from data.data import process_data, model_inputs
+from data.store import get_scats_sites, get_split_files
+from data.window_cache import cached_process_data
+from model_registry import ModelRegistry, get_model_path, MODEL_BACKEND, MODEL_MODE
 warnings.filterwarnings("ignore")
 
+MODEL_TYPES = ['lstm', 'gru', 'saes', 'saes_fixed', 'rnn']
+METRICS = ['mape', 'mae', 'mse', 'rmse', 'r2', 'explained_variance']
+PLOT_SLOTS = 96  # One day of 15-minute slots
+
+# Global-mode registries live as long as the worker, so the shared network is loaded once, not once per site
+global_registries = {}
+
+
+def regression_metrics(y_true, y_preds):
+    """Regression metrics
+    Score several predictions of the same series in one vectorized pass.
+
+    # Arguments
+        y_true: List/ndarray, true data, shape (samples,).
+        y_preds: List/ndarray, predicted data, shape (samples,) or (models, samples).
+    # Returns
+        metrics: Dict, metric name -> ndarray with one value per model.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_preds = np.atleast_2d(np.asarray(y_preds, dtype=np.float64))
+    errors = y_preds - y_true
+
+    # MAPE skips zero flows, where the percentage error is undefined
+    positive = y_true > 0
+    mse = np.mean(errors ** 2, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mape = 100 * np.mean(np.abs(errors[:, positive]) / y_true[positive], axis=1)
+        r2 = 1 - np.sum(errors ** 2, axis=1) / np.sum((y_true - y_true.mean()) ** 2)
+        explained_variance = 1 - np.var(errors, axis=1) / np.var(y_true)
+    return {
+        'mape': mape,
+        'mae': np.mean(np.abs(errors), axis=1),
+        'mse': mse,
+        'rmse': np.sqrt(mse),
+        'r2': r2,
+        'explained_variance': explained_variance,
+    }
+
 
 def MAPE(y_true, y_pred):
     """Mean Absolute Percentage Error
@@ -24,20 +68,7 @@ def MAPE(y_true, y_pred):
     # Returns
         mape: Double, result data for train.
     """
-
-    y = [x for x in y_true if x > 0]
-    y_pred = [y_pred[i] for i in range(len(y_true)) if y_true[i] > 0]
-
-    num = len(y_pred)
-    sums = 0
-
-    for i in range(num):
-        tmp = abs(y[i] - y_pred[i]) / y[i]
-        sums += tmp
-
-    mape = sums * (100 / num)
-
-    return mape
+    return float(regression_metrics(y_true, y_pred)['mape'][0])
 
 
 def eva_regress(y_true, y_pred):
@@ -48,18 +79,13 @@ def eva_regress(y_true, y_pred):
         y_true: List/ndarray, ture data.
         y_pred: List/ndarray, predicted data.
     """
-
-    mape = MAPE(y_true, y_pred)
-    vs = metrics.explained_variance_score(y_true, y_pred)
-    mae = metrics.mean_absolute_error(y_true, y_pred)
-    mse = metrics.mean_squared_error(y_true, y_pred)
-    r2 = metrics.r2_score(y_true, y_pred)
-    print('explained_variance_score:%f' % vs)
-    print('mape:%f%%' % mape)
-    print('mae:%f' % mae)
-    print('mse:%f' % mse)
-    print('rmse:%f' % math.sqrt(mse))
-    print('r2:%f' % r2)
+    scores = regression_metrics(y_true, y_pred)
+    print('explained_variance_score:%f' % scores['explained_variance'][0])
+    print('mape:%f%%' % scores['mape'][0])
+    print('mae:%f' % scores['mae'][0])
+    print('mse:%f' % scores['mse'][0])
+    print('rmse:%f' % scores['rmse'][0])
+    print('r2:%f' % scores['r2'][0])
 
 
 def plot_results(y_true, y_preds, names):
@@ -71,8 +97,12 @@ def plot_results(y_true, y_preds, names):
         y_pred: List/ndarray, predicted data.
         names: List, Method names.
     """
+    # Imported here so headless evaluation runs never load a plotting backend
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+
     d = '2016-3-4 00:00'
-    x = pd.date_range(d, periods=96, freq='15min')
+    x = pd.date_range(d, periods=len(y_true), freq='15min')
 
     fig = plt.figure()
     ax = fig.add_subplot(111)
@@ -93,46 +123,160 @@ def plot_results(y_true, y_preds, names):
     plt.show()
 
 
-def main():
-    lstm = load_model('model/sites_models/lstm_2000.h5')
-    gru = load_model('model/sites_models/gru_2000.h5')
-    saes = load_model('model/sites_models/saes_2000.h5')
-    saes_fixed = load_model('model/sites_models/saes_fixed_2000.h5')
-    rnn = load_model('model/sites_models/rnn_2000.h5')
+def plot_diagrams(site, model_types):
+    """Write a graphviz diagram of each Keras model of ``site`` to images/{model}.png."""
+    from keras.models import load_model
+    from keras.utils import plot_model
+
+    for model_type in model_types:
+        path = get_model_path(site, model_type, 'keras')
+        if os.path.exists(path):
+            plot_model(load_model(path), to_file=os.path.join('images', f'{model_type}.png'), show_shapes=True)
+
 
-    models = [lstm, gru, saes, saes_fixed, rnn]
-    names = ['LSTM', 'GRU', 'SAEs', 'SAEs_fixed', 'RNN']
+def evaluate_site(job):
+    """Evaluate
+    Predict the test split of one site with every model type and score the predictions together.
+
+    # Arguments
+        job: Tuple, (site, model types, data directory, lag, model backend, model mode, use the window cache).
+    # Returns
+        records: List, one (site, model, metric, value) row per model and metric.
+        preview: Dict, the first day of true and predicted flows per model, for plotting.
+    """
+    site, model_types, data_dir, lag, backend, mode, window_cache = job
+    train_file, test_file = get_split_files(data_dir, site)
+    load = cached_process_data if window_cache else process_data
+    _, _, _, X_test, X_test_time, y_test, scaler = load(train_file, test_file, lag)
+
+    if mode == 'global':
+        registry = global_registries.setdefault(backend, ModelRegistry(backend=backend, mode=mode))
+    else:
+        registry = ModelRegistry(max_models=len(model_types), backend=backend, mode=mode)
+    names, predictions, predict_times = [], [], []
+    for model_type in model_types:
+        model = registry.get(site, model_type)
+        if model is None:
+            continue
+        t0 = time.perf_counter()
+        predicted = model.predict(model_inputs(model_type, X_test, X_test_time), batch_size=1024)
+        predict_times.append(time.perf_counter() - t0)
+        names.append(model_type)
+        predictions.append(predicted.reshape(len(X_test), -1)[:, -1])
+    if mode != 'global':
+        registry.clear()
+
+    y_true = scaler.inverse_transform(y_test.reshape(-1, 1)).ravel()
+    preview = {'true': y_true[:PLOT_SLOTS]}
+    if not names:
+        return [], preview
+
+    # One inverse transform and one metrics pass over every model's predictions
+    predictions = np.stack(predictions)
+    predictions = scaler.inverse_transform(predictions.reshape(-1, 1)).reshape(predictions.shape)
+    scores = regression_metrics(y_true, predictions)
+    scores['predict_seconds'] = np.array(predict_times)
+
+    records = [(site, name, metric, float(values[i]))
+               for metric, values in scores.items() for i, name in enumerate(names)]
+    preview.update((name, predictions[i, :PLOT_SLOTS]) for i, name in enumerate(names))
+    return records, preview
+
+
+def evaluate(sites, model_types, data_dir, lag, jobs=1, backend=MODEL_BACKEND, mode=MODEL_MODE, window_cache=True):
+    """Score every (site, model type) pair, spreading sites over ``jobs`` processes.
+
+    Returns a tidy DataFrame with one (site, model, metric, value) row per score,
+    and the plotting previews keyed by site.
+    """
+    tasks = [(site, model_types, data_dir, lag, backend, mode, window_cache) for site in sites]
+    if jobs == 1:
+        results = list(map(evaluate_site, tasks))
+    else:
+        # Spawned workers start without the parent's TensorFlow runtime state
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(jobs) as pool:
+            results = pool.map(evaluate_site, tasks)
+
+    records = [record for site_records, _ in results for record in site_records]
+    results_table = pd.DataFrame(records, columns=['site', 'model', 'metric', 'value'])
+    previews = {site: preview for site, (_, preview) in zip(sites, results)}
+    return results_table, previews
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--model",
+        default=','.join(MODEL_TYPES),
+        help="Comma-separated model types to evaluate.")
+    parser.add_argument(
+        "--sites",
+        default=None,
+        help="Comma-separated SCATS sites to evaluate (default: every site in --data-dir).")
+    parser.add_argument(
+        "--data-dir",
+        default="data/splitted_data",
+        help="Directory of per-site splits: CSVs, or a binary store written by data/store.py.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of sites to evaluate in parallel.")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the tidy results table to this CSV file.")
+    parser.add_argument(
+        "--plot",
+        default=None,
+        metavar="SITE",
+        help="Plot the first day of true and predicted flows for this site.")
+    parser.add_argument(
+        "--diagrams",
+        action="store_true",
+        help="Write graphviz model diagrams to images/ (Keras backend, needs --plot's site or the first site).")
+    parser.add_argument(
+        "--mode",
+        default=MODEL_MODE,
+        choices=['site', 'global'],
+        help="Evaluate the per-site models or the global multi-site model of each type.")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild the lag windows instead of reusing them from data/window_cache.")
+    args = parser.parse_args(argv[1:])
 
     lag = 12
-    file1 = 'data/splitted_data/2000_train.csv'
-    file2 = 'data/splitted_data/2000_test.csv'
-    X_train, X_train_time, y_train, X_test, X_test_time, y_test, scaler = process_data(file1, file2, lag)
-    y_test = scaler.inverse_transform(y_test.reshape(-1, 1)).reshape(1, -1)[0]
-
-    y_preds = []
-    for name, model in zip(names, models):
-        if name == 'SAEs' or name == 'SAEs_fixed':
-            # Reshape X_test to 2D (flatten) to match X_test_time's 2D shape
-            X_test_reshaped = X_test.reshape((X_test.shape[0], X_test.shape[1]))
-
-            # Concatenate flow data with time features before prediction
-            X_test = np.concatenate((X_test_reshaped, X_test_time), axis=1)
-
-            # Ensure X_test_full has exactly 18 features
-            if X_test.shape[1] > 18:
-                X_test = X_test[:, :18]
-        else:
-            X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
-        file = 'images/' + name + '.png'
-        plot_model(model, to_file=file, show_shapes=True)
-        predicted = model.predict(X_test)
-        predicted = scaler.inverse_transform(predicted.reshape(-1, 1)).reshape(1, -1)[0]
-        y_preds.append(predicted[:96])
-        print(name)
-        eva_regress(y_test, predicted)
-
-    plot_results(y_test[: 96], y_preds, names)
+    data_dir = args.data_dir
+    sites = args.sites.split(',') if args.sites else sorted(get_scats_sites(data_dir))
+    model_types = [m.strip().lower() for m in args.model.split(',')]
+    if args.plot and args.plot not in sites:
+        parser.error(f"--plot site {args.plot} is not among the evaluated sites")
+
+    t0 = time.perf_counter()
+    results_table, previews = evaluate(sites, model_types, data_dir, lag, args.jobs, mode=args.mode,
+                                      window_cache=not args.no_cache)
+    wall_time = time.perf_counter() - t0
+
+    if args.output:
+        results_table.to_csv(args.output, index=False)
+        print(f"Wrote {len(results_table)} results to {args.output}")
+
+    summary = results_table.pivot_table(index='model', columns='metric', values='value', aggfunc='mean')
+    with pd.option_context('display.width', 160, 'display.max_columns', None, 'display.float_format', '{:.4f}'.format):
+        print(f"Mean over {results_table['site'].nunique()} sites:")
+        print(summary.reindex(index=[m for m in model_types if m in summary.index],
+                              columns=[m for m in METRICS + ['predict_seconds'] if m in summary.columns]))
+    print(f"Evaluated {len(sites)} sites x {len(model_types)} models in {wall_time:.2f}s with {args.jobs} jobs")
+
+    if args.diagrams:
+        plot_diagrams(args.plot or sites[0], model_types)
+    if args.plot:
+        preview = previews[args.plot]
+        names = [m for m in model_types if m in preview]
+        plot_results(preview['true'], [preview[name] for name in names], names)
 
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv)
@@ -0,0 +1,183 @@
+"""
+Template-based route map.
+
+The page (map/index.html) is written once: Leaflet, the tile layer and every
+SCATS site as a single GeoJSON FeatureCollection. Each query only rewrites the
+small map/routes.js sidecar, which the open page polls and redraws, so showing
+a new route neither rebuilds the map nor relaunches the browser.
+"""
+import os
+import json
+import hashlib
+import webbrowser
+from string import Template
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+MAP_DIR = os.path.join(base_dir, 'map')
+
+MAP_CENTER = (-37.831219, 145.056965)
+MAP_ZOOM = 13
+MAP_OFFSET = 0.00123  # Shift applied to site coordinates so markers sit on the drawn intersections
+TILES_URL = 'https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png'
+TILES_ATTRIBUTION = '&copy; OpenStreetMap contributors &copy; CARTO'
+ROUTE_COLORS = ('#3484F0', '#757575')  # Fastest route, alternatives
+ROUTE_WEIGHT = 5
+POLL_MS = 1000
+
+BASE_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="tfps-nodes" content="$signature">
+<title>TFPS routes</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map('map').setView($center, $zoom);
+L.tileLayer('$tiles', {attribution: '$attribution', subdomains: 'abcd', maxZoom: 20}).addTo(map);
+
+var nodes = $nodes;
+L.geoJSON(nodes, {
+  pointToLayer: function (f, latlng) {
+    return L.circle(latlng, {radius: 5, color: '#5A5A5A', fill: true, fillOpacity: 0.7});
+  },
+  onEachFeature: function (f, layer) {
+    layer.bindTooltip('SCATS: ' + f.properties.scats + ', SITE: ' + f.properties.description);
+  }
+}).addTo(map);
+
+map.on('click', function (e) {
+  L.popup().setLatLng(e.latlng)
+    .setContent(e.latlng.lat.toFixed(6) + ', ' + e.latlng.lng.toFixed(6)).openOn(map);
+});
+
+var routeLayer = L.layerGroup().addTo(map);
+var shownVersion = null;
+function tfpsRoutes(data) {
+  if (data.version === shownVersion) { return; }
+  shownVersion = data.version;
+  routeLayer.clearLayers();
+  L.geoJSON(data.routes, {
+    style: function (f) { return {color: f.properties.stroke, weight: f.properties['stroke-width']}; }
+  }).addTo(routeLayer);
+  data.markers.forEach(function (m) {
+    L.marker([m.lat, m.lon]).bindPopup(m.popup).addTo(routeLayer);
+  });
+}
+// Reload the sidecar by re-inserting its script tag; works for pages opened from file://
+function pollRoutes() {
+  var old = document.getElementById('routes-sidecar');
+  if (old) { old.remove(); }
+  var s = document.createElement('script');
+  s.id = 'routes-sidecar';
+  s.src = 'routes.js?t=' + Date.now();
+  document.body.appendChild(s);
+}
+pollRoutes();
+setInterval(pollRoutes, $poll_ms);
+</script>
+</body>
+</html>
+""")
+
+
+def nodes_geojson(site_index):
+    """Every indexed SCATS site as one GeoJSON FeatureCollection of points."""
+    features = []
+    for site, (lat, lon, description) in sorted(site_index.records.items()):
+        features.append({
+            "type": "Feature",
+            "properties": {"scats": site, "description": description or 'No description available'},
+            "geometry": {"type": "Point", "coordinates": [round(lon + MAP_OFFSET, 7), round(lat + MAP_OFFSET, 7)]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def routes_geojson(routes, site_index):
+    """Route polylines, alternatives first so the fastest route is drawn on top."""
+    features = []
+    for index, route in reversed(list(enumerate(routes))):
+        coords = []
+        for site in route[2]:
+            record = site_index.get(site)
+            if record is not None:
+                coords.append([round(record[1] + MAP_OFFSET, 7), round(record[0] + MAP_OFFSET, 7)])
+        if coords:
+            features.append({
+                "type": "Feature",
+                "properties": {"stroke": ROUTE_COLORS[0] if index == 0 else ROUTE_COLORS[1],
+                               "stroke-width": ROUTE_WEIGHT},
+                "geometry": {"type": "LineString", "coordinates": coords},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class MapRenderer:
+    """Writes the base map page once and a routes sidecar per query."""
+
+    def __init__(self, site_index, directory=MAP_DIR):
+        self.site_index = site_index
+        self.directory = directory
+        self.base_path = os.path.join(directory, 'index.html')
+        self.routes_path = os.path.join(directory, 'routes.js')
+        self.version = 0
+        self.opened = False
+
+    def base_html(self):
+        nodes = json.dumps(nodes_geojson(self.site_index), separators=(',', ':'))
+        return BASE_TEMPLATE.substitute(
+            signature=hashlib.sha1(nodes.encode('utf-8')).hexdigest(), center=json.dumps(list(MAP_CENTER)),
+            zoom=MAP_ZOOM, tiles=TILES_URL, attribution=TILES_ATTRIBUTION, nodes=nodes, poll_ms=POLL_MS)
+
+    def ensure_base(self):
+        """Write index.html unless an identical page (same nodes and template) is already on disk."""
+        html = self.base_html()
+        if os.path.exists(self.base_path):
+            with open(self.base_path, encoding='utf-8') as f:
+                if f.read() == html:
+                    return False
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.base_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        return True
+
+    def write_sidecar(self, routes, markers):
+        self.version += 1
+        data = {"version": f"{os.getpid()}-{self.version}", "routes": routes, "markers": markers}
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.routes_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('tfpsRoutes(' + json.dumps(data, separators=(',', ':')) + ');\n')
+        os.replace(tmp_path, self.routes_path)
+        return self.routes_path
+
+    def render_routes(self, routes):
+        """Write the sidecar for ``routes`` (pathfinder tuples) with start and finish markers."""
+        src, dest = routes[0][2][0], routes[0][2][-1]
+        markers = []
+        for label, site in (('Start', src), ('Finish', dest)):
+            record = self.site_index.get(site)
+            if record is not None:
+                lat, lon, description = record
+                markers.append({"lat": lat + MAP_OFFSET, "lon": lon + MAP_OFFSET,
+                                "popup": f"<strong>{label}</strong><br><strong>SCATS:</strong> {site}"
+                                         f"<br><strong>SITE:</strong> {description}"})
+        return self.write_sidecar(routes_geojson(routes, self.site_index), markers)
+
+    def render_sites(self, message="<strong>No route found</strong>"):
+        """Write a sidecar with no routes, only a message marker at the map centre."""
+        markers = [{"lat": MAP_CENTER[0], "lon": MAP_CENTER[1], "popup": message}]
+        return self.write_sidecar({"type": "FeatureCollection", "features": []}, markers)
+
+    def show(self, reopen=False):
+        """Make sure the base page exists and open it once per session; later renders reuse the open tab.
+
+        ``reopen`` opens it again, for when the user closed the tab.
+        """
+        if self.ensure_base() or not self.opened or reopen:
+            webbrowser.open('file://' + self.base_path)
+            self.opened = True
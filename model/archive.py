@@ -0,0 +1,274 @@
+"""
+Packed per-type model archives: all sites' weights in one file plus a manifest
+"""
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import numpy as np
+from scaler_store import get_scaler_path, load_scaler_params, set_scaler_params
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SITES_MODELS_DIR = os.path.join(base_dir, 'sites_models')
+ARCHIVE_DIR = os.path.join(base_dir, 'archives')
+
+ARCHIVE_FORMAT = 1
+ALIGNMENT = 64  # Byte alignment of every site's weight block
+
+
+def get_archive_paths(model_type, directory=ARCHIVE_DIR):
+    """(manifest, weights) paths of a model type's archive."""
+    name = model_type.lower()
+    return os.path.join(directory, f'{name}.json'), os.path.join(directory, f'{name}.weights')
+
+
+def site_model_files(model_type, src=SITES_MODELS_DIR):
+    """{site: .h5 path} of the per-site models of exactly ``model_type`` (saes_* must not pick up saes_fixed_*)."""
+    prefix = f'{model_type.lower()}_'
+    files = {}
+    for path in sorted(glob.glob(os.path.join(src, prefix + '*.h5'))):
+        site = os.path.basename(path)[len(prefix):-len('.h5')]
+        if site.isdigit():
+            files[site] = path
+    return files
+
+
+def training_metrics(h5_path):
+    """Final-epoch values of the loss history saved next to a model, or {}."""
+    history_path = h5_path[:-len('.h5')] + '_loss.csv'
+    if not os.path.exists(history_path):
+        return {}
+    with open(history_path) as f:
+        rows = [line.strip().split(',') for line in f if line.strip()]
+    if len(rows) < 2:
+        return {}
+    return {name: float(value) for name, value in zip(rows[0], rows[-1])}
+
+
+def build_archive(model_type, src=SITES_MODELS_DIR, dst=ARCHIVE_DIR):
+    """Pack every per-site .h5 of ``model_type`` into one weights file and a manifest.
+
+    Returns the manifest, or None when there are no models to pack.
+    """
+    # Imported here so serving from an archive does not need h5py
+    import h5py
+    from model.export import read_h5_model
+
+    model_type = model_type.lower()
+    files = site_model_files(model_type, src)
+    if not files:
+        return None
+    manifest_path, weights_path = get_archive_paths(model_type, dst)
+    os.makedirs(dst, exist_ok=True)
+
+    architectures, architecture_ids, sites = [], {}, {}
+    offset = 0
+    with open(weights_path + '.tmp', 'wb') as out:
+        for site, h5_path in files.items():
+            numpy_model = read_h5_model(h5_path)
+            shapes = [[list(w.shape) for w in layer_weights] for layer_weights in numpy_model.weights]
+            key = json.dumps([numpy_model.layers, list(numpy_model.input_shape), shapes], sort_keys=True)
+            if key not in architecture_ids:
+                with h5py.File(h5_path, 'r') as f:
+                    keras_config = f.attrs['model_config']
+                architecture_ids[key] = len(architectures)
+                architectures.append({
+                    'layers': numpy_model.layers,
+                    'input_shape': list(numpy_model.input_shape),
+                    'weight_shapes': shapes,
+                    'keras_config': keras_config.decode('utf-8') if isinstance(keras_config, bytes) else keras_config,
+                })
+
+            block = b''.join(np.ascontiguousarray(w, dtype=np.float32).tobytes()
+                             for layer_weights in numpy_model.weights for w in layer_weights)
+            out.write(block)
+            out.write(b'\0' * (-len(block) % ALIGNMENT))
+            scaler = load_scaler_params(site, model_type) if os.path.exists(get_scaler_path(site, model_type)) else None
+            sites[site] = {
+                'offset': offset,
+                'nbytes': len(block),
+                'architecture': architecture_ids[key],
+                'sha1': hashlib.sha1(block).hexdigest(),
+                'scaler': list(scaler) if scaler is not None else None,
+                'metrics': training_metrics(h5_path),
+                'source': os.path.basename(h5_path),
+            }
+            offset += len(block) + (-len(block) % ALIGNMENT)
+
+    manifest = {
+        'model': model_type,
+        'format': ARCHIVE_FORMAT,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'architectures': architectures,
+        'sites': sites,
+    }
+    # Weights first: a manifest on disk always describes a complete weights file
+    os.replace(weights_path + '.tmp', weights_path)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+class KerasRunner:
+    """One built Keras model per architecture; site weights are assigned before predicting when they change."""
+
+    def __init__(self, keras_config):
+        import tensorflow as tf
+        from keras.models import model_from_json
+
+        self.graph = tf.Graph()
+        self.session = tf.Session(graph=self.graph)
+        with self.graph.as_default(), self.session.as_default():
+            self.model = model_from_json(keras_config)
+        self.current = None  # Weights currently assigned
+
+    def predict(self, weights, x, batch_size=32):
+        with self.graph.as_default(), self.session.as_default():
+            if self.current is not weights:
+                self.model.set_weights(weights)
+                self.current = weights
+            return self.model.predict(x, batch_size=batch_size)
+
+    def close(self):
+        self.session.close()
+
+
+class ArchiveSiteModel:
+    """A site's weights served through the shared KerasRunner of its architecture."""
+
+    def __init__(self, runner, weights, input_shape):
+        self.runner = runner
+        self.weights = weights
+        self.input_shape = tuple(input_shape)
+        self.nbytes = sum(w.nbytes for w in weights)
+
+    def predict(self, x, batch_size=32):
+        return self.runner.predict(self.weights, x, batch_size)
+
+    def close(self):
+        if self.runner.current is self.weights:
+            self.runner.current = None
+
+
+class ModelArchive:
+    """Read side of an archive: the manifest answers which sites exist, one seek reads a site's weights."""
+
+    def __init__(self, manifest, weights_path):
+        self.manifest = manifest
+        self.model_type = manifest['model']
+        self.weights_path = weights_path
+        self.runners = {}  # architecture id -> KerasRunner
+
+    @classmethod
+    def open(cls, model_type, directory=ARCHIVE_DIR):
+        """The archive of ``model_type``, or None if there is none."""
+        manifest_path, weights_path = get_archive_paths(model_type, directory)
+        if not (os.path.exists(manifest_path) and os.path.exists(weights_path)):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != ARCHIVE_FORMAT:
+            print(f"Ignoring {manifest_path}: archive format {manifest.get('format')}, expected {ARCHIVE_FORMAT}")
+            return None
+        return cls(manifest, weights_path)
+
+    @property
+    def sites(self):
+        return sorted(self.manifest['sites'])
+
+    def __contains__(self, site):
+        return site in self.manifest['sites']
+
+    def __len__(self):
+        return len(self.manifest['sites'])
+
+    def read_weights(self, site, verify=True):
+        """A site's weight arrays, read with one seek; ValueError if the block fails its checksum."""
+        entry = self.manifest['sites'][site]
+        with open(self.weights_path, 'rb') as f:
+            f.seek(entry['offset'])
+            block = f.read(entry['nbytes'])
+        if verify and hashlib.sha1(block).hexdigest() != entry['sha1']:
+            raise ValueError(f"Checksum mismatch for site {site} in {self.weights_path}")
+
+        weights, position = [], 0
+        for layer_shapes in self.manifest['architectures'][entry['architecture']]['weight_shapes']:
+            layer_weights = []
+            for shape in layer_shapes:
+                count = int(np.prod(shape))
+                layer_weights.append(np.frombuffer(block, dtype=np.float32, count=count, offset=position).reshape(shape))
+                position += 4 * count
+            weights.append(layer_weights)
+        return weights
+
+    def load_site(self, site, backend='keras'):
+        """A servable model for ``site``: a NumpyModel, or a view on the shared Keras model of its architecture.
+
+        The site's archived scaler range is registered too, so predictions denormalize
+        with the range these weights were trained with.
+        """
+        from model.numpy_runtime import NumpyModel
+
+        entry = self.manifest['sites'][site]
+        architecture = self.manifest['architectures'][entry['architecture']]
+        weights = self.read_weights(site)
+        if entry['scaler'] is not None:
+            set_scaler_params(site, self.model_type, *entry['scaler'])
+        if backend == 'numpy':
+            return NumpyModel(architecture['layers'], weights, architecture['input_shape'])
+        if entry['architecture'] not in self.runners:
+            self.runners[entry['architecture']] = KerasRunner(architecture['keras_config'])
+        flat = [w for layer_weights in weights for w in layer_weights]
+        return ArchiveSiteModel(self.runners[entry['architecture']], flat, architecture['input_shape'])
+
+    def close(self):
+        for runner in self.runners.values():
+            runner.close()
+        self.runners.clear()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=['build', 'list', 'verify'],
+                        help="build: pack the .h5 models; list: show the index; verify: check every checksum.")
+    parser.add_argument("--src", default=SITES_MODELS_DIR, help="Directory holding the .h5 models.")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Archive directory.")
+    parser.add_argument("--models", nargs="*", default=['lstm', 'gru', 'saes', 'saes_fixed', 'rnn'],
+                        help="Model types to process.")
+    args = parser.parse_args(argv[1:])
+
+    for model_type in args.models:
+        if args.command == 'build':
+            t0 = time.perf_counter()
+            manifest = build_archive(model_type, args.src, args.dir)
+            if manifest is None:
+                print(f"{model_type}: no models in {args.src}")
+                continue
+            size = os.path.getsize(get_archive_paths(model_type, args.dir)[1])
+            print(f"{model_type}: packed {len(manifest['sites'])} sites, {len(manifest['architectures'])} "
+                  f"architecture(s), {size / 1024 ** 2:.1f} MB in {time.perf_counter() - t0:.2f}s")
+            continue
+
+        archive = ModelArchive.open(model_type, args.dir)
+        if archive is None:
+            print(f"{model_type}: no archive")
+            continue
+        if args.command == 'list':
+            print(f"{model_type}: {len(archive)} sites: {', '.join(archive.sites)}")
+        else:
+            failed = []
+            for site in archive.sites:
+                try:
+                    archive.read_weights(site)
+                except ValueError:
+                    failed.append(site)
+            print(f"{model_type}: {len(archive) - len(failed)}/{len(archive)} sites OK"
+                  + (f", corrupt: {', '.join(failed)}" if failed else ""))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
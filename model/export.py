@@ -0,0 +1,91 @@
+"""
+Export the per-site Keras .h5 models to the NumPy runtime weight format
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+import h5py
+import numpy as np
+from model.numpy_runtime import NumpyModel, LAYERS, INFERENCE_NOOPS
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SITES_MODELS_DIR = os.path.join(base_dir, 'sites_models')
+SITES_NUMPY_DIR = os.path.join(base_dir, 'sites_numpy')
+
+# Layer config keys the NumPy runtime needs
+RUNTIME_KEYS = ['activation', 'recurrent_activation', 'return_sequences']
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _layer_configs(model_config):
+    """Flatten Sequential and single-chain functional model configs into a list of layer configs."""
+    config = model_config['config']
+    layers = config if isinstance(config, list) else config['layers']
+    return [{'class_name': layer['class_name'], 'config': layer['config']} for layer in layers]
+
+
+def read_h5_model(path):
+    """Read a Keras .h5 file saved by ``train.py`` into a NumpyModel."""
+    with h5py.File(path, 'r') as f:
+        model_config = json.loads(_decode(f.attrs['model_config']))
+        model_weights = f['model_weights']
+
+        layers, weights, input_shape = [], [], None
+        for layer in _layer_configs(model_config):
+            class_name, config = layer['class_name'], layer['config']
+            if input_shape is None and 'batch_input_shape' in config:
+                input_shape = config['batch_input_shape']
+            if class_name not in LAYERS and class_name not in INFERENCE_NOOPS:
+                raise ValueError(f"Unsupported layer {class_name} in {path}")
+
+            group = model_weights[config['name']] if config['name'] in model_weights else None
+            names = [_decode(name) for name in group.attrs['weight_names']] if group is not None else []
+            layer_weights = [np.asarray(group[name], dtype=np.float32) for name in names]
+
+            spec = {key: config[key] for key in RUNTIME_KEYS if key in config}
+            spec['class_name'] = class_name
+            spec['n_weights'] = len(layer_weights)
+            layers.append(spec)
+            weights.append(layer_weights)
+
+    return NumpyModel(layers, weights, input_shape)
+
+
+def export_model(h5_path, out_dir=SITES_NUMPY_DIR):
+    """Export one .h5 file and return the path of the written .npz."""
+    name = os.path.splitext(os.path.basename(h5_path))[0]
+    out_path = os.path.join(out_dir, f"{name}.npz")
+    read_h5_model(h5_path).save(out_path)
+    return out_path
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default=SITES_MODELS_DIR, help="Directory holding the .h5 models.")
+    parser.add_argument("--dst", default=SITES_NUMPY_DIR, help="Directory to write .npz weights to.")
+    parser.add_argument("--models", nargs="*", default=None, help="Model types to export (default: all).")
+    args = parser.parse_args(argv[1:])
+
+    os.makedirs(args.dst, exist_ok=True)
+    h5_files = sorted(glob.glob(os.path.join(args.src, '*.h5')))
+    if args.models:
+        prefixes = tuple(f"{m.lower()}_" for m in args.models)
+        h5_files = [path for path in h5_files if os.path.basename(path).startswith(prefixes)]
+
+    src_bytes = dst_bytes = 0
+    for h5_path in h5_files:
+        out_path = export_model(h5_path, args.dst)
+        src_bytes += os.path.getsize(h5_path)
+        dst_bytes += os.path.getsize(out_path)
+
+    print(f"Exported {len(h5_files)} models to {args.dst} "
+          f"({src_bytes / 1024 ** 2:.1f} MB .h5 -> {dst_bytes / 1024 ** 2:.1f} MB .npz)")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
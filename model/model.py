@@ -7,18 +7,19 @@ from keras.models import Sequential, Model
 from keras import regularizers
 
 
-def get_lstm(units):
+def get_lstm(units, features=1):
     """LSTM(Long Short-Term Memory)
     Build LSTM Model.
 
     # Arguments
         units: List(int), number of input, output and hidden units.
+        features: Integer, inputs per timestep (1 + number of sites for a global model).
     # Returns
         model: Model, nn model.
     """
 
     model = Sequential()
-    model.add(LSTM(units[1], input_shape=(units[0], 1), return_sequences=True))
+    model.add(LSTM(units[1], input_shape=(units[0], features), return_sequences=True))
     model.add(LSTM(units[2]))
     model.add(Dropout(0.2))
     model.add(Dense(units[3], activation='sigmoid'))
@@ -26,18 +27,19 @@ def get_lstm(units):
     return model
 
 
-def get_gru(units):
+def get_gru(units, features=1):
     """GRU(Gated Recurrent Unit)
     Build GRU Model.
 
     # Arguments
         units: List(int), number of input, output and hidden units.
+        features: Integer, inputs per timestep (1 + number of sites for a global model).
     # Returns
         model: Model, nn model.
     """
 
     model = Sequential()
-    model.add(GRU(units[1], input_shape=(units[0], 1), return_sequences=True))
+    model.add(GRU(units[1], input_shape=(units[0], features), return_sequences=True))
     model.add(GRU(units[2]))
     model.add(Dropout(0.2))
     model.add(Dense(units[3], activation='sigmoid'))
@@ -131,12 +133,13 @@ def get_saes_fixed(input_dim, hidden_layers):
     return autoencoder
 
 
-def get_rnn(units):
+def get_rnn(units, features=1):
     """RNN(Recurrent Neural Network)
     Build RNN Model.
 
     # Arguments
     units: List(int), number of input, output and hidden units.
+    features: Integer, inputs per timestep (1 + number of sites for a global model).
 
     # Returns
     model: Model, RNN model."""
@@ -144,7 +147,7 @@ def get_rnn(units):
     model = Sequential()
 
     # First RNN layer (return sequences for stacked RNN)
-    model.add(SimpleRNN(units[1], input_shape=(units[0], 1), return_sequences=True))
+    model.add(SimpleRNN(units[1], input_shape=(units[0], features), return_sequences=True))
 
     # Second RNN layer
     model.add(SimpleRNN(units[2]))
@@ -0,0 +1,184 @@
+"""
+Pure-NumPy inference runtime for the exported per-site networks
+"""
+import json
+import numpy as np
+
+
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'tanh': np.tanh,
+    'relu': _relu,
+    'linear': _linear,
+}
+
+# Layers without weights that are identities at inference time
+INFERENCE_NOOPS = ['Dropout', 'InputLayer']
+
+
+def _matmul(x, kernel):
+    """Multiply by a kernel of shape (in, out) or, for stacked models, (sites, in, out)."""
+    if kernel.ndim > 2:
+        kernel = kernel.reshape(kernel.shape[:1] + (1,) * (x.ndim - 3) + kernel.shape[1:])
+    return np.matmul(x, kernel)
+
+
+def _add_bias(y, bias):
+    """Add a bias of shape (units,) or, for stacked models, (sites, units)."""
+    if bias.ndim > 1:
+        bias = bias.reshape(bias.shape[:1] + (1,) * (y.ndim - 2) + bias.shape[1:])
+    return y + bias
+
+
+def _dense(x, config, weights):
+    kernel, bias = weights
+    return ACTIVATIONS[config['activation']](_add_bias(_matmul(x, kernel), bias))
+
+
+def _activation(x, config, weights):
+    return ACTIVATIONS[config['activation']](x)
+
+
+def _recurrent(step):
+    """Wrap a single-timestep cell into a layer over inputs of shape (..., batch, timesteps, features)."""
+    def layer(x, config, weights):
+        kernel, recurrent_kernel, bias = weights
+        # Project every timestep at once; only the recurrent term stays in the loop
+        projected = _add_bias(_matmul(x, kernel), bias)
+        units = recurrent_kernel.shape[-2]
+        state = [np.zeros(x.shape[:-2] + (units,), dtype=x.dtype)] * step.n_states
+        outputs = []
+        for t in range(x.shape[-2]):
+            state = step(projected[..., t, :], state, recurrent_kernel, config)
+            outputs.append(state[0])
+        if config.get('return_sequences'):
+            return np.stack(outputs, axis=-2)
+        return outputs[-1]
+    return layer
+
+
+def _lstm_step(x_t, state, recurrent_kernel, config):
+    h, c = state
+    units = h.shape[-1]
+    activation = ACTIVATIONS[config['activation']]
+    recurrent_activation = ACTIVATIONS[config['recurrent_activation']]
+    z = x_t + _matmul(h, recurrent_kernel)
+    i = recurrent_activation(z[..., :units])
+    f = recurrent_activation(z[..., units:2 * units])
+    c = f * c + i * activation(z[..., 2 * units:3 * units])
+    o = recurrent_activation(z[..., 3 * units:])
+    return [o * activation(c), c]
+
+
+_lstm_step.n_states = 2
+
+
+def _gru_step(x_t, state, recurrent_kernel, config):
+    h, = state
+    units = h.shape[-1]
+    activation = ACTIVATIONS[config['activation']]
+    recurrent_activation = ACTIVATIONS[config['recurrent_activation']]
+    zr = x_t[..., :2 * units] + _matmul(h, recurrent_kernel[..., :2 * units])
+    z = recurrent_activation(zr[..., :units])
+    r = recurrent_activation(zr[..., units:])
+    hh = activation(x_t[..., 2 * units:] + _matmul(r * h, recurrent_kernel[..., 2 * units:]))
+    return [z * h + (1 - z) * hh]
+
+
+_gru_step.n_states = 1
+
+
+def _simple_rnn_step(x_t, state, recurrent_kernel, config):
+    h, = state
+    return [ACTIVATIONS[config['activation']](x_t + _matmul(h, recurrent_kernel))]
+
+
+_simple_rnn_step.n_states = 1
+
+
+LAYERS = {
+    'Dense': _dense,
+    'Activation': _activation,
+    'LSTM': _recurrent(_lstm_step),
+    'GRU': _recurrent(_gru_step),
+    'SimpleRNN': _recurrent(_simple_rnn_step),
+}
+
+
+class NumpyModel:
+    """Forward pass of a Dense/LSTM/GRU/SimpleRNN stack using only NumPy.
+
+    Exposes the ``input_shape`` / ``predict`` interface the prediction code
+    uses on Keras models, so it can be served from the model registry.
+    """
+
+    def __init__(self, layers, weights, input_shape):
+        self.layers = layers
+        self.weights = weights
+        self.input_shape = tuple(input_shape)
+        self.nbytes = sum(w.nbytes for layer_weights in weights for w in layer_weights)
+
+    def predict(self, x, batch_size=None):
+        x = np.asarray(x, dtype=np.float32)
+        for config, weights in zip(self.layers, self.weights):
+            if config['class_name'] in INFERENCE_NOOPS:
+                continue
+            x = LAYERS[config['class_name']](x, config, weights)
+        return x
+
+    def close(self):
+        pass
+
+    def save(self, path):
+        arrays = {}
+        for i, layer_weights in enumerate(self.weights):
+            for j, w in enumerate(layer_weights):
+                arrays[f"layer{i}_{j}"] = w
+        spec = {'layers': self.layers, 'input_shape': list(self.input_shape)}
+        np.savez(path, spec=json.dumps(spec), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            spec = json.loads(str(data['spec']))
+            weights = []
+            for i, config in enumerate(spec['layers']):
+                weights.append([data[f"layer{i}_{j}"] for j in range(config['n_weights'])])
+        return cls(spec['layers'], weights, spec['input_shape'])
+
+
+class StackedNumpyModel(NumpyModel):
+    """Many same-architecture site models evaluated together.
+
+    Weights carry a leading site axis, and ``predict`` takes inputs of shape
+    (sites, batch, ...) so every site and timestep runs in one batched pass.
+    """
+
+    def __init__(self, models):
+        first = models[0]
+        for model in models[1:]:
+            if model.layers != first.layers or model.input_shape != first.input_shape:
+                raise ValueError("Only models with identical architectures can be stacked")
+        weights = [
+            [np.stack([model.weights[i][j] for model in models]) for j in range(len(layer_weights))]
+            for i, layer_weights in enumerate(first.weights)
+        ]
+        super().__init__(first.layers, weights, first.input_shape)
+        self.n_models = len(models)
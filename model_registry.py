@@ -0,0 +1,238 @@
+import os
+import time
+from collections import OrderedDict
+from model.numpy_runtime import NumpyModel
+from model.archive import ModelArchive, get_archive_paths
+from global_model import GlobalModel, SiteModel
+from scaler_store import scaler_params
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 'keras' serves the .h5 files; 'numpy' serves weights exported by model/export.py
+# and never imports TensorFlow
+MODEL_BACKEND = os.environ.get('TFPS_MODEL_BACKEND', 'keras').lower()
+
+# 'site' serves one network per site; 'global' serves the multi-site network from train.py --global,
+# falling back to per-site models for sites it was not trained on
+MODEL_MODE = os.environ.get('TFPS_MODEL_MODE', 'site').lower()
+
+MAX_RESIDENT_MODELS = 48  # Slightly more than one model type across all Boroondara sites
+MAX_RESIDENT_BYTES = None  # Optional cap on the summed weight size of resident models
+
+
+def get_model_path(site, model_type, backend=None):
+    # model_path = f'model/sites_models/{key}.h5'; files are lowercase, callers pass 'LSTM' as well as 'lstm'
+    name = model_type.lower()
+    if (backend or MODEL_BACKEND) == 'numpy':
+        return os.path.join(base_dir, 'model', 'sites_numpy', f'{name}_{site}.npz')
+    return os.path.join(base_dir, 'model', 'sites_models', f'{name}_{site}.h5')
+
+
+class SessionModel:
+    """A Keras model loaded into its own graph and session.
+
+    With the TensorFlow backend every ``load_model`` call otherwise adds its
+    ops to the shared default graph, which is never freed; an isolated
+    session can be closed when the registry evicts the model.
+    """
+
+    def __init__(self, path):
+        # Imported here so the NumPy backend never pays for TensorFlow start-up
+        import tensorflow as tf
+        from keras.models import load_model
+
+        self.graph = tf.Graph()
+        self.session = tf.Session(graph=self.graph)
+        with self.graph.as_default(), self.session.as_default():
+            self.model = load_model(path)
+        self.input_shape = self.model.input_shape
+        self.nbytes = self.model.count_params() * 4  # float32 weights
+
+    def predict(self, x, batch_size=32):
+        with self.graph.as_default(), self.session.as_default():
+            return self.model.predict(x, batch_size=batch_size)
+
+    def get_weights(self):
+        with self.graph.as_default(), self.session.as_default():
+            return self.model.get_weights()
+
+    def close(self):
+        self.session.close()
+
+
+class ModelRegistry:
+    """Lazily loads per-site models and keeps at most a bounded number resident.
+
+    Models are evicted least recently used first once ``max_models`` or
+    ``max_bytes`` is exceeded. Sites without a model are remembered as None
+    so repeated lookups do not touch the filesystem. When a model type has an
+    archive from model/archive.py its sites are read from there, unless a
+    loose model file is newer than the archive.
+    """
+
+    def __init__(self, max_models=MAX_RESIDENT_MODELS, max_bytes=MAX_RESIDENT_BYTES, backend=None, mode=None):
+        self.backend = backend or MODEL_BACKEND
+        self.mode = mode or MODEL_MODE
+        self.global_models = {}  # model type -> GlobalModel, or None when there is none
+        self.archives = {}  # model type -> (ModelArchive, manifest mtime), or None when there is none
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()  # key -> (model, nbytes)
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.total_load_time = 0.0
+
+    def get(self, site, model_type):
+        key = f"{model_type.lower()}_{site}"
+        if key in self.models:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return self.models[key][0]
+
+        self.misses += 1
+        model = self.load(site, model_type)
+        nbytes = model.nbytes if model is not None else 0
+        self.models[key] = (model, nbytes)
+        self.resident_bytes += nbytes
+        self.evict()
+        return model
+
+    def get_global(self, model_type):
+        key = model_type.lower()
+        if key not in self.global_models:
+            t0 = time.perf_counter()
+            self.global_models[key] = GlobalModel.load(model_type, self.backend)
+            if self.global_models[key] is not None:
+                self.loads += 1
+                self.total_load_time += time.perf_counter() - t0
+        return self.global_models[key]
+
+    def get_archive(self, model_type):
+        """The ModelArchive of ``model_type``, or None if it has not been built."""
+        key = model_type.lower()
+        if key not in self.archives:
+            archive = ModelArchive.open(model_type)
+            self.archives[key] = (archive, os.path.getmtime(get_archive_paths(model_type)[0])) if archive else None
+        return self.archives[key][0] if self.archives[key] else None
+
+    def available_sites(self, model_type):
+        """Sites with a ``model_type`` model: an index lookup when archived, a directory listing otherwise."""
+        archive = self.get_archive(model_type)
+        if archive is not None:
+            return archive.sites
+        directory, prefix = os.path.dirname(get_model_path('', model_type, self.backend)), f'{model_type.lower()}_'
+        if not os.path.isdir(directory):
+            return []
+        sites = (os.path.splitext(name)[0][len(prefix):] for name in os.listdir(directory) if name.startswith(prefix))
+        return sorted(site for site in sites if site.isdigit())
+
+    def load_archived(self, site, model_type, model_path):
+        """``site``'s model from the archive of ``model_type``; None if it is not archived or its loose file is newer."""
+        archive = self.get_archive(model_type)
+        if archive is None or site not in archive:
+            return None
+        if os.path.exists(model_path) and os.path.getmtime(model_path) > self.archives[model_type.lower()][1]:
+            # Re-read the loose model's scaler file instead of a range registered from the archive
+            scaler_params.pop((model_type.lower(), site), None)
+            return None
+
+        t0 = time.perf_counter()
+        try:
+            model = archive.load_site(site, self.backend)
+        except ImportError as e:
+            print(f"Cannot load archived {model_type} model for site {site}: the {self.backend} backend is "
+                  f"unavailable ({str(e)}); set TFPS_MODEL_BACKEND=numpy to serve exported weights")
+            return None
+        except (IOError, OSError, ValueError) as e:
+            print(f"Failed to load archived {model_type} model for site {site}: {str(e)}")
+            return None
+        self.loads += 1
+        self.total_load_time += time.perf_counter() - t0
+        return model
+
+    def load(self, site, model_type):
+        if self.mode == 'global':
+            shared = self.get_global(model_type)
+            if shared is not None and site in shared.site_index:
+                return SiteModel(shared, site)
+
+        model_path = get_model_path(site, model_type, self.backend)
+        model = self.load_archived(site, model_type, model_path)
+        if model is not None:
+            return model
+        if not os.path.exists(model_path):
+            print(f"No {model_type} model found for site {site}")
+            return None
+
+        t0 = time.perf_counter()
+        try:
+            model = NumpyModel.load(model_path) if self.backend == 'numpy' else SessionModel(model_path)
+        except ImportError as e:
+            print(f"Cannot load {model_type} model for site {site}: the {self.backend} backend is "
+                  f"unavailable ({str(e)}); set TFPS_MODEL_BACKEND=numpy to serve exported weights")
+            return None
+        except (IOError, OSError, ValueError) as e:
+            print(f"Failed to load {model_type} model for site {site}: {str(e)}")
+            return None
+        self.loads += 1
+        self.total_load_time += time.perf_counter() - t0
+        print(f"Loaded {model_type} model for site {site}")
+        return model
+
+    def evict(self):
+        def over_budget():
+            # The most recently used model always stays resident
+            resident = sum(1 for model, _ in self.models.values() if model is not None)
+            if resident <= 1:
+                return False
+            if resident > self.max_models:
+                return True
+            return self.max_bytes is not None and self.resident_bytes > self.max_bytes
+
+        while over_budget():
+            key = next(k for k, (model, _) in self.models.items() if model is not None)
+            model, nbytes = self.models.pop(key)
+            model.close()
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.models
+
+    def __len__(self):
+        return len(self.models)
+
+    def clear(self):
+        for model, _ in self.models.values():
+            if model is not None:
+                model.close()
+        self.models.clear()
+        self.resident_bytes = 0
+        for shared in self.global_models.values():
+            if shared is not None:
+                shared.close()
+        self.global_models.clear()
+        for entry in self.archives.values():
+            if entry is not None:
+                entry[0].close()
+        self.archives.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'loads': self.loads,
+            'total_load_time': self.total_load_time,
+            'mean_load_time': self.total_load_time / self.loads if self.loads else 0.0,
+            'resident_models': sum(1 for model, _ in self.models.values() if model is not None),
+            'resident_bytes': self.resident_bytes + sum(shared.nbytes for shared in self.global_models.values()
+                                                        if shared is not None),
+            'archives': sum(1 for entry in self.archives.values() if entry is not None),
+            'global_models': sum(1 for shared in self.global_models.values() if shared is not None),
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,130 @@
+"""
+Origin-destination travel-time matrices for the SCATS network.
+
+For every origin and departure time one time-dependent shortest-path tree is
+grown to all sites, so a full matrix costs one search per (origin, time)
+instead of one route query per pair. Origins are spread over a process pool;
+the forecast tables are predicted once in the parent and handed to every worker.
+
+Run from the repository root:
+    python od_matrix.py --model LSTM --times "2006-10-02 08:00" "2006-10-02 17:00" --jobs 4 --output model/od_matrices/lstm_peaks
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from datetime import datetime, timedelta
+
+import pathfinder
+import forecast_table
+from k_shortest import shortest_path_tree
+from forecast_table import get_forecast_table, save_forecast_tables, SLOT_MINUTES
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+OD_DIR = os.path.join(base_dir, 'model', 'od_matrices')
+
+
+def prepare_forecast_tables(departure_times, model_type):
+    """Fully predicted forecast tables for every day a route may reach (departure day and the next)."""
+    days = sorted(set(d.date() + timedelta(days=offset) for d in departure_times for offset in (0, 1)))
+    tables = []
+    for day in days:
+        table = get_forecast_table(pathfinder.all_sites, day, model_type, lazy=True)
+        table.fill_unfilled()
+        tables.append(table)
+    save_forecast_tables()
+    return tables
+
+
+def init_worker(model_type, tables):
+    """Install the parent's forecast tables so workers never load a model."""
+    pathfinder.global_model_type = model_type
+    for table in tables:
+        forecast_table.forecast_tables[forecast_table.table_key(table.day, table.model_type, table.slot_minutes)] = table
+
+
+def route_origin(task):
+    """Travel minutes from one origin to every site, for each departure time: ndarray (times, sites)."""
+    origin, departure_times = task
+    times = np.full((len(departure_times), len(pathfinder.site_ids)), np.inf, dtype=np.float32)
+    for t, departure_time in enumerate(departure_times):
+        arrival, _ = shortest_path_tree(pathfinder.site_index[origin], 0.0, pathfinder.neighbor_index,
+                                        pathfinder.departure_edge_time(departure_time))
+        times[t] = arrival
+    return origin, times
+
+
+def compute_od_matrix(origins, destinations, departure_times, model_type, jobs=1):
+    """Travel-time matrix in minutes, shape (departure times, origins, destinations); inf where unreachable."""
+    tables = prepare_forecast_tables(departure_times, model_type)
+    tasks = [(origin, departure_times) for origin in origins]
+
+    if jobs == 1:
+        init_worker(model_type, tables)
+        rows = dict(map(route_origin, tasks))
+    else:
+        # Spawned workers start without the parent's TensorFlow runtime state
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(jobs, initializer=init_worker, initargs=(model_type, tables)) as pool:
+            rows = dict(pool.imap_unordered(route_origin, tasks))
+
+    columns = [pathfinder.site_index[destination] for destination in destinations]
+    return np.stack([rows[origin][:, columns] for origin in origins], axis=1)
+
+
+def save_od_matrix(prefix, matrix, origins, destinations, departure_times, model_type):
+    """Write ``prefix.npy`` (float32 minutes) and ``prefix.json`` describing its axes."""
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(prefix + '.npy', matrix.astype(np.float32))
+    index = {
+        'model': model_type,
+        'units': 'minutes',
+        'shape': ['departure_times', 'origins', 'destinations'],
+        'departure_times': [d.strftime("%Y-%m-%d %H:%M") for d in departure_times],
+        'origins': list(origins),
+        'destinations': list(destinations),
+        'slot_minutes': SLOT_MINUTES,
+    }
+    with open(prefix + '.json', 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+def load_od_matrix(prefix):
+    """Read a matrix written by ``save_od_matrix``; returns (matrix, index)."""
+    with open(prefix + '.json') as f:
+        index = json.load(f)
+    return np.load(prefix + '.npy', mmap_mode='r'), index
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="LSTM", help="Model type providing the flow forecasts.")
+    parser.add_argument("--times", nargs="+", required=True, help="Departure times (YYYY-MM-DD HH:MM).")
+    parser.add_argument("--origins", default=None, help="Comma separated origin sites (default: all).")
+    parser.add_argument("--destinations", default=None, help="Comma separated destination sites (default: all).")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes.")
+    parser.add_argument("--output", default=os.path.join(OD_DIR, "od_matrix"),
+                        help="Output prefix for the .npy and .json files.")
+    args = parser.parse_args(argv[1:])
+
+    model_type = args.model.upper()
+    departure_times = [datetime.strptime(t, "%Y-%m-%d %H:%M") for t in args.times]
+    origins = args.origins.split(',') if args.origins else pathfinder.site_ids
+    destinations = args.destinations.split(',') if args.destinations else pathfinder.site_ids
+    unknown = [site for site in origins + destinations if site not in pathfinder.site_index]
+    if unknown:
+        parser.error(f"Unknown SCATS sites: {', '.join(sorted(set(unknown)))}")
+
+    t0 = time.perf_counter()
+    matrix = compute_od_matrix(origins, destinations, departure_times, model_type, args.jobs)
+    save_od_matrix(args.output, matrix, origins, destinations, departure_times, model_type)
+    print(f"Wrote {matrix.shape} travel-time matrix to {args.output}.npy in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
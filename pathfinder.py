@@ -1,37 +1,63 @@
-import heapq
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime, timedelta
 from functools import lru_cache
-from predict import load_neighbors, predict_traffic_flow, load_model_for_site
-from distance import load_intersection_data, calculate_intersection_distance
+from graph import get_road_graph
+from forecast_table import get_forecast_table, save_forecast_tables, forecast_tables, table_key
+from k_shortest import k_shortest_routes, lower_bound_tree
+from route_cache import RouteCache, ROUTE_CACHE_PATH
 
 # Global variables
-neighbors = load_neighbors()
-intersection_data = load_intersection_data("neighbouring_intersections.csv")
-precomputed_distances = {}
-models = {}
+road_graph = get_road_graph()
+neighbors = road_graph.to_neighbors()
 global_model_type = ""
+all_sites = set(road_graph.index)
 
-@lru_cache(maxsize=1000000)
-def get_distance(site1, site2):
-    key = (min(site1, site2), max(site1, site2))
-    if key not in precomputed_distances:
-        precomputed_distances[key] = calculate_intersection_distance(site1, site2, intersection_data)
-    return precomputed_distances[key]
+# Integer node ids for the search: labels and loop checks work on indices, not strings
+site_ids = road_graph.ids.tolist()
+site_index = road_graph.index
+neighbor_index = road_graph.adjacency_lists()
+edge_length_index = [dict(zip(node_neighbors, road_graph.edge_lengths(node).tolist()))
+                     for node, node_neighbors in enumerate(neighbor_index)]
+reverse_neighbor_index = road_graph.reverse().adjacency_lists()
 
-def load_all_models(model_type: str):
-    global models, global_model_type
-    global_model_type = model_type
-    all_sites = set(neighbors.keys()) | set(site for sublist in neighbors.values() for site in sublist)
-    for site in all_sites:
-        if site not in models:
-            models[site] = load_model_for_site(site, model_type)
+MAX_SPEED = 60  # km/hr, the highest speed calculate_speed returns
+DEFAULT_FLOW = 20  # vehicles/5min, used when no prediction is available
+
+# Counters of the most recent k_shortest_paths search
+route_stats = {'expanded': 0, 'spur_searches': 0, 'reused': 0}
+# Results of earlier queries, per (origin, destination, 15-minute slot, model type)
+route_cache = RouteCache(path=ROUTE_CACHE_PATH)
+
+class RouteCancelled(Exception):
+    """Raised by a progress callback to abandon the search in flight."""
+
+def get_distance(site1, site2):
+    # Road segments use the edge lengths stored with the graph; other pairs the straight-line distance
+    a, b = site_index.get(site1), site_index.get(site2)
+    if a is None or b is None:
+        return 0.0
+    length = edge_length_index[a].get(b)
+    return length if length is not None else road_graph.distance(a, b)
+
+def get_flow_prediction(site: str, current_time: datetime):
+    # Forecast tables are per day, so routes crossing midnight pick up the next day's table.
+    # Rows are filled lazily, so models are only loaded for sites the search expands.
+    table = forecast_tables.get(table_key(current_time.date(), global_model_type))
+    if table is None:
+        table = get_forecast_table(all_sites, current_time.date(), global_model_type, lazy=True)
+    return table.lookup(site, current_time)
+
+@lru_cache(maxsize=None)
+def free_flow_bounds(end: str) -> List[float]:
+    # Fastest possible minutes from every node to end along the road graph, at the top speed
+    return lower_bound_tree(site_index[end], reverse_neighbor_index,
+                            lambda u, v: edge_length_index[u][v] / MAX_SPEED * 60)
 
 def calculate_speed(traffic_flow, is_peak_hour):
     # Constants
     CAPACITY_FLOW = 250   # vehicles/5min (3000 vehicles/hour)
     CAPACITY_SPEED = 35   # km/hr
-    SPEED_LIMIT = 60 if not is_peak_hour else 50  # km/hr
+    SPEED_LIMIT = MAX_SPEED if not is_peak_hour else 50  # km/hr
     FLOW_AT_SPEED_LIMIT = 60  # vehicles/5min (720 vehicles/hour)
     MIN_SPEED = 25        # km/hr
 
@@ -51,65 +77,83 @@ def calculate_speed(traffic_flow, is_peak_hour):
         speed_decrease = min(20, over_capacity / 10)  # Max 20 km/h decrease for very high traffic
         return max(MIN_SPEED, CAPACITY_SPEED - speed_decrease)
 
-def find_multiple_paths(start: str, end: str, start_time: datetime, num_paths: int = 5) -> List[Tuple[float, float, List[str], float]]:
-    heap = [(0, 0, [start], start_time, 0)]  # (estimated_time, distance, path, current_time, total_flow)
-    paths = []
-    visited = {}
-
-    while heap and len(paths) < num_paths:
-        (estimated_time, current_distance, path, current_time, total_flow) = heapq.heappop(heap)
-        current = path[-1]
-
-        if current == end:
-            avg_traffic = total_flow / len(path) if len(path) > 0 else 0
-            paths.append((estimated_time, current_distance, path, avg_traffic))
-            continue
+def node_conditions(node: int, current_time: datetime) -> Tuple[float, float]:
+    # Predicted flow at a node and the speed it allows when leaving at current_time
+    flow_prediction = get_flow_prediction(site_ids[node], current_time)
+    if flow_prediction is None:
+        flow_prediction = DEFAULT_FLOW
+    is_peak_hour = 7 <= current_time.hour <= 9 or 16 <= current_time.hour <= 18
+    return flow_prediction, calculate_speed(flow_prediction, is_peak_hour)
+
+def departure_edge_time(start_time: datetime):
+    # Minutes to drive node -> neighbor when reaching node `elapsed` minutes after start_time
+    def edge_time(node, neighbor, elapsed):
+        _, speed = node_conditions(node, start_time + timedelta(minutes=elapsed))
+        return edge_length_index[node][neighbor] / speed * 60
+    return edge_time
+
+def k_shortest_paths(start: str, end: str, start_time: datetime, num_paths: int = 5,
+                     progress: Optional[Callable[[], None]] = None) -> List[Tuple[float, float, List[str], float]]:
+    # The num_paths fastest loopless routes (Yen's algorithm) as (minutes, km, sites, mean flow) tuples.
+    # progress is called before every edge evaluation; it may raise RouteCancelled to stop the search.
+    if start not in site_index or end not in site_index:
+        route_stats.update(expanded=0, spur_searches=0, reused=0)
+        return []
+
+    edge_time = departure_edge_time(start_time)
+    if progress is not None:
+        timed_edge = edge_time
+
+        def edge_time(node, neighbor, elapsed):
+            progress()
+            return timed_edge(node, neighbor, elapsed)
+
+    routes = k_shortest_routes(site_index[start], site_index[end], num_paths, neighbor_index,
+                               edge_time, free_flow_bounds(end), route_stats)
 
-        visit_key = (current, current_time.strftime("%Y-%m-%d %H:%M"))  # Round to nearest minute
-        if visit_key in visited and visited[visit_key] <= estimated_time:
-            continue
-        visited[visit_key] = estimated_time
-
-        predictions = predict_traffic_flow([current], current_time, global_model_type)
-        if predictions and predictions[0][0] is not None:
-            flow_prediction = predictions[0][0]
-        else:
-            flow_prediction = 20  # Default value if prediction fails
-
-        is_peak_hour = 7 <= current_time.hour <= 9 or 16 <= current_time.hour <= 18
-
-        for neighbor in neighbors.get(current, []):
-            if neighbor in path:
-                continue
-
-            segment_distance = get_distance(current, neighbor)
-            speed = calculate_speed(flow_prediction, is_peak_hour)
-            segment_time = (segment_distance / speed) * 60  # time in minutes
-
-            new_estimated_time = estimated_time + segment_time
-            new_distance = current_distance + segment_distance
-            new_current_time = current_time + timedelta(minutes=segment_time)
-            new_total_flow = total_flow + flow_prediction
-
-            heapq.heappush(heap, (new_estimated_time, new_distance, path + [neighbor], new_current_time, new_total_flow))
-
-    return sorted(paths, key=lambda x: x[0])[:num_paths]  # Sort by estimated time and return top num_paths
-
-def pathfinder(start: str, end: str, start_time: datetime, model_type: str) -> List[Tuple[float, float, List[str], float]]:
+    paths = []
+    for nodes, times in routes:
+        path = [site_ids[node] for node in nodes]
+        total_distance = sum(edge_length_index[a][b] for a, b in zip(nodes, nodes[1:]))
+        total_flow = sum(node_conditions(node, start_time + timedelta(minutes=elapsed))[0]
+                         for node, elapsed in zip(nodes[:-1], times[:-1]))
+        paths.append((times[-1], total_distance, path, total_flow / len(path)))
+    return paths
+
+def pathfinder(start: str, end: str, start_time: datetime, model_type: str, rebuild_forecast: bool = False,
+               progress: Optional[Callable[[], None]] = None) -> List[Tuple[float, float, List[str], float]]:
     global global_model_type
     global_model_type = model_type
-    load_all_models(model_type)
-    return find_multiple_paths(start, end, start_time)
+    if not rebuild_forecast:
+        paths = route_cache.get(start, end, start_time, model_type)
+        if paths is not None:
+            return paths
+
+    if rebuild_forecast:
+        get_forecast_table(all_sites, start_time.date(), model_type, rebuild=True, lazy=True)
+    try:
+        paths = k_shortest_paths(start, end, start_time, progress=progress)
+    finally:
+        # Rows predicted before a cancellation are kept
+        save_forecast_tables()
+    route_cache.put(start, end, start_time, model_type, paths)
+    route_cache.save()
+    return paths
 
 if __name__ == "__main__":
     start = input("Enter starting SCATS site number: ")
     end = input("Enter ending SCATS site number: ")
     model_type = input("Enter model type (LSTM, GRU, SAEs, SAEs_Fixed, or RNN): ").upper()
     date_time_str = input("Enter date and time (YYYY-MM-DD HH:MM), or press Enter for current date and time: ")
+    rebuild_forecast = input("Rebuild the forecast table for this day? (y/N): ").strip().lower() == "y"
+    replay = input("Use the SCATS flows observed before this time as model inputs? (y/N): ").strip().lower() == "y"
 
     start_time = datetime.now() if not date_time_str.strip() else datetime.strptime(date_time_str, "%Y-%m-%d %H:%M")
+    if replay:
+        from flow_buffer import replay_flow_history
+        replay_flow_history(start_time)
 
-    efficient_paths = pathfinder(start, end, start_time, model_type)
+    efficient_paths = pathfinder(start, end, start_time, model_type, rebuild_forecast)
 
     print(f"\nTop {len(efficient_paths)} most time-efficient routes from {start} to {end} at {start_time}:")
     for i, (estimated_time, total_distance, path, avg_traffic) in enumerate(efficient_paths, 1):
@@ -120,5 +164,7 @@ if __name__ == "__main__":
         print(f"   Path: {' -> '.join(path)}")
         print()
 
+    print(f"Search expanded {route_stats['expanded']} nodes in {route_stats['spur_searches']} spur searches "
+          f"({route_stats['reused']} reused), route cache: {route_cache.stats()}")
     if len(efficient_paths) < 5:
         print(f"Note: Only {len(efficient_paths)} unique paths were found.")
\ No newline at end of file
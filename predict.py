@@ -1,23 +1,27 @@
+import os
 import numpy as np
-import pandas as pd
-from keras.models import load_model
 from datetime import datetime, timedelta
 from functools import lru_cache
-import os
+from collections import OrderedDict
+from model_registry import ModelRegistry
+from global_model import SiteModel
+from scaler_store import get_scaler_range, get_scaler_ranges
+from graph import get_road_graph
 
 # Global variables
-model_cache = {}
+model_registry = ModelRegistry()
 neighbors = None
+flow_history = None  # FlowRingBuffer of recent observed flows, see flow_buffer.py
+
+RECURRENT_MODELS = ['LSTM', 'GRU', 'RNN']
+SLOT_MINUTES = 15  # SCATS volumes are recorded in 15-minute bins
+HISTORY_TIME_FEATURES = 6  # Calendar features appended to the flow window for SAES
 
 
 def load_neighbors():
     global neighbors
     if neighbors is None:
-        df = pd.read_csv('neighbouring_intersections.csv')
-        neighbors = {}
-        for _, row in df.iterrows():
-            scats = str(row['Scats_number'])
-            neighbors[scats] = row['Neighbours'].split(';')
+        neighbors = get_road_graph().to_neighbors()
     return neighbors
 
 
@@ -38,23 +42,10 @@ def find_path(start, end, neighbors):
 
 
 def load_model_for_site(site, model_type):
-    global model_cache
-    key = f"{model_type.lower()}_{site}"
-    if key not in model_cache:
-        # model_path = f'model/sites_models/{key}.h5'
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, 'model', 'sites_models', f'{model_type}_{site}.h5')
-        try:
-            model = load_model(model_path)
-            print(f"Loaded {model_type} model for site {site}")
-            model_cache[key] = model
-        except:
-            print(f"No {model_type} model found for site {site}")
-            model_cache[key] = None
-    return model_cache[key]
+    return model_registry.get(site, model_type)
 
 
-def prepare_input_data(date_time, input_shape, model_type):
+def prepare_input_data(date_time, input_shape, model_type, site=None):
     base_features = [
         date_time.hour / 23.0,
         date_time.minute / 59.0,
@@ -64,16 +55,109 @@ def prepare_input_data(date_time, input_shape, model_type):
         (date_time.month - 1) / 11.0
     ]
 
-    if model_type in ['LSTM', 'GRU', 'RNN']:
+    if model_type in RECURRENT_MODELS:
         data = [base_features[:input_shape[1]]] * input_shape[0]
-        return np.array(data).reshape((1,) + input_shape)
+        inputs = np.array(data).reshape((1,) + input_shape)
     elif model_type in ['SAES', 'SAES_FIXED']:
         features = base_features + [0.5] * 12  # Placeholder for recent traffic data
-        return np.array(features).reshape(1, 18)
+        inputs = np.array(features).reshape(1, 18)
+    else:
+        return None
+
+    if site is not None:
+        inputs = apply_flow_history(inputs, [site], [date_time], input_shape, model_type)
+    return inputs
+
+
+def prepare_input_batch(date_times, input_shape, model_type, site=None):
+    """Stack the inputs of ``prepare_input_data`` for many timestamps into one tensor."""
+    base_features = np.array([
+        [
+            date_time.hour / 23.0,
+            date_time.minute / 59.0,
+            date_time.weekday() / 6.0,
+            int(date_time.weekday() < 5),
+            date_time.day / 31.0,
+            (date_time.month - 1) / 11.0
+        ]
+        for date_time in date_times
+    ])
+
+    if model_type in RECURRENT_MODELS:
+        features = base_features[:, None, :input_shape[1]]
+        inputs = np.repeat(features, input_shape[0], axis=1)
+    elif model_type in ['SAES', 'SAES_FIXED']:
+        placeholder = np.full((len(base_features), 12), 0.5)  # Placeholder for recent traffic data
+        inputs = np.concatenate((base_features, placeholder), axis=1)
+    else:
+        return None
+
+    if site is not None:
+        inputs = apply_flow_history(inputs, [site] * len(date_times), date_times, input_shape, model_type)
+    return inputs
+
+
+def history_lags(input_shape, model_type):
+    """Number of recent flows a model takes as input, or None if its input is not a flow window."""
+    if model_type in RECURRENT_MODELS:
+        return input_shape[0] if input_shape[1] == 1 else None
+    return input_shape - HISTORY_TIME_FEATURES if input_shape > HISTORY_TIME_FEATURES else None
+
+
+def history_inputs(sites, date_times, input_shape, model_type):
+    """Model inputs built from the recent flows before each timestamp, laid out as in training.
+
+    Flows are scaled with each site's training scaler. Rows whose window is
+    not fully held by ``flow_history`` are NaN.
+    """
+    lags = history_lags(input_shape, model_type)
+    end_times = [date_time - timedelta(minutes=flow_history.slot_minutes) for date_time in date_times]
+    windows = flow_history.gather(sites, end_times, lags).astype(np.float64)
+
+    data_min, data_max = get_scaler_ranges(sites, model_type)
+    data_range = np.where(data_max > data_min, data_max - data_min, 1.0)
+    scaled = (windows - data_min[:, None]) / data_range[:, None]
+    if model_type in RECURRENT_MODELS:
+        return scaled[:, :, None]
+
+    hours = np.array([date_time.hour for date_time in date_times])
+    days = np.array([date_time.weekday() for date_time in date_times])
+    time = np.column_stack([
+        hours,
+        days,
+        [date_time.month for date_time in date_times],
+        (days >= 5).astype(int),
+        np.sin(2 * np.pi * hours / 24),
+        np.cos(2 * np.pi * hours / 24)
+    ])
+    return np.concatenate((scaled, time), axis=1)
+
+
+def apply_flow_history(inputs, sites, date_times, input_shape, model_type):
+    """Replace placeholder rows of ``inputs`` with real flow windows wherever the history covers them."""
+    if flow_history is None or history_lags(input_shape, model_type) is None:
+        return inputs
+    live = history_inputs(sites, date_times, input_shape, model_type)
+    complete = ~np.isnan(live.reshape(len(live), -1)).any(axis=1)
+    inputs[complete] = live[complete]
+    return inputs
+
+
+def history_tag():
+    """Label of the flows feeding model inputs, for cache keys.
+
+    '' for placeholder inputs, the replay name while a replayed buffer is
+    unchanged, otherwise a label of this process that changes with every write.
+    """
+    if flow_history is None:
+        return ''
+    if flow_history.tag is not None:
+        return flow_history.tag
+    return f"live{os.getpid()}-{id(flow_history)}-{flow_history.version}"
 
 
 def denormalize_prediction(prediction, min_value=0, max_value=500):
-    return int(round(min_value + prediction * (max_value - min_value)))
+    return int(round(min_value + float(prediction) * (max_value - min_value)))
 
 
 def interpret_traffic_flow(value):
@@ -89,14 +173,23 @@ def interpret_traffic_flow(value):
         return "Very high traffic"
 
 
+TIME_FACTORS = {
+    0: 0.6, 1: 0.5, 2: 0.4, 3: 0.4, 4: 0.5, 5: 0.7,  # Early morning
+    6: 0.9, 7: 1.4, 8: 1.5, 9: 1.3,  # Morning rush
+    10: 1.1, 11: 1.1, 12: 1.2, 13: 1.2, 14: 1.1,  # Midday
+    15: 1.2, 16: 1.5, 17: 1.6, 18: 1.4,  # Evening rush
+    19: 1.2, 20: 1.0, 21: 0.9, 22: 0.8, 23: 0.7  # Night
+}
+
+# Hour-indexed factor tables for the batched path: row 0 weekend, row 1 weekday
+TIME_FACTOR_TABLE = np.array([
+    [max(0.6, TIME_FACTORS[h] * 0.8) for h in range(24)],
+    [TIME_FACTORS[h] for h in range(24)]
+])
+
+
 def apply_time_adjustment(prediction, hour, is_weekday):
-    time_factors = {
-        0: 0.6, 1: 0.5, 2: 0.4, 3: 0.4, 4: 0.5, 5: 0.7,  # Early morning
-        6: 0.9, 7: 1.4, 8: 1.5, 9: 1.3,  # Morning rush
-        10: 1.1, 11: 1.1, 12: 1.2, 13: 1.2, 14: 1.1,  # Midday
-        15: 1.2, 16: 1.5, 17: 1.6, 18: 1.4,  # Evening rush
-        19: 1.2, 20: 1.0, 21: 0.9, 22: 0.8, 23: 0.7  # Night
-    }
+    time_factors = TIME_FACTORS
 
     if not is_weekday:
         time_factors = {h: max(0.6, f * 0.8) for h, f in time_factors.items()}
@@ -104,28 +197,32 @@ def apply_time_adjustment(prediction, hour, is_weekday):
     return prediction * time_factors.get(hour, 1.0)
 
 
+def get_input_shape(model, model_type):
+    if model_type in RECURRENT_MODELS:
+        return model.input_shape[1:]
+    return model.input_shape[1]  # SAES
+
+
 @lru_cache(maxsize=10000)
 def cached_predict(site, date_time, model_type):
     model = load_model_for_site(site, model_type)
     if model:
-        if model_type in ['LSTM', 'GRU', 'RNN']:
-            input_shape = model.input_shape[1:]
-        else:  # SAES
-            input_shape = model.input_shape[1]
+        input_shape = get_input_shape(model, model_type)
 
-        input_data = prepare_input_data(date_time, input_shape, model_type)
+        input_data = prepare_input_data(date_time, input_shape, model_type, site)
         try:
             prediction = model.predict(input_data)
 
             # Model-specific processing
-            if model_type in ['LSTM', 'GRU', 'RNN']:
+            if model_type in RECURRENT_MODELS:
                 # LSTM and GRU might output a sequence, take the last value
                 prediction = prediction[0][-1] if len(prediction[0]) > 1 else prediction[0][0]
             else:  # SAES and SAES_FIXED
                 prediction = prediction[0][0]
 
-            # Denormalize prediction
-            denormalized_prediction = denormalize_prediction(prediction, 0, 500)
+            # Denormalize prediction with the scaler the site model was trained with
+            min_value, max_value = get_scaler_range(site, model_type)
+            denormalized_prediction = denormalize_prediction(prediction, min_value, max_value)
 
             # Apply time adjustment
             is_weekday = date_time.weekday() < 5
@@ -140,8 +237,160 @@ def cached_predict(site, date_time, model_type):
     return None, None
 
 
+def extract_predictions(raw_predictions, model_type):
+    """Pick the scalar prediction out of each row of a batched ``model.predict`` output."""
+    if model_type in RECURRENT_MODELS:
+        return raw_predictions.reshape(len(raw_predictions), -1)[:, -1]
+    return raw_predictions.reshape(len(raw_predictions), -1)[:, 0]  # SAES and SAES_FIXED
+
+
+def postprocess_batch(values, date_times, min_value=0, max_value=500):
+    """Vectorized denormalize -> time adjustment -> clamp, matching ``cached_predict``.
+
+    ``min_value`` and ``max_value`` may be per-row arrays when the batch spans several sites.
+    """
+    denormalized = np.round(min_value + values.astype(np.float64) * (max_value - min_value))
+    hours = np.array([date_time.hour for date_time in date_times])
+    is_weekday = np.array([date_time.weekday() < 5 for date_time in date_times], dtype=int)
+    adjusted = denormalized * TIME_FACTOR_TABLE[is_weekday, hours]
+    return np.clip(adjusted, 0, 500).astype(int)
+
+
+class BatchInferenceEngine:
+    """Collects pending (site, date_time, model_type) requests and runs one predict per site model.
+
+    Requests are grouped by model type and site; since every site has its own
+    network, all timestamps queued for that site-model are stacked into a
+    single input tensor and evaluated in one ``model.predict`` call. Sites
+    served by a global model (TFPS_MODEL_MODE=global) share one call.
+    """
+
+    def __init__(self, max_cached=10000):
+        self.pending = OrderedDict()
+        self.results = OrderedDict()
+        self.max_cached = max_cached
+        self.predict_calls = 0
+        self.history = history_tag()  # Flow history the cached results were predicted from
+
+    def submit(self, site, date_time, model_type):
+        key = (site, date_time, model_type)
+        if key not in self.results:
+            self.pending[key] = None
+        return key
+
+    def run(self):
+        groups = OrderedDict()
+        for site, date_time, model_type in self.pending:
+            groups.setdefault((model_type, site), []).append(date_time)
+        self.pending.clear()
+
+        # One predict per site model (one for all sites served by a global model),
+        # then one vectorized inverse transform per model type
+        predicted = OrderedDict()
+        shared_groups = OrderedDict()
+        for (model_type, site), date_times in groups.items():
+            model = load_model_for_site(site, model_type)
+            if isinstance(model, SiteModel):
+                shared_groups.setdefault((model_type, id(model.shared)), []).append((site, date_times, model))
+                continue
+            values, input_shape = self._predict_group(model, site, date_times, model_type)
+            if values is None:
+                for date_time in date_times:
+                    self.results[(site, date_time, model_type)] = (None, None)
+            else:
+                predicted.setdefault(model_type, []).append((site, date_times, values, input_shape))
+
+        for (model_type, _), members in shared_groups.items():
+            site_groups = self._predict_shared(members, model_type)
+            if site_groups is None:
+                for site, date_times, _ in members:
+                    for date_time in date_times:
+                        self.results[(site, date_time, model_type)] = (None, None)
+            else:
+                predicted.setdefault(model_type, []).extend(site_groups)
+
+        for model_type, site_groups in predicted.items():
+            counts = [len(date_times) for _, date_times, _, _ in site_groups]
+            min_values, max_values = get_scaler_ranges([site for site, _, _, _ in site_groups], model_type)
+            min_values, max_values = np.repeat(min_values, counts), np.repeat(max_values, counts)
+            all_date_times = [date_time for _, date_times, _, _ in site_groups for date_time in date_times]
+            values = np.concatenate([values for _, _, values, _ in site_groups])
+            predictions = iter(postprocess_batch(values, all_date_times, min_values, max_values))
+            for site, date_times, _, input_shape in site_groups:
+                for date_time in date_times:
+                    self.results[(site, date_time, model_type)] = (int(next(predictions)), input_shape)
+
+    def _predict_group(self, model, site, date_times, model_type):
+        if model:
+            input_shape = get_input_shape(model, model_type)
+            input_data = prepare_input_batch(date_times, input_shape, model_type, site)
+            try:
+                raw_predictions = model.predict(input_data, batch_size=len(date_times))
+                self.predict_calls += 1
+                return extract_predictions(raw_predictions, model_type), input_shape
+            except Exception as e:
+                print(f"Error predicting for site {site}: {str(e)}")
+        return None, None
+
+    def _predict_shared(self, members, model_type):
+        """One forward pass of a global model over every (site, date_times, SiteModel) in ``members``."""
+        shared = members[0][2].shared
+        input_shape = get_input_shape(shared, model_type)
+        inputs = [prepare_input_batch(date_times, input_shape, model_type, site) for site, date_times, _ in members]
+        site_ids = np.concatenate([np.full(len(date_times), model.site_id) for _, date_times, model in members])
+        try:
+            raw_predictions = shared.predict_sites(np.concatenate(inputs), site_ids)
+            self.predict_calls += 1
+        except Exception as e:
+            print(f"Error predicting with the global {model_type} model: {str(e)}")
+            return None
+        values = extract_predictions(raw_predictions, model_type)
+        bounds = np.cumsum([0] + [len(date_times) for _, date_times, _ in members])
+        return [(site, date_times, values[bounds[i]:bounds[i + 1]], input_shape)
+                for i, (site, date_times, _) in enumerate(members)]
+
+    def predict(self, requests):
+        """Run every (site, date_time, model_type) request and return ``(prediction, input_shape, site)`` tuples."""
+        if self.history != history_tag():
+            # Observed flows were installed or pushed since these results were predicted
+            self.results.clear()
+            cached_predict.cache_clear()
+            self.history = history_tag()
+        keys = [self.submit(*request) for request in requests]
+        if self.pending:
+            self.run()
+        predictions = [self.results[key] + (key[0],) for key in keys]
+
+        while len(self.results) > self.max_cached:
+            self.results.popitem(last=False)
+        return predictions
+
+
+batch_engine = BatchInferenceEngine()
+
+
+def set_flow_history(buffer):
+    """Feed model inputs from ``buffer`` (a FlowRingBuffer, or None for placeholder inputs).
+
+    Cached predictions and forecast tables are keyed by ``history_tag``, so
+    installing a buffer or pushing flows into it makes them predict again.
+    """
+    global flow_history
+    flow_history = buffer
+    cached_predict.cache_clear()
+    batch_engine.results.clear()
+    batch_engine.history = history_tag()
+
+
+def predict_batch(sites, date_times, model_type):
+    """Predict every site at every timestamp, returning a dict keyed by (site, date_time)."""
+    requests = [(site, date_time, model_type) for site in sites for date_time in date_times]
+    predictions = batch_engine.predict(requests)
+    return {(site, date_time): prediction for (site, date_time, _), prediction in zip(requests, predictions)}
+
+
 def predict_traffic_flow(path, date_time, model_type):
-    return [cached_predict(site, date_time, model_type) + (site,) for site in path]
+    return batch_engine.predict([(site, date_time, model_type) for site in path])
 
 
 def traffic_flow_prediction():
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from predict import SLOT_MINUTES, history_tag
+from model_registry import get_model_path, MODEL_BACKEND, MODEL_MODE
+from global_model import get_global_model_path, get_global_meta_path
+from model.archive import get_archive_paths
+from scaler_store import get_scaler_path
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+ROUTE_CACHE_PATH = os.path.join(base_dir, 'model', 'route_cache.json')
+
+ROUTE_CACHE_SIZE = 1024  # Cached (origin, destination, slot, model) queries
+ROUTE_CACHE_TTL = 3600  # Seconds a cached result is served for
+
+
+def artifact_signature(sites, model_type):
+    """Modification times of the model, scaler and archive files behind each site's predictions (None if missing)."""
+    signature = {}
+    for site in sites:
+        mtimes = []
+        paths = [get_model_path(site, model_type), get_scaler_path(site, model_type), get_archive_paths(model_type)[0]]
+        if MODEL_MODE == 'global':
+            paths += [get_global_model_path(model_type, MODEL_BACKEND), get_global_meta_path(model_type)]
+        for path in paths:
+            mtimes.append(os.path.getmtime(path) if os.path.exists(path) else None)
+        signature[site] = mtimes
+    return signature
+
+
+class RouteCache:
+    """LRU cache of route search results keyed by (origin, destination, time slot, model type,
+    model backend, serving mode).
+
+    ``start_time`` is bucketed down to the forecast resolution, so queries in
+    the same slot share one entry. Entries expire after ``ttl`` seconds and
+    are dropped as soon as the model or scaler of any site on the cached
+    routes changes on disk. With a ``path`` the cache is saved as JSON and
+    reloaded on start, so warm restarts keep it.
+    """
+
+    def __init__(self, max_entries=ROUTE_CACHE_SIZE, ttl=ROUTE_CACHE_TTL, path=None, slot_minutes=SLOT_MINUTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.slot_minutes = slot_minutes
+        self.entries = OrderedDict()  # key -> (created, signature, paths)
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def key(self, start, end, start_time, model_type):
+        minute_of_day = start_time.hour * 60 + start_time.minute
+        slot_start = datetime.combine(start_time.date(), datetime.min.time()) + \
+            timedelta(minutes=minute_of_day - minute_of_day % self.slot_minutes)
+        # Backends and serving modes load different models, so their routes never share an entry
+        key = f"{model_type.upper()}|{MODEL_BACKEND}|{MODEL_MODE}|{start}|{end}|{slot_start:%Y-%m-%d %H:%M}"
+        # Routes predicted from observed flows are kept apart from placeholder-input routes
+        return f"{key}|{history_tag()}" if history_tag() else key
+
+    def get(self, start, end, start_time, model_type):
+        key = self.key(start, end, start_time, model_type)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        created, signature, paths = entry
+        if time.time() - created > self.ttl:
+            self.expired += 1
+        elif artifact_signature(signature, model_type) != signature:
+            self.invalidated += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return [tuple(path) for path in paths]
+
+        del self.entries[key]
+        self.dirty = True
+        self.misses += 1
+        return None
+
+    def put(self, start, end, start_time, model_type, paths):
+        key = self.key(start, end, start_time, model_type)
+        sites = sorted(set(site for path in paths for site in path[2]))
+        self.entries[key] = (time.time(), artifact_signature(sites, model_type), [list(path) for path in paths])
+        self.entries.move_to_end(key)
+        self.dirty = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.dirty = True
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump([[key] + list(entry) for key, entry in self.entries.items()], f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            print(f"Ignoring unreadable route cache {self.path}: {str(e)}")
+            return
+        for key, created, signature, paths in stored[-self.max_entries:]:
+            self.entries[key] = (created, signature, paths)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'invalidated': self.invalidated,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+        }
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from data.store import load_split, store_files
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SITES_MODELS_DIR = os.path.join(base_dir, 'model', 'sites_models')
+
+# Range assumed for sites trained before scalers were saved
+DEFAULT_RANGE = (0.0, 500.0)
+
+# Loaded (data_min, data_max) per (model_type, site); None when no scaler was saved
+scaler_params = {}
+
+
+def get_scaler_path(site, model_type):
+    return os.path.join(SITES_MODELS_DIR, f'{model_type.lower()}_{site}_scaler.json')
+
+
+def save_scaler(scaler, path):
+    """Save the parameters of a fitted MinMaxScaler next to its model."""
+    params = {
+        'data_min': float(scaler.data_min_[0]),
+        'data_max': float(scaler.data_max_[0]),
+        'feature_range': list(scaler.feature_range),
+    }
+    with open(path, 'w') as f:
+        json.dump(params, f)
+
+
+def load_scaler_params(site, model_type):
+    """Return the (data_min, data_max) a site model was trained with, or None."""
+    key = (model_type.lower(), site)
+    if key not in scaler_params:
+        path = get_scaler_path(site, model_type)
+        if os.path.exists(path):
+            with open(path) as f:
+                params = json.load(f)
+            scaler_params[key] = (params['data_min'], params['data_max'])
+        else:
+            scaler_params[key] = None
+    return scaler_params[key]
+
+
+def set_scaler_params(site, model_type, data_min, data_max):
+    """Use (data_min, data_max) for a site, e.g. the ranges a global model was trained with."""
+    scaler_params[(model_type.lower(), site)] = (data_min, data_max)
+
+
+def get_scaler_range(site, model_type):
+    params = load_scaler_params(site, model_type)
+    return params if params is not None else DEFAULT_RANGE
+
+
+def get_scaler_ranges(sites, model_type):
+    """Per-site minimum and maximum arrays for a batch of sites."""
+    ranges = np.array([get_scaler_range(site, model_type) for site in sites], dtype=np.float64).reshape(-1, 2)
+    return ranges[:, 0], ranges[:, 1]
+
+
+def inverse_transform(values, sites, model_type):
+    """Map scaled predictions back to vehicle counts, one site per element of ``values``."""
+    data_min, data_max = get_scaler_ranges(sites, model_type)
+    return data_min + np.asarray(values, dtype=np.float64) * (data_max - data_min)
+
+
+def backfill_scalers(data_dir, model_types=None):
+    """Write scaler files for existing models by recomputing the training split's flow range."""
+    written = 0
+    for f in sorted(os.listdir(SITES_MODELS_DIR)):
+        if not f.endswith('.h5'):
+            continue
+        model_type, site = f[:-len('.h5')].rsplit('_', 1)
+        if model_types and model_type not in model_types:
+            continue
+        path = get_scaler_path(site, model_type)
+        if os.path.exists(path):
+            continue
+        train_path = os.path.join(data_dir, f'{site}_train')
+        if not os.path.exists(store_files(train_path)[1]):
+            train_path += '.csv'
+            if not os.path.exists(train_path):
+                continue
+
+        _, flows = load_split(train_path)
+        with open(path, 'w') as out:
+            json.dump({'data_min': float(np.min(flows)), 'data_max': float(np.max(flows)), 'feature_range': [0, 1]}, out)
+        written += 1
+    print(f"Wrote {written} scaler files to {SITES_MODELS_DIR}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, 'data', 'splitted_data'),
+                        help="Directory of per-site splits (CSV or binary store).")
+    parser.add_argument("--models", nargs="*", default=None, help="Model types to backfill (default: all).")
+    args = parser.parse_args(argv[1:])
+    backfill_scalers(args.data_dir, [m.lower() for m in args.models] if args.models else None)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
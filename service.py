@@ -0,0 +1,343 @@
+"""
+Local HTTP service for traffic flow predictions and route queries.
+
+    GET/POST /predict  sites=970,2000  times=2006-10-02 08:00  model=LSTM
+    GET/POST /route    origin=970  destination=3685  departure=2006-10-02 08:00  model=LSTM
+    GET      /stats
+
+GET takes query parameters; POST takes the same fields as a JSON object
+(``sites``/``times`` may be lists). Models, scalers and the road graph are
+loaded once per process. Prediction requests for the same (site, time slot,
+model) arriving within a short window are merged, and everything queued in
+that window runs through one batched inference call per site model. Identical
+route queries in flight share one search.
+
+Run from the repository root:
+    python service.py --port 8765
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import pathfinder
+from predict import batch_engine, model_registry, load_model_for_site, SLOT_MINUTES
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+COALESCE_SECONDS = 0.005  # How long a prediction request waits for others to join its batch
+MAX_BATCH = 4096  # Pending predictions that trigger an immediate flush
+MAX_BODY_BYTES = 1 << 20
+MODEL_TYPES = ['LSTM', 'GRU', 'SAES', 'SAES_FIXED', 'RNN']
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def slot_start(date_time):
+    """``date_time`` rounded down to the start of its forecast slot."""
+    minute_of_day = date_time.hour * 60 + date_time.minute
+    return datetime.combine(date_time.date(), datetime.min.time()) + \
+        timedelta(minutes=minute_of_day - minute_of_day % SLOT_MINUTES)
+
+
+class PredictionCoalescer:
+    """Merges concurrent prediction requests into batched inference calls.
+
+    Every (site, slot, model) key gets one future. Requests for a key that is
+    already pending or running wait on the existing future; new keys are
+    queued and flushed together ``window`` seconds after the first one (or
+    at ``max_batch``). A flush hands the whole queue to the batch inference
+    engine on the single inference thread, which runs one predict per site model.
+    """
+
+    def __init__(self, loop, executor, window=COALESCE_SECONDS, max_batch=MAX_BATCH):
+        self.loop = loop
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = OrderedDict()  # key -> future, waiting for the next flush
+        self.in_flight = {}  # key -> future, inside a running batch
+        self.flush_handle = None
+        self.requested = 0
+        self.merged = 0
+        self.batches = 0
+
+    def future(self, key):
+        self.requested += 1
+        future = self.pending.get(key) or self.in_flight.get(key)
+        if future is not None:
+            self.merged += 1
+            return future
+
+        future = self.loop.create_future()
+        self.pending[key] = future
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, OrderedDict()
+        self.in_flight.update(batch)
+        self.batches += 1
+        asyncio.ensure_future(self.run_batch(batch), loop=self.loop)
+
+    async def run_batch(self, batch):
+        try:
+            results = await self.loop.run_in_executor(self.executor, batch_engine.predict, list(batch))
+            for future, (prediction, _, _) in zip(batch.values(), results):
+                if not future.done():
+                    future.set_result(prediction)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key in batch:
+                self.in_flight.pop(key, None)
+
+    async def predict(self, sites, date_times, model_type):
+        """Flow predictions for every site at every time, in site-major order (None without a model)."""
+        futures = [self.future((site, slot_start(date_time), model_type)) for site in sites for date_time in date_times]
+        return await asyncio.gather(*futures)
+
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'merged': self.merged,
+            'batches': self.batches,
+            'predict_calls': batch_engine.predict_calls,
+        }
+
+
+class RoutingService:
+    """Request handlers; all model and search work runs on one inference thread."""
+
+    def __init__(self, loop, window=COALESCE_SECONDS):
+        self.loop = loop
+        # Keras sessions, the forecast tables and the route cache are not thread safe
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.coalescer = PredictionCoalescer(loop, self.executor, window)
+        self.routes_in_flight = {}
+        self.route_requests = 0
+        self.route_merged = 0
+        self.started = time.time()
+
+    async def handle_predict(self, params):
+        sites = parse_list(params, 'sites')
+        date_times = [parse_time(value, 'times') for value in parse_list(params, 'times')]
+        model_type = parse_model(params)
+        flows = await self.coalescer.predict(sites, date_times, model_type)
+        flows = iter(flows)
+        return {
+            'model': model_type,
+            'slot_minutes': SLOT_MINUTES,
+            'predictions': [{'site': site, 'time': date_time.strftime(TIME_FORMAT), 'flow': next(flows)}
+                            for site in sites for date_time in date_times],
+        }
+
+    async def handle_route(self, params):
+        origin, destination = parse_field(params, 'origin'), parse_field(params, 'destination')
+        for site in (origin, destination):
+            if site not in pathfinder.all_sites:
+                raise BadRequest(f"Unknown SCATS site: {site}")
+        departure = parse_time(parse_field(params, 'departure'), 'departure')
+        model_type = parse_model(params)
+
+        self.route_requests += 1
+        key = pathfinder.route_cache.key(origin, destination, departure, model_type)
+        future = self.routes_in_flight.get(key)
+        if future is not None:
+            self.route_merged += 1
+        else:
+            future = self.loop.run_in_executor(self.executor, pathfinder.pathfinder,
+                                               origin, destination, departure, model_type)
+            self.routes_in_flight[key] = future
+            future.add_done_callback(lambda _: self.routes_in_flight.pop(key, None))
+        paths = await asyncio.shield(future)
+        return {
+            'origin': origin,
+            'destination': destination,
+            'departure': departure.strftime(TIME_FORMAT),
+            'model': model_type,
+            'routes': [{'minutes': minutes, 'km': km, 'path': list(path), 'avg_flow': avg_flow}
+                       for minutes, km, path, avg_flow in paths],
+        }
+
+    async def handle_stats(self, params):
+        return {
+            'uptime': time.time() - self.started,
+            'predict': self.coalescer.stats(),
+            'route': {'requested': self.route_requests, 'merged': self.route_merged,
+                      'cache': pathfinder.route_cache.stats()},
+            'models': {'resident': len(model_registry.models), 'loads': model_registry.loads,
+                       'hits': model_registry.hits, 'misses': model_registry.misses},
+        }
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handlers = {'/predict': self.handle_predict, '/route': self.handle_route, '/stats': self.handle_stats}
+        handler = handlers.get(url.path)
+        if handler is None:
+            return 404, {'error': f"Unknown endpoint: {url.path}"}
+        if method == 'GET':
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        elif method == 'POST':
+            try:
+                params = json.loads(body.decode('utf-8')) if body else {}
+            except ValueError as e:
+                return 400, {'error': f"Invalid JSON body: {str(e)}"}
+            if not isinstance(params, dict):
+                return 400, {'error': "JSON body must be an object"}
+        else:
+            return 405, {'error': f"Unsupported method: {method}"}
+
+        try:
+            return 200, await handler(params)
+        except BadRequest as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            print(f"Error handling {method} {url.path}: {str(e)}")
+            return 500, {'error': str(e)}
+
+    async def handle_connection(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await write_response(writer, 400, {'error': "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                length = int(headers.get('content-length', 0) or 0)
+                if length > MAX_BODY_BYTES:
+                    await write_response(writer, 413, {'error': "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+def parse_field(params, name):
+    value = params.get(name)
+    if value is None or str(value).strip() == '':
+        raise BadRequest(f"Missing parameter: {name}")
+    return str(value).strip()
+
+
+def parse_list(params, name):
+    value = params.get(name)
+    if isinstance(value, list):
+        items = [str(item).strip() for item in value]
+    else:
+        items = [item.strip() for item in parse_field(params, name).split(',')]
+    items = [item for item in items if item]
+    if not items:
+        raise BadRequest(f"Missing parameter: {name}")
+    return items
+
+
+def parse_time(value, name):
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        raise BadRequest(f"Invalid {name} '{value}', expected YYYY-MM-DD HH:MM")
+
+
+def parse_model(params):
+    model_type = str(params.get('model', 'LSTM')).upper()
+    if model_type not in MODEL_TYPES:
+        raise BadRequest(f"Unknown model type {model_type}, expected one of {', '.join(MODEL_TYPES)}")
+    return model_type
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=SERVICE_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port to listen on.")
+    parser.add_argument("--window", type=float, default=1000 * COALESCE_SECONDS,
+                        help="Milliseconds a prediction waits for others to join its batch.")
+    parser.add_argument("--warm", default=None,
+                        help="Comma separated model types to load for every site before serving.")
+    parser.add_argument("--replay-until", default=None, metavar="YYYY-MM-DD HH:MM",
+                        help="Feed model inputs from the SCATS flows observed before this time.")
+    args = parser.parse_args(argv[1:])
+    if args.replay_until:
+        try:
+            replay_until = datetime.strptime(args.replay_until, "%Y-%m-%d %H:%M")
+        except ValueError:
+            parser.error(f"--replay-until must be YYYY-MM-DD HH:MM, got {args.replay_until}")
+        from flow_buffer import replay_flow_history
+        replay_flow_history(replay_until)
+
+    loop = asyncio.get_event_loop()
+    service = RoutingService(loop, args.window / 1000)
+    if args.warm:
+        for model_type in args.warm.upper().split(','):
+            for site in pathfinder.site_ids:
+                load_model_for_site(site, model_type)
+        print(f"Loaded {len(model_registry.models)} models")
+
+    server = loop.run_until_complete(asyncio.start_server(service.handle_connection, args.host, args.port))
+    print(f"Serving on http://{args.host}:{args.port} (/predict, /route, /stats)", flush=True)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        service.executor.shutdown(wait=True)
+        pathfinder.route_cache.save()
+        loop.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,104 @@
+import math
+import numpy as np
+from graph import get_road_graph, TRAFFIC_NETWORK
+from geodesy import haversine, EARTH_RADIUS_KM
+
+CELL_DEGREES = 0.01  # Grid cell size, roughly 1.1 km north-south
+
+# Built indexes per source CSV
+site_indexes = {}
+
+
+class SiteIndex:
+    """SCATS sites keyed by number, with a uniform latitude/longitude grid for nearest-site queries.
+
+    Built once from the road graph; ``get`` is a dict lookup and ``nearest``
+    only measures the sites in the grid cells around the query point.
+    """
+
+    def __init__(self, sites, latitudes, longitudes, descriptions, cell_degrees=CELL_DEGREES):
+        known = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        self.sites = np.asarray(sites)[known]
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)[known]
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)[known]
+        self.descriptions = np.asarray(descriptions)[known]
+        self.cell_degrees = cell_degrees
+        self.records = {site: (float(lat), float(lon), str(description))
+                        for site, lat, lon, description in zip(self.sites.tolist(), self.latitudes,
+                                                               self.longitudes, self.descriptions)}
+
+        self.grid = {}
+        for i, cell in enumerate(zip(*self.cells(self.latitudes, self.longitudes))):
+            self.grid.setdefault(cell, []).append(i)
+        self.grid = {cell: np.array(members) for cell, members in self.grid.items()}
+        rows, cols = zip(*self.grid) if self.grid else ((0,), (0,))
+        self.extent = (min(rows), max(rows), min(cols), max(cols))
+
+    @classmethod
+    def from_graph(cls, graph, cell_degrees=CELL_DEGREES):
+        return cls(graph.ids, graph.latitudes, graph.longitudes, graph.descriptions, cell_degrees)
+
+    def cells(self, latitudes, longitudes):
+        rows = np.floor(np.asarray(latitudes) / self.cell_degrees).astype(int)
+        cols = np.floor(np.asarray(longitudes) / self.cell_degrees).astype(int)
+        return rows.tolist(), cols.tolist()
+
+    def __contains__(self, site):
+        return site in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, site):
+        """``(latitude, longitude, description)`` of a SCATS site, or None."""
+        return self.records.get(str(site).strip())
+
+    def coordinates(self):
+        """``{site: (latitude, longitude)}`` for every indexed site."""
+        return {site: (lat, lon) for site, (lat, lon, _) in self.records.items()}
+
+    def nearest(self, latitude, longitude):
+        """Closest SCATS site to a point, as ``(site, distance_km)``; None for an empty index."""
+        if not self.records:
+            return None
+        row, col = int(math.floor(latitude / self.cell_degrees)), int(math.floor(longitude / self.cell_degrees))
+        min_row, max_row, min_col, max_col = self.extent
+        max_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        if not (min_row - 2 <= row <= max_row + 2 and min_col - 2 <= col <= max_col + 2):
+            # Far outside the network the ring walk would visit mostly empty cells
+            distances = haversine(latitude, longitude, self.latitudes, self.longitudes)
+            i = int(np.argmin(distances))
+            return str(self.sites[i]), float(distances[i])
+
+        best_site, best_km = None, float('inf')
+        for ring in range(max_ring + 1):
+            # Every site outside the rings searched so far is at least this far away
+            lower_bound_km = 0.99 * math.radians(max(ring - 1, 0) * self.cell_degrees) * EARTH_RADIUS_KM * \
+                max(math.cos(math.radians(min(abs(latitude) + ring * self.cell_degrees, 90.0))), 0.0)
+            if lower_bound_km > best_km:
+                break
+
+            members = [self.grid[cell] for cell in self.ring_cells(row, col, ring) if cell in self.grid]
+            if not members:
+                continue
+            members = np.concatenate(members)
+            distances = haversine(latitude, longitude, self.latitudes[members], self.longitudes[members])
+            i = int(np.argmin(distances))
+            if distances[i] < best_km:
+                best_site, best_km = str(self.sites[members[i]]), float(distances[i])
+        return best_site, best_km
+
+    @staticmethod
+    def ring_cells(row, col, ring):
+        if ring == 0:
+            return [(row, col)]
+        cells = [(row + dr, col + dc) for dr in (-ring, ring) for dc in range(-ring, ring + 1)]
+        cells += [(row + dr, col + dc) for dr in range(-ring + 1, ring) for dc in (-ring, ring)]
+        return cells
+
+
+def get_site_index(csv_path=TRAFFIC_NETWORK):
+    """The shared SiteIndex for a network CSV, built once per process."""
+    if csv_path not in site_indexes:
+        site_indexes[csv_path] = SiteIndex.from_graph(get_road_graph(csv_path))
+    return site_indexes[csv_path]
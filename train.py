@@ -4,24 +4,42 @@ import argparse
 import numpy as np
 import pandas as pd
 import os
-from data.data import process_data
+import json
+import time
+import multiprocessing
+from data.data import process_data, model_inputs, SAES_MODELS
+from data.window_cache import cached_process_data
+from data.stream import WindowStream, prefetch, SHUFFLE_BUFFER, CHUNK_ROWS, PREFETCH_BATCHES
+from data.store import store_files, is_store_path, get_scats_sites, get_split_files
+from scaler_store import save_scaler, get_scaler_path
+from global_model import GLOBAL_MODELS_DIR, get_global_model_path, save_global_meta, add_site_inputs
 from model import model
+import tensorflow as tf
+from keras import backend as K
 from keras.models import Model
 from keras.callbacks import EarlyStopping
 
 warnings.filterwarnings("ignore")
 
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'sites_models', 'train_manifest.json')
 
-def get_scats_sites(data_dir):
-    """Get SCATS sites based on file names from the directory"""
-    # Get all the train file names from the folder
-    files = os.listdir(data_dir)
-    train_files = [f for f in files if 'train' in f]
 
-    # Extract SCATS IDs (e.g., '2000', '2200', etc.)
-    scats_sites = [f.split('_')[0] for f in train_files]
+def get_model_save_path(name, site):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'sites_models', f'{name}_{site}.h5')
 
-    return scats_sites
+
+def get_loss_history_save_path(name, site):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'sites_models', f'{name}_{site}_loss.csv')
+
+
+def save_training(model, hist, model_save_path, loss_history_save_path):
+    """Save the trained model and its loss history."""
+    # Save model
+    model.save(model_save_path)
+
+    # Save training history
+    df = pd.DataFrame.from_dict(hist.history)
+    df.to_csv(loss_history_save_path, encoding='utf-8', index=False)
 
 
 def train_model(model, X_train, y_train, name, config, site):
@@ -32,15 +50,244 @@ def train_model(model, X_train, y_train, name, config, site):
         batch_size=config["batch"],
         epochs=config["epochs"],
         validation_split=0.05)
+    save_training(model, hist, get_model_save_path(name, site), get_loss_history_save_path(name, site))
 
-    # Save model
-    model_save_path = os.path.join(os.path.dirname(__file__), 'model', 'sites_models', f'{name}_{site}.h5')
-    model.save(model_save_path)
 
-    # Save training history
-    loss_history_save_path = os.path.join(os.path.dirname(__file__), 'model', 'sites_models', f'{name}_{site}_loss.csv')
-    df = pd.DataFrame.from_dict(hist.history)
-    df.to_csv(loss_history_save_path, encoding='utf-8', index=False)
+def train_model_stream(model, stream, name, config, site):
+    """Train a single model from a WindowStream and save the trained model and loss history.
+
+    The last 5% of the windows (in time order) are the validation set, and
+    batches are built on a prefetch thread while the previous one trains.
+    """
+    model.compile(loss="mse", optimizer="rmsprop", metrics=['mape'])
+    train_stream, validation_stream = stream.split(0.05)
+    shape = lambda X, X_time: model_inputs(name, X, X_time)
+    validation = prefetch(validation_stream.batches(shape)) if validation_stream.steps else None
+    hist = model.fit_generator(
+        prefetch(train_stream.batches(shape), config["prefetch"]),
+        steps_per_epoch=train_stream.steps,
+        epochs=config["epochs"],
+        validation_data=validation,
+        validation_steps=validation_stream.steps or None,
+        max_queue_size=1)
+    save_training(model, hist, get_model_save_path(name, site), get_loss_history_save_path(name, site))
+
+
+def build_model(model_type, lag, X_train, X_train_time):
+    """Build the network for ``model_type`` and shape its training input accordingly."""
+    if model_type == 'lstm':
+        X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
+        m = model.get_lstm([lag, 64, 64, 1])
+    elif model_type == 'gru':
+        X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
+        m = model.get_gru([lag, 64, 64, 1])
+    elif model_type == 'rnn':
+        X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
+        m = model.get_rnn([lag, 64, 64, 1])
+    elif model_type == 'saes':
+        # For SAES, combine flow data with time features
+        X_train = np.concatenate((X_train, X_train_time), axis=1)
+        models = model.get_saes([X_train.shape[1], 400, 400, 400, 1])
+        m = models[-1]
+    elif model_type == 'saes_fixed':
+        X_train = np.concatenate((X_train, X_train_time), axis=1)
+        input_dim = X_train.shape[1] # adjust input dimension for SAEs
+        hidden_layers = [400, 400, 400]
+
+        m = model.get_saes_fixed(input_dim, hidden_layers)
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    return m, X_train
+
+
+def get_input_files(data_dir, site):
+    files = []
+    for path in get_split_files(data_dir, site):
+        files.extend(store_files(path) if is_store_path(path) else [path])
+    return files
+
+
+def is_up_to_date(model_type, site, data_dir):
+    """A job is done when its .h5 and loss history exist and are newer than the input split."""
+    outputs = [get_model_save_path(model_type, site), get_loss_history_save_path(model_type, site)]
+    if not all(os.path.exists(path) for path in outputs):
+        return False
+    newest_input = max(os.path.getmtime(path) for path in get_input_files(data_dir, site))
+    return min(os.path.getmtime(path) for path in outputs) > newest_input
+
+
+def train_site(model_type, site, data_dir, lag, config):
+    """Process one SCATS site's split, then build, train and save one model for it."""
+    train_file, test_file = get_split_files(data_dir, site)
+
+    if config.get("stream"):
+        # Windows are built chunk by chunk from the training split; the test split is not needed
+        stream = WindowStream(train_file, lag, config["batch"], time_features=model_type in SAES_MODELS,
+                              shuffle_buffer=config["shuffle_buffer"], chunk_rows=config["chunk_rows"])
+        X_sample, _, X_sample_time = next(stream.chunks())
+        m, _ = build_model(model_type, lag, X_sample, X_sample_time)
+        train_model_stream(m, stream, model_type, config, site)
+        scaler = stream.scaler
+    else:
+        # Process data for the SCATS site; with the window cache every model type after the first maps the same arrays
+        load = cached_process_data if config.get("window_cache") else process_data
+        X_train, X_train_time, y_train, X_test, X_test_time, y_test, scaler = load(train_file, test_file, lag)
+
+        # Reshape input data based on the model type
+        m, X_train = build_model(model_type, lag, X_train, X_train_time)
+        train_model(m, X_train, y_train, model_type, config, site)
+
+    # Save the fitted scaler so serving can denormalize without re-reading the splits
+    save_scaler(scaler, get_scaler_path(site, model_type))
+
+    print(f"Finished training {model_type} model for SCATS site: {site}")
+
+
+def build_global_model(model_type, lag, features):
+    """Build the multi-site network for ``model_type`` taking ``features`` inputs (per timestep for recurrent models)."""
+    if model_type == 'lstm':
+        return model.get_lstm([lag, 64, 64, 1], features=features)
+    elif model_type == 'gru':
+        return model.get_gru([lag, 64, 64, 1], features=features)
+    elif model_type == 'rnn':
+        return model.get_rnn([lag, 64, 64, 1], features=features)
+    elif model_type == 'saes':
+        return model.get_saes([features, 400, 400, 400, 1])[-1]
+    elif model_type == 'saes_fixed':
+        return model.get_saes_fixed(features, [400, 400, 400])
+    raise ValueError(f"Unknown model type: {model_type}")
+
+
+def global_batches(X, site_ids, y, n_sites, batch_size, shuffle=True):
+    """Endless batches with the one-hot site input added per batch, so it is never materialized for every window."""
+    while True:
+        order = np.random.permutation(len(y)) if shuffle else np.arange(len(y))
+        for start in range(0, len(y), batch_size):
+            rows = order[start:start + batch_size]
+            yield add_site_inputs(X[rows], site_ids[rows], n_sites), y[rows]
+
+
+def train_global(model_type, sites, data_dir, lag, config):
+    """Train one network of ``model_type`` on every site, with the site as a one-hot input.
+
+    Each site's windows are scaled with its own scaler (as for the per-site
+    models) and 5% of all windows, drawn across sites, are held out for validation.
+    """
+    load = cached_process_data if config.get("window_cache") else process_data
+    inputs, targets, site_ids, scalers = [], [], [], {}
+    for i, site in enumerate(sites):
+        train_file, test_file = get_split_files(data_dir, site)
+        X_train, X_train_time, y_train, _, _, _, scaler = load(train_file, test_file, lag)
+        inputs.append(model_inputs(model_type, X_train, X_train_time).astype(np.float32))
+        targets.append(np.asarray(y_train, dtype=np.float32))
+        site_ids.append(np.full(len(y_train), i))
+        scalers[site] = scaler
+    X, y, site_ids = np.concatenate(inputs), np.concatenate(targets), np.concatenate(site_ids)
+
+    order = np.random.permutation(len(y))
+    n_validation = int(len(y) * 0.05)
+    validation, train = order[:n_validation], order[n_validation:]
+
+    m = build_global_model(model_type, lag, X.shape[-1] + len(sites))
+    m.compile(loss="mse", optimizer="rmsprop", metrics=['mape'])
+    batch = config["batch"]
+    hist = m.fit_generator(
+        prefetch(global_batches(X[train], site_ids[train], y[train], len(sites), batch), config["prefetch"]),
+        steps_per_epoch=-(-len(train) // batch),
+        epochs=config["epochs"],
+        validation_data=prefetch(global_batches(X[validation], site_ids[validation], y[validation], len(sites),
+                                                batch, shuffle=False)),
+        validation_steps=-(-n_validation // batch),
+        max_queue_size=1)
+
+    os.makedirs(GLOBAL_MODELS_DIR, exist_ok=True)
+    save_training(m, hist, get_global_model_path(model_type),
+                  os.path.join(GLOBAL_MODELS_DIR, f'{model_type}_global_loss.csv'))
+    save_global_meta(model_type, sites, scalers, lag, {'samples': int(len(y)), 'epochs': config["epochs"]})
+    print(f"Finished training global {model_type} model for {len(sites)} SCATS sites")
+
+
+def run_global_job(model_type, sites, data_dir, lag, config, threads):
+    record = {'model': model_type, 'site': 'global', 'sites': len(sites), 'started': time.strftime('%Y-%m-%d %H:%M:%S')}
+    t0 = time.perf_counter()
+    try:
+        limit_threads(threads)
+        train_global(model_type, sites, data_dir, lag, config)
+        record['status'] = 'trained'
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+        print(f"Failed to train global {model_type} model: {str(e)}")
+    record['wall_time'] = time.perf_counter() - t0
+    return record
+
+
+def limit_threads(threads):
+    """Give Keras a fresh session limited to ``threads`` so parallel jobs do not oversubscribe the CPU."""
+    K.clear_session()
+    session_config = tf.ConfigProto(
+        intra_op_parallelism_threads=threads,
+        inter_op_parallelism_threads=1)
+    K.set_session(tf.Session(config=session_config))
+
+
+def run_job(job):
+    """Train one (model type, site) job and report its status and wall time."""
+    model_type, site, data_dir, lag, config, threads = job
+    record = {'model': model_type, 'site': site, 'started': time.strftime('%Y-%m-%d %H:%M:%S')}
+    t0 = time.perf_counter()
+    try:
+        # Each job starts from an empty graph, so long-lived workers do not accumulate models
+        limit_threads(threads)
+        train_site(model_type, site, data_dir, lag, config)
+        record['status'] = 'trained'
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = str(e)
+        print(f"Failed to train {model_type} model for SCATS site {site}: {str(e)}")
+    record['wall_time'] = time.perf_counter() - t0
+    return record
+
+
+def schedule_training(model_types, sites, data_dir, lag, config, jobs=1, threads_per_worker=None, force=False):
+    """Train every (model type, site) pair, running up to ``jobs`` of them at once.
+
+    Jobs whose outputs are already newer than their input split are skipped
+    unless ``force`` is set. Returns one manifest record per job.
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, multiprocessing.cpu_count() // jobs)
+
+    records, pending = [], []
+    for model_type in model_types:
+        for site in sites:
+            if not force and is_up_to_date(model_type, site, data_dir):
+                print(f"Skipping {model_type} model for SCATS site {site}: already up to date")
+                records.append({'model': model_type, 'site': site, 'status': 'skipped', 'wall_time': 0.0})
+            else:
+                pending.append((model_type, site, data_dir, lag, config, threads_per_worker))
+
+    if jobs == 1:
+        records.extend(run_job(job) for job in pending)
+    else:
+        # Spawned workers start without the parent's TensorFlow runtime state
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(jobs) as pool:
+            records.extend(pool.imap_unordered(run_job, pending))
+
+    return records
+
+
+def write_manifest(records, total_wall_time, path=MANIFEST_PATH):
+    manifest = {
+        'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_wall_time': total_wall_time,
+        'jobs': sorted(records, key=lambda r: (r['model'], r['site'])),
+    }
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote training manifest to {path}")
 
 
 def main(argv):
@@ -48,50 +295,76 @@ def main(argv):
     parser.add_argument(
         "--model",
         default="rnn",
-        help="Model to train.")
+        help="Model to train. Use a comma-separated list (e.g. lstm,gru,saes) to train several.")
+    parser.add_argument(
+        "--sites",
+        default=None,
+        help="Comma-separated SCATS sites to train (default: every site in data/splitted_data).")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of site/model jobs to train in parallel.")
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="TensorFlow threads per job (default: CPU count / jobs).")
+    parser.add_argument(
+        "--data-dir",
+        default="data/splitted_data",
+        help="Directory of per-site splits: CSVs, or a binary store written by data/store.py.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Retrain jobs whose model is already newer than its input split.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream lag windows from the split in chunks instead of building them all in memory.")
+    parser.add_argument(
+        "--shuffle-buffer",
+        type=int,
+        default=SHUFFLE_BUFFER,
+        help="Windows held in the shuffle buffer when streaming.")
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=CHUNK_ROWS,
+        help="Flow rows read per chunk when streaming.")
+    parser.add_argument(
+        "--global",
+        dest="global_model",
+        action="store_true",
+        help="Train one network per model type across all --sites instead of one per site.")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild the lag windows instead of reusing them from data/window_cache.")
     args = parser.parse_args()
 
     lag = 12
-    config = {"batch": 128, "epochs": 10}
+    config = {"batch": 128, "epochs": 10, "stream": args.stream, "shuffle_buffer": args.shuffle_buffer,
+              "chunk_rows": args.chunk_rows, "prefetch": PREFETCH_BATCHES, "window_cache": not args.no_cache}
 
     # Get all SCATS sites (by extracting unique IDs from file names)
-    data_dir = 'data/splitted_data'
-    scats_sites = get_scats_sites(data_dir)
+    data_dir = args.data_dir
+    scats_sites = args.sites.split(',') if args.sites else get_scats_sites(data_dir)
+    model_types = [m.strip().lower() for m in args.model.split(',')]
 
-    # Loop through each SCATS site and train the model
-    for site in scats_sites:
-        train_file = os.path.join(data_dir, f'{site}_train.csv')
-        test_file = os.path.join(data_dir, f'{site}_test.csv')
+    t0 = time.perf_counter()
+    if args.global_model:
+        threads = args.threads_per_worker or multiprocessing.cpu_count()
+        # The manifest records failed jobs too, so the directory must exist even if no model gets saved
+        os.makedirs(GLOBAL_MODELS_DIR, exist_ok=True)
+        records = [run_global_job(model_type, scats_sites, data_dir, lag, config, threads) for model_type in model_types]
+        write_manifest(records, time.perf_counter() - t0, os.path.join(GLOBAL_MODELS_DIR, 'train_manifest.json'))
+        return
 
-        # Process data for each SCATS site
-        X_train, X_train_time, y_train, X_test, X_test_time, y_test, scaler = process_data(train_file, test_file, lag)
-
-        # Reshape input data based on the model type
-        if args.model == 'lstm':
-            X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
-            m = model.get_lstm([lag, 64, 64, 1])
-        elif args.model == 'gru':
-            X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
-            m = model.get_gru([lag, 64, 64, 1])
-        elif args.model == 'rnn':
-            X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
-            m = model.get_rnn([lag, 64, 64, 1])
-        elif args.model == 'saes':
-            # For SAES, combine flow data with time features
-            X_train = np.concatenate((X_train, X_train_time), axis=1)
-            models = model.get_saes([X_train.shape[1], 400, 400, 400, 1])
-            m = models[-1]
-        elif args.model == 'saes_fixed':
-            X_train = np.concatenate((X_train, X_train_time), axis=1)
-            input_dim = X_train.shape[1] # adjust input dimension for SAEs
-            hidden_layers = [400, 400, 400]
-
-            m = model.get_saes_fixed(input_dim, hidden_layers)
-
-        train_model(m, X_train, y_train, args.model, config, site)
-
-        print(f"Finished training model for SCATS site: {site}")
+    records = schedule_training(model_types, scats_sites, data_dir, lag, config,
+                                args.jobs, args.threads_per_worker, args.force)
+    write_manifest(records, time.perf_counter() - t0)
 
 
 if __name__ == '__main__':
-    main(sys.argv)
\ No newline at end of file
+    main(sys.argv)